@@ -3,10 +3,11 @@ import time
 import logging
 import os
 from utils.config import Config
-from utils.json_database import JsonDatabase
+from utils.database import create_database, start_new_campaign
+from utils.campaign_catalog import CampaignCatalog
 from utils.csv_handler import CsvHandler
-from services.twilio_service import BlendService
-from services.openai_service import OpenAIService
+from utils import worker_state
+from utils.worker_state import WorkerState
 from services.analysis_service import AnalysisService
 
 # Configuration du logger pour l'app
@@ -34,16 +35,19 @@ st.set_page_config(
     layout="wide"
 )
 
-# Initialisation de la base de données
-db = JsonDatabase()
+# Initialisation de la base de données (partition de la campagne active)
+catalog = CampaignCatalog(Config().DATA_DIR)
+active_campaign = catalog.active()
+db = create_database(campaign_id=active_campaign['id'])
 analysis = AnalysisService(db)
 
-# Initialisation des services
-twilio_service = BlendService()
-openai_service = OpenAIService()
+# Les appels sont passés par le worker de campagne (python worker.py), pas par l'application
+worker = WorkerState(Config().DATA_DIR)
+job = worker.load()
 
 # Titre
 st.title("📞 VoiceCheck AI")
+st.caption(f"Campagne active : {active_campaign['name']}")
 
 # Tabs
 tab1, tab2, tab3 = st.tabs(["📊 Dashboard", "📞 Campagne", "📥 Export"])
@@ -104,8 +108,42 @@ with tab1:
         # Utiliser CsvHandler pour formater les colonnes avec les noms en français
         df = CsvHandler.export_results(results)
         st.dataframe(df, use_container_width=True)
+        
+        # Transcriptions chargées à la demande depuis le stockage des blobs
+        with st.expander("📝 Transcriptions"):
+            with_transcript = [r for r in results if r.get('transcript_ref')]
+            selected = st.selectbox(
+                "Appel",
+                with_transcript,
+                index=None,
+                format_func=lambda r: f"{r.get('timestamp', '')[:16]} - {r.get('prenom', '')} {r.get('nom', '')}",
+                placeholder="Choisir un appel pour afficher sa transcription"
+            )
+            if selected:
+                st.text(db.load_transcript(selected['transcript_ref']) or "Transcription introuvable")
     else:
         st.info("Aucun résultat pour le moment")
+    
+    # Diagnostics de performance
+    with st.expander("⚙️ Diagnostics"):
+        st.write("**Cache de lecture** (succès = lecture sans parsing JSON)")
+        st.json(db.cache_stats())
+        # Métriques publiées par le worker de campagne (les appels passent par son processus)
+        worker_diagnostics = job.get('diagnostics') or {}
+        st.write("**Connexions HTTP du worker** (réutilisation des connexions keep-alive)")
+        st.json(worker_diagnostics.get('connections', {}))
+        st.write("**🚦 Limites de débit** (jetons disponibles, pause Retry-After en cours, requêtes en attente)")
+        st.json(worker_diagnostics.get('rate_limits', {}))
+        st.write("**🔌 Disjoncteurs** (état par fournisseur, reprises sur erreur passagère, requêtes refusées)")
+        st.json(worker_diagnostics.get('circuits', {}))
+        st.write("**🏭 Pipeline de campagne** (par étage: threads occupés, profondeur de file, attente et durée moyennes en ms)")
+        st.json(worker_diagnostics.get('pipeline', {}))
+        st.write("**⚡ Analyse des transcripts** (tranchés par règles locales / servis par le cache / envoyés au LLM, part évitée en %, réponses réparées localement / illisibles, cache: taux de succès et temps économisé)")
+        st.json(worker_diagnostics.get('analysis', {}))
+        call_timings = analysis.get_call_timings()
+        if call_timings:
+            st.write("**Durées moyennes des appels par état** (secondes)")
+            st.json(call_timings)
 
 # TAB 2: Campagne
 with tab2:
@@ -129,8 +167,8 @@ with tab2:
                 st.success(f"✅ {len(contacts)} contacts importés")
                 
                 if st.button("Ajouter à la base"):
-                    db.add_contacts(contacts)
-                    st.success("Contacts ajoutés à la base de données")
+                    report = db.add_contacts(contacts)
+                    st.success(f"{report['count']} contacts ajoutés à la base de données ({report['rows_per_second']} lignes/s)")
                     st.rerun()
             except Exception as e:
                 st.error(f"Erreur lors de l'import : {str(e)}")
@@ -180,171 +218,41 @@ Martin,Marie,0687654321""")
     # Lancement des appels
     st.subheader("3. Lancer les appels")
     
-    if pending_contacts:
+    if job.get('status') in worker_state.ACTIVE_STATUSES:
+        # Campagne en file ou en cours dans le worker: suivi et annulation
+        total = job.get('total') or 0
+        if job['status'] == worker_state.QUEUED:
+            st.info("⏳ Campagne en file, en attente du worker...")
+        else:
+            st.progress(job.get('completed', 0) / total if total else 0.0)
+            st.write(f"**{job.get('completed', 0)}/{total}** contact(s) traité(s), {job.get('errors', 0)} erreur(s)")
+        if job.get('last_event'):
+            st.caption(job['last_event'])
+        if not worker.worker_alive():
+            st.warning("⚠️ Aucun worker actif : lancez `python worker.py` pour exécuter la campagne")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🔄 Actualiser"):
+                st.rerun()
+        with col2:
+            if job.get('cancel_requested'):
+                st.caption("⏹️ Annulation en cours : fin des appels déjà lancés...")
+            elif st.button("⏹️ Annuler la campagne"):
+                worker.request_cancel()
+                st.rerun()
+    elif pending_contacts:
+        inflight_calls = db.get_inflight_calls()
+        if inflight_calls:
+            st.info(f"🔁 {len(inflight_calls)} appel(s) lancé(s) avant un arrêt du worker : ils seront suivis jusqu'à leur fin au prochain lancement, sans rappeler les contacts")
+        if job.get('finished_at') and job.get('last_event'):
+            st.caption(f"Dernière exécution : {job['last_event']} ({job.get('completed', 0)}/{job.get('total', 0)} contact(s))")
         if st.button("🚀 Lancer la campagne d'appels", type="primary"):
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            total = len(pending_contacts)
-            
-            for i, contact in enumerate(pending_contacts):
-                status_text.text(f"Appel en cours : {contact['prenom']} {contact['nom']}...")
-                
-                try:
-                    # Appel RÉEL avec Blend AI + OpenAI
-                    logger.info(f"Début appel RÉEL pour {contact['prenom']} {contact['nom']} ({contact['telephone']})")
-                    
-                    # Construire le prompt de tâche
-                    task_prompt = twilio_service.build_task_prompt(
-                        nom=contact['nom'],
-                        prenom=contact['prenom']
-                    )
-                    
-                    # Initier l'appel via Blend
-                    call_response = twilio_service.make_call(
-                        to_number=contact['telephone'],
-                        contact_id=contact['id'],
-                        task_prompt=task_prompt,
-                        first_sentence="Bonjour, je suis une assistante virtuelle de VoiceCheck AI.",
-                        language="fr"
-                    )
-                    
-                    if call_response.get('error'):
-                        error_msg = f"Erreur Blend: {call_response.get('message')}"
-                        logger.error(f"{error_msg} - Response: {call_response}")
-                        st.error(error_msg)
-                        st.error(f"Détails: Status {call_response.get('status_code')} - Voir logs/blend_api.log pour plus d'infos")
-                        continue
-                    
-                    call_id = call_response.get('call_id') or call_response.get('id')
-                    
-                    # Attendre que l'appel se termine (polling)
-                    status_text.text(f"⏳ Appel en cours avec {contact['prenom']} {contact['nom']}... (attente du transcript)")
-                    
-                    max_attempts = 60  # 60 tentatives = ~5 minutes max
-                    attempt = 0
-                    call_completed = False
-                    transcript = ""
-                    
-                    while attempt < max_attempts and not call_completed:
-                        time.sleep(5)  # Attendre 5 secondes entre chaque vérification
-                        attempt += 1
-                        
-                        logger.info(f"⏳ Polling tentative {attempt}/{max_attempts} pour call_id: {call_id}")
-                        
-                        # Récupérer le statut de l'appel
-                        call_status = twilio_service.fetch_call_result(call_id)
-                        
-                        if call_status.get('error'):
-                            logger.error(f"❌ Erreur lors de la récupération du statut: {call_status.get('message')}")
-                            break
-                        
-                        # Vérifier si l'appel est terminé
-                        try:
-                            status = call_status.get('status', '').lower() if call_status.get('status') else ''
-                        except (AttributeError, TypeError) as e:
-                            logger.error(f"❌ Erreur lors du traitement du status (numéro invalide?): {e}")
-                            status = 'failed'
-                            call_completed = True  # Forcer la sortie de la boucle
-                        
-                        logger.debug(f"Status actuel: {status}")
-                        
-                        if status in ['completed', 'done', 'finished']:
-                            call_completed = True
-                            # Bland.ai utilise 'concatenated_transcript'
-                            transcript = call_status.get('concatenated_transcript', '') or call_status.get('transcript', '') or call_status.get('transcription', '')
-                            logger.info(f"✅ Appel terminé! Transcript récupéré (longueur: {len(transcript)} caractères)")
-                            logger.debug(f"Transcript complet: {transcript[:500]}..." if len(transcript) > 500 else f"Transcript complet: {transcript}")
-                            break
-                        elif status == 'failed':
-                            # Numéro invalide ou erreur d'appel
-                            logger.warning(f"⚠️ Appel échoué (numéro invalide ou erreur)")
-                            break
-                    
-                    if not call_completed:
-                        logger.warning(f"⚠️ Timeout: Appel non terminé après {max_attempts} tentatives ({max_attempts * 5} secondes)")
-                    
-                    if not transcript:
-                        logger.warning(f"⚠️ Aucun transcript disponible pour call_id: {call_id}")
-                    
-                    if not call_completed or not transcript:
-                        # Pas de transcript disponible
-                        logger.info(f"📝 Création du résultat avec no_response=True pour contact {contact['id']}")
-                        result = {
-                            'contact_id': contact['id'],
-                            'nom': contact['nom'],
-                            'prenom': contact['prenom'],
-                            'telephone': contact['telephone'],
-                            'call_sid': call_id,
-                            'consent': None,
-                            'identity_confirmed': None,
-                            'no_response': True,
-                            'transcription': ''
-                        }
-                    else:
-                        # Analyser le transcript avec OpenAI
-                        logger.info(f"🤖 Début de l'analyse OpenAI pour {contact['prenom']} {contact['nom']}")
-                        status_text.text(f"🤖 Analyse du transcript avec OpenAI pour {contact['prenom']} {contact['nom']}...")
-                        
-                        try:
-                            analysis_result = openai_service.analyze_consent_and_identity(
-                                transcript=transcript,
-                                nom=contact['nom'],
-                                prenom=contact['prenom']
-                            )
-                            
-                            logger.info(f"✅ Analyse OpenAI terminée: consent={analysis_result.get('consent')}, identity={analysis_result.get('identity_confirmed')}")
-                            logger.debug(f"Reasoning: {analysis_result.get('reasoning', 'N/A')}")
-                            
-                            result = {
-                                'contact_id': contact['id'],
-                                'nom': contact['nom'],
-                                'prenom': contact['prenom'],
-                                'telephone': contact['telephone'],
-                                'call_sid': call_id,
-                                'consent': analysis_result.get('consent'),
-                                'identity_confirmed': analysis_result.get('identity_confirmed'),
-                                'no_response': False,
-                                'transcription': transcript,
-                                'reasoning': analysis_result.get('reasoning', '')
-                            }
-                        except Exception as e:
-                            logger.error(f"❌ Erreur lors de l'analyse OpenAI: {str(e)}")
-                            logger.exception(e)
-                            result = {
-                                'contact_id': contact['id'],
-                                'nom': contact['nom'],
-                                'prenom': contact['prenom'],
-                                'telephone': contact['telephone'],
-                                'call_sid': call_id,
-                                'consent': None,
-                                'identity_confirmed': None,
-                                'no_response': True,
-                                'transcription': transcript,
-                                'error': str(e)
-                            }
-                    
-                    # Sauvegarder le résultat
-                    logger.info(f"💾 Sauvegarde du résultat pour contact {contact['id']}")
-                    db.save_result(result)
-                    
-                    # Mettre à jour le statut du contact
-                    if result.get('identity_confirmed') and result.get('consent'):
-                        logger.info(f"✅ Contact {contact['id']} marqué comme 'completed' (consent + identity OK)")
-                        db.update_contact_status(contact['id'], 'completed')
-                    else:
-                        logger.info(f"⏸️ Contact {contact['id']} reste en 'pending' (consent={result.get('consent')}, identity={result.get('identity_confirmed')})")
-                        db.update_contact_status(contact['id'], 'pending')
-                    
-                    progress_bar.progress((i + 1) / total)
-                    
-                except Exception as e:
-                    st.error(f"Erreur pour {contact['nom']} : {str(e)}")
-            
-            status_text.text("✅ Campagne terminée !")
-            st.success(f"{total} appel(s) effectué(s)")
-            time.sleep(2)
+            worker.request_start(active_campaign['id'])
+            logger.info(f"📥 Campagne {active_campaign['id']} mise en file ({len(pending_contacts)} contact(s))")
             st.rerun()
+        if not worker.worker_alive():
+            st.caption("ℹ️ Aucun worker actif : lancez `python worker.py` pour que la campagne s'exécute")
     else:
         st.warning("Aucun contact en attente. Importez des contacts d'abord.")
     
@@ -369,17 +277,18 @@ Martin,Marie,0687654321""")
         
         if st.button("📞 Relancer ces contacts"):
             try:
-                # Remettre les contacts en statut pending
-                count = 0
+                # Remettre les contacts en statut pending (une seule écriture)
+                contact_ids = []
                 for contact in to_recall:
                     contact_id = contact.get('id')
                     if contact_id:
                         logger.info(f"🔄 Remise en file d'attente du contact {contact_id}: {contact.get('prenom')} {contact.get('nom')}")
-                        db.update_contact_status(contact_id, 'pending')
-                        count += 1
+                        contact_ids.append(contact_id)
                     else:
                         logger.error(f"❌ Contact sans ID: {contact}")
                 
+                count = db.bulk_update_status(contact_ids, 'pending')
+                
                 st.success(f"✅ {count} contact(s) remis en file d'attente")
                 logger.info(f"✅ Relance terminée: {count} contacts remis en pending")
                 time.sleep(1)
@@ -389,6 +298,10 @@ Martin,Marie,0687654321""")
                 st.error(f"Erreur: {str(e)}")
     else:
         st.info("Aucun contact à rappeler")
+    
+    to_analyze = analysis.get_contacts_to_analyze()
+    if to_analyze:
+        st.info(f"🤖 {len(to_analyze)} contact(s) appelé(s) dont l'analyse a échoué : transcript conservé, ils ne seront pas rappelés")
 
 # TAB 3: Export
 with tab3:
@@ -403,6 +316,10 @@ with tab3:
         df = CsvHandler.export_results(results)
         st.dataframe(df, use_container_width=True)
         
+        # Export complet: les transcriptions ne sont chargées que si demandé
+        if st.checkbox("Inclure les transcriptions dans l'export"):
+            df = CsvHandler.export_results(analysis.get_detailed_results(include_transcripts=True))
+        
         # Bouton de téléchargement avec date de campagne
         csv = df.to_csv(index=False)
         campaign_date = db.get_campaign_start_date()
@@ -423,17 +340,19 @@ with tab3:
             st.session_state.confirm_reset = False
         
         if not st.session_state.confirm_reset:
-            if st.button("🗑️ Réinitialiser la campagne", type="secondary", key="reset_btn_1"):
+            if st.button("🗄️ Archiver et démarrer une nouvelle campagne", type="secondary", key="reset_btn_1",
+                         disabled=job.get('status') in worker_state.ACTIVE_STATUSES,
+                         help="Indisponible pendant l'exécution d'une campagne"):
                 st.session_state.confirm_reset = True
                 st.rerun()
         else:
-            st.warning("⚠️ Cette action supprimera tous les contacts et résultats. Cette action est irréversible !")
+            st.warning("⚠️ La campagne sera archivée en lecture seule (toujours exportable ci-dessous) et une nouvelle campagne vide démarrera.")
             col1, col2 = st.columns(2)
             with col1:
-                if st.button("✅ Confirmer la réinitialisation", type="primary", key="confirm_reset_1"):
-                    db.reset_campaign()
+                if st.button("✅ Confirmer l'archivage", type="primary", key="confirm_reset_1"):
+                    start_new_campaign()
                     st.session_state.confirm_reset = False
-                    st.success("Campagne réinitialisée avec succès")
+                    st.success("Campagne archivée, nouvelle campagne démarrée")
                     st.rerun()
             with col2:
                 if st.button("❌ Annuler", key="cancel_reset_1"):
@@ -451,23 +370,51 @@ with tab3:
                 st.session_state.confirm_reset_no_results = False
             
             if not st.session_state.confirm_reset_no_results:
-                if st.button("🗑️ Réinitialiser la campagne", type="secondary", key="reset_btn_2"):
+                if st.button("🗄️ Archiver et démarrer une nouvelle campagne", type="secondary", key="reset_btn_2",
+                             disabled=job.get('status') in worker_state.ACTIVE_STATUSES,
+                             help="Indisponible pendant l'exécution d'une campagne"):
                     st.session_state.confirm_reset_no_results = True
                     st.rerun()
             else:
-                st.warning("⚠️ Cette action supprimera tous les contacts. Cette action est irréversible !")
+                st.warning("⚠️ La campagne sera archivée en lecture seule et une nouvelle campagne vide démarrera.")
                 col1, col2 = st.columns(2)
                 with col1:
-                    if st.button("✅ Confirmer la réinitialisation", type="primary", key="confirm_reset_2"):
-                        db.reset_campaign()
+                    if st.button("✅ Confirmer l'archivage", type="primary", key="confirm_reset_2"):
+                        start_new_campaign()
                         st.session_state.confirm_reset_no_results = False
-                        st.success("Campagne réinitialisée avec succès")
+                        st.success("Campagne archivée, nouvelle campagne démarrée")
                         st.rerun()
                 with col2:
                     if st.button("❌ Annuler", key="cancel_reset_2"):
                         st.session_state.confirm_reset_no_results = False
                         st.rerun()
 
+    # Campagnes archivées (segments compressés en lecture seule)
+    archived_campaigns = catalog.archived()
+    if archived_campaigns:
+        st.divider()
+        st.subheader("Campagnes archivées")
+        archived = st.selectbox(
+            "Campagne",
+            archived_campaigns,
+            index=None,
+            format_func=lambda c: f"{c['name']} (archivée le {c['archived_at'][:10]})",
+            placeholder="Choisir une campagne archivée"
+        )
+        if archived:
+            segment = catalog.load_segment(archived['id'])
+            stats = archived.get('statistics', {})
+            st.write(f"**{len(segment['contacts'])} contact(s), {len(segment['results'])} résultat(s), "
+                     f"{stats.get('consent_given', 0)} consentement(s)**")
+            archived_df = CsvHandler.export_results(segment['results'])
+            st.download_button(
+                label="📥 Exporter la campagne archivée",
+                data=archived_df.to_csv(index=False),
+                file_name=f"campagne_{archived['id']}.csv",
+                mime="text/csv",
+                key="export_archived"
+            )
+
 # Footer
 st.divider()
 st.caption("VoiceCheck AI - Hackathon 2024 - Vérification automatisée des contacts")
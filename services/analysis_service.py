@@ -38,9 +38,27 @@ class AnalysisService:
             'success_rate': round(success_rate, 2)
         }
     
-    def get_detailed_results(self) -> List[Dict]:
-        """Résultats détaillés de tous les appels"""
-        return self.db.load_results()
+    def get_detailed_results(self, include_transcripts: bool = False) -> List[Dict]:
+        """Résultats détaillés de tous les appels (transcriptions chargées seulement si demandé)"""
+        return self.db.load_results(include_transcripts=include_transcripts)
+    
+    def get_call_timings(self) -> Dict:
+        """Durées moyennes des appels par état (file, sonnerie, conversation)
+        
+        Calculées à partir des `call_timings` enregistrés avec chaque
+        résultat, pour ajuster les intervalles de polling et l'échéance.
+        """
+        timings = [r['call_timings'] for r in self.db.load_results() if r.get('call_timings')]
+        if not timings:
+            return {}
+        
+        summary = {'calls': len(timings)}
+        for state in ('queued', 'ringing', 'in_progress', 'total', 'polls'):
+            values = [t[state] for t in timings if state in t]
+            if values:
+                summary[f'avg_{state}'] = round(sum(values) / len(values), 2)
+        summary['timed_out'] = sum(1 for t in timings if t.get('timed_out'))
+        return summary
     
     def get_contacts_to_recall(self) -> List[Dict]:
         """Liste des contacts à rappeler (répondeur détecté, pas de consentement, ou identité non confirmée)"""
@@ -51,6 +69,10 @@ class AnalysisService:
         to_recall_ids = set()
         
         for result in results:
+            # Analyse en échec: le transcript existe, un nouvel appel ne servirait à rien
+            if result.get('analysis_error'):
+                continue
+            
             # Rappeler si:
             # - Répondeur détecté (consent=false, identity_confirmed=false, reasoning contient "répondeur")
             # - Pas de réponse (no_response=true)
@@ -78,4 +100,8 @@ class AnalysisService:
                 to_recall_ids.add(result.get('contact_id'))
         
         # Récupère les informations complètes des contacts
-        return [c for c in contacts if c.get('id') in to_recall_ids]
+        return [c for c in contacts if c.get('id') in to_recall_ids and c.get('status') != 'to_analyze']
+    
+    def get_contacts_to_analyze(self) -> List[Dict]:
+        """Contacts appelés dont l'analyse OpenAI a échoué (transcript conservé, à réanalyser)"""
+        return [c for c in self.db.load_contacts() if c.get('status') == 'to_analyze']
@@ -0,0 +1,195 @@
+import asyncio
+import concurrent.futures
+import contextlib
+import itertools
+import threading
+import time
+import openai
+from openai import AsyncOpenAI
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from utils.config import Config
+from services.openai_service import OpenAIService, _is_transient_openai
+from services.rate_limiter import rate_limit_delay, is_quota_exhausted
+from services.resilience import async_resilient_call
+import logging
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class AsyncOpenAIService(OpenAIService):
+    """Analyse de transcripts par lots avec le client OpenAI asynchrone
+
+    Mêmes prompts, règles locales, cache, limite de débit et disjoncteur
+    qu'OpenAIService, mais les requêtes d'un lot partent en parallèle dans
+    une seule boucle d'événements : au plus `max_concurrency` requêtes en
+    cours, chacune bornée par `request_timeout` secondes (un dépassement est
+    une erreur passagère, retentée). Les lectures et écritures du cache
+    d'analyse (fichier) se font hors de la boucle. Les méthodes synchrones
+    héritées restent utilisables.
+
+    BatchAnalyzer envoie par ce service ses requêtes groupées et ses
+    analyses unitaires (session, create_completion, llm_analysis). L'étage
+    d'analyse du dispatcher, synchrone, lui soumet ses transcripts avec
+    `analyze_in_background` : ils partagent une boucle d'événements tenue
+    par un thread dédié, avec un seul client et un seul sémaphore.
+    """
+
+    def __init__(self, max_concurrency: Optional[int] = None, request_timeout: Optional[float] = None):
+        """
+        Args:
+            max_concurrency: Requêtes OpenAI simultanées au maximum
+                (défaut: ANALYSIS_CONCURRENCY dans secrets.toml, 5)
+            request_timeout: Durée maximale d'une requête en secondes
+                (défaut: OPENAI_TIMEOUT dans secrets.toml, 30)
+        """
+        super().__init__()
+        config = Config()
+        self.max_concurrency = max(1, int(max_concurrency or config.get_secret("ANALYSIS_CONCURRENCY", 5)))
+        self.request_timeout = float(request_timeout or config.get_secret("OPENAI_TIMEOUT", 30))
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        self._client: Optional[AsyncOpenAI] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stop: Optional[asyncio.Event] = None
+
+    def analyze_batch(self, items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Point d'entrée synchrone de analyze_many (threads du worker, scripts)"""
+        return asyncio.run(self.analyze_many(items))
+
+    async def analyze_many(self, items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Analyse plusieurs transcripts en parallèle
+
+        Args:
+            items: Dicts avec 'transcript', 'nom' et 'prenom'
+
+        Returns:
+            Un résultat par élément, dans le même ordre (même format
+            qu'analyze_consent_and_identity ; une erreur n'interrompt pas le lot)
+        """
+        started = time.monotonic()
+        async with self.session() as (client, semaphore):
+            results = await asyncio.gather(*(
+                self._analyze(client, semaphore, item['transcript'], item['nom'], item['prenom']) for item in items
+            ))
+        logger.info(f"📦 {len(items)} transcript(s) analysé(s) en {time.monotonic() - started:.1f}s "
+                     f"({self.max_concurrency} requête(s) simultanée(s) au maximum)")
+        return list(results)
+
+    def analyze_in_background(self, transcript: str, nom: str, prenom: str) -> concurrent.futures.Future:
+        """Soumet l'analyse d'un transcript depuis un thread synchrone
+
+        La boucle d'événements du service est démarrée au premier appel ;
+        l'appelant n'est pas bloqué pendant la requête.
+
+        Returns:
+            Future du résultat (même format qu'analyze_consent_and_identity)
+        """
+        self._start_loop()
+        return asyncio.run_coroutine_threadsafe(
+            self._analyze(self._client, self._semaphore, transcript, nom, prenom), self._loop
+        )
+
+    def close(self):
+        """Arrête la boucle d'événements d'analyze_in_background (les analyses soumises sont terminées)"""
+        with self._loop_lock:
+            if self._loop is None:
+                return
+            self._loop.call_soon_threadsafe(self._stop.set)
+            self._loop_thread.join()
+            self._loop = self._loop_thread = self._client = self._semaphore = self._stop = None
+
+    def _start_loop(self):
+        with self._loop_lock:
+            if self._loop is not None:
+                return
+            ready = threading.Event()
+            self._loop_thread = threading.Thread(target=self._run_loop, args=(ready,), name="openai-async", daemon=True)
+            self._loop_thread.start()
+            ready.wait()
+            if self._client is None:
+                self._loop_thread = None
+                raise RuntimeError("Impossible de démarrer la boucle d'analyse OpenAI")
+
+    def _run_loop(self, ready: threading.Event):
+        try:
+            asyncio.run(self._serve(ready))
+        except Exception as e:
+            logger.error(f"❌ Boucle d'analyse OpenAI arrêtée: {str(e)}")
+            logger.exception(e)
+        finally:
+            ready.set()
+
+    async def _serve(self, ready: threading.Event):
+        """Garde une session ouverte jusqu'à close(), puis attend les analyses en cours"""
+        self._stop = asyncio.Event()
+        async with self.session() as (client, semaphore):
+            self._client, self._semaphore = client, semaphore
+            self._loop = asyncio.get_running_loop()
+            ready.set()
+            await self._stop.wait()
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            await asyncio.gather(*pending, return_exceptions=True)
+
+    @contextlib.asynccontextmanager
+    async def session(self) -> AsyncIterator[Tuple[AsyncOpenAI, asyncio.Semaphore]]:
+        """(client, sémaphore de concurrence) partagés par les requêtes d'une boucle d'événements"""
+        # Client lié à la boucle courante: fermé avec elle
+        async with AsyncOpenAI(api_key=Config().OPENAI_API_KEY, max_retries=0, timeout=self.request_timeout) as client:
+            yield client, asyncio.Semaphore(self.max_concurrency)
+
+    async def _analyze(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                       transcript: str, nom: str, prenom: str) -> Dict[str, Any]:
+        # Règles locales et lecture du cache (fichier): hors de la boucle
+        shortcut, cache_key = await asyncio.to_thread(self._shortcut, transcript, nom, prenom)
+        if shortcut is not None:
+            return shortcut
+        return await self.llm_analysis(client, semaphore, transcript, nom, prenom, cache_key)
+
+    async def llm_analysis(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                           transcript: str, nom: str, prenom: str, cache_key: str) -> Dict[str, Any]:
+        """Analyse d'un transcript par OpenAI (une requête), mise en cache si réussie"""
+        logger.info(f"🤖 Appel OpenAI (async) pour analyser transcript (longueur: {len(transcript)} caractères)")
+        try:
+            started = time.monotonic()
+            response = await self.create_completion(client, semaphore, **self.build_request(transcript, nom, prenom))
+            return await asyncio.to_thread(self._parse_response, response, cache_key, time.monotonic() - started)
+        except Exception as e:
+            return self._error_result(e)
+
+    async def create_completion(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore, **kwargs):
+        """Appel chat.completions (au plus max_concurrency en cours) derrière le disjoncteur 'openai'"""
+        async with semaphore:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                return await async_resilient_call(
+                    'openai',
+                    lambda: self._send_completion_async(client, **kwargs),
+                    is_transient=_is_transient_openai
+                )
+            finally:
+                self.in_flight -= 1
+
+    async def _send_completion_async(self, client: AsyncOpenAI, **kwargs):
+        """Appel chat.completions borné par request_timeout, en respectant la limite de débit partagée"""
+        for attempt in itertools.count(1):
+            # Le seau à jetons est partagé avec les threads du processus: attente hors de la boucle
+            await asyncio.to_thread(self.bucket.acquire)
+            try:
+                return await asyncio.wait_for(client.chat.completions.create(**kwargs), self.request_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"Pas de réponse d'OpenAI en {self.request_timeout:.0f}s")
+            except openai.RateLimitError as e:
+                if is_quota_exhausted(e):
+                    raise
+                logger.warning(f"🚦 429 d'OpenAI ({attempt} refus consécutif(s)): requête en attente")
+                self.bucket.pause(rate_limit_delay(e.response.headers.get('retry-after'), attempt))
+
+    def analysis_stats(self) -> Dict[str, Any]:
+        stats = super().analysis_stats()
+        stats.update({'max_concurrency': self.max_concurrency, 'max_in_flight': self.max_in_flight})
+        return stats
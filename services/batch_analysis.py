@@ -0,0 +1,482 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+import logging
+from openai import AsyncOpenAI
+from services.async_openai_service import AsyncOpenAIService
+from services.openai_service import (ANALYSIS_MODEL, ANALYSIS_SCHEMA, response_format,
+                                     parse_json_reply, normalize_verdict)
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+PACKED_SYSTEM_PROMPT = """Tu es un assistant d'analyse de conversations téléphoniques pour la conformité RGPD.
+Tu reçois PLUSIEURS transcripts d'appels. Chacun a un identifiant "id" et le nom du contact attendu.
+Analyse chaque transcript INDÉPENDAMMENT des autres et extrais deux informations critiques.
+
+⚠️ RÈGLE CRITIQUE: DÉTECTION DE RÉPONDEUR/MESSAGERIE VOCALE
+Si tu détectes un répondeur ou une messagerie vocale, tu DOIS mettre consent=false et identity_confirmed=false.
+
+Indices de répondeur/messagerie:
+- Phrases comme: "je ne suis pas disponible", "laissez un message", "rappellerai", "boîte vocale"
+- Message pré-enregistré mentionnant le nom de la personne
+- Marqueur technique: "<Call ended due to voicemail detection>"
+- Pas d'interaction réelle (juste un message enregistré)
+- Aucune réponse aux questions de l'assistant
+
+IMPORTANT: Même si le message du répondeur mentionne le nom du contact attendu, ce n'est PAS une confirmation d'identité car c'est un message pré-enregistré, pas une personne réelle qui répond.
+
+1. CONSENTEMENT RGPD: La PERSONNE RÉELLE a-t-elle explicitement accepté de poursuivre l'échange?
+   - ✅ Acceptation: "oui j'accepte", "oui je consens", "d'accord", "oui", "vas-y"
+   - ❌ Refus: "non", "je refuse", "non merci", "pas intéressé"
+   - ❌ Répondeur: TOUJOURS false si répondeur détecté
+   - ⚠️ Pas clair: null seulement si personne réelle mais réponse ambiguë
+
+2. CONFIRMATION D'IDENTITÉ: La PERSONNE RÉELLE a-t-elle confirmé être le contact attendu?
+   - ✅ Confirmation: "oui c'est moi", "oui", "exact", "confirme", "c'est bien moi"
+   - ❌ Refus: "non ce n'est pas moi", "non", "vous vous trompez"
+   - ❌ Répondeur: TOUJOURS false si répondeur détecté (même si le nom est mentionné)
+   - ⚠️ Pas clair: null seulement si personne réelle mais réponse ambiguë
+
+Réponds UNIQUEMENT avec un JSON valide au format:
+{
+  "results": [
+    {"id": "<id du transcript>", "consent": true/false/null, "identity_confirmed": true/false/null,
+     "reasoning": "explication courte (mentionne 'répondeur détecté' si c'est le cas)"}
+  ]
+}
+avec exactement un objet par transcript reçu.
+"""
+
+# Schéma imposé à la réponse groupée: un verdict (schéma unitaire + id) par transcript
+PACKED_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'results': {
+            'type': 'array',
+            'items': {
+                **ANALYSIS_SCHEMA,
+                'properties': {'id': {'type': 'string'}, **ANALYSIS_SCHEMA['properties']},
+                'required': ['id'] + ANALYSIS_SCHEMA['required']
+            }
+        }
+    },
+    'required': ['results'],
+    'additionalProperties': False
+}
+
+# Jetons de réponse prévus par transcript d'un lot (verdict + raisonnement court)
+TOKENS_PER_ITEM = 100
+
+
+class BatchAnalyzer:
+    """Analyse groupée de transcripts: plusieurs transcripts courts par requête OpenAI
+
+    Pour la réanalyse d'un arriéré ou le traitement de fin de journée, le
+    prompt système n'est envoyé qu'une fois pour `max_items` transcripts,
+    et la réponse est un tableau JSON (un verdict par identifiant). Chaque
+    verdict est validé ; un transcript absent de la réponse, mal formé ou
+    trop long pour un lot est analysé seul (analyse unitaire classique).
+    Les règles locales et le cache d'OpenAIService sont appliqués avant.
+
+    Requêtes groupées et analyses unitaires partent en parallèle sur le
+    client asynchrone d'AsyncOpenAIService, dans une seule boucle
+    d'événements (au plus ANALYSIS_CONCURRENCY requêtes simultanées).
+
+    Le même traitement existe en format fichier (JSONL de requêtes en
+    entrée, JSONL de réponses en sortie, format des lots OpenAI) : voir
+    write_job / serve_job / read_job.
+    """
+
+    def __init__(self, service: Optional[AsyncOpenAIService] = None, max_items: int = 10,
+                 max_chars: int = 8000, max_transcript_chars: int = 2000):
+        """
+        Args:
+            service: AsyncOpenAIService utilisé (requêtes, concurrence, règles locales, cache)
+            max_items: Transcripts au maximum par requête groupée
+            max_chars: Taille cumulée maximale des transcripts d'une requête
+            max_transcript_chars: Au-delà, un transcript est analysé seul
+        """
+        self.service = service or AsyncOpenAIService()
+        self.max_items = max(1, max_items)
+        self.max_chars = max_chars
+        self.max_transcript_chars = max_transcript_chars
+        self.stats = {'items': 0, 'shortcut': 0, 'packed_requests': 0, 'packed_items': 0, 'fallbacks': 0}
+
+    # ------------------------------------------------------------------
+    # Analyse directe
+    # ------------------------------------------------------------------
+
+    def analyze(self, items: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """Analyse des transcripts par lots
+
+        Args:
+            items: Dicts avec 'id' (unique), 'transcript', 'nom' et 'prenom'
+
+        Returns:
+            Un résultat par élément, dans le même ordre (même format
+            qu'analyze_consent_and_identity)
+        """
+        started = time.monotonic()
+        results, pending = self._prepare(items)
+        packs, singles = self._pack(pending)
+        asyncio.run(self._analyze_all(packs, singles, results))
+
+        logger.info(f"📦 {len(items)} transcript(s) analysé(s) en {time.monotonic() - started:.1f}s: "
+                    f"{self.stats['packed_requests']} requête(s) groupée(s), {self.stats['fallbacks']} analyse(s) unitaire(s)")
+        return [results[item['id']] for item in items]
+
+    async def _analyze_all(self, packs: List[List[Dict]], singles: List[Dict], results: Dict[str, Dict]):
+        """Envoie les lots et les analyses unitaires en parallèle ; les verdicts manquants d'un lot sont analysés seuls"""
+        async with self.service.session() as (client, semaphore):
+            async def analyze_pack(pack: List[Dict]):
+                missing = await self._collect(pack, await self._send_pack(client, semaphore, pack), results)
+                await self._analyze_singles(client, semaphore, missing, results)
+
+            await asyncio.gather(self._analyze_singles(client, semaphore, singles, results),
+                                 *(analyze_pack(pack) for pack in packs))
+
+    def _prepare(self, items: List[Dict[str, str]]) -> Tuple[Dict[str, Dict], List[Dict]]:
+        """Applique règles locales et cache ; retourne (résultats déjà connus, éléments à envoyer au LLM)"""
+        results: Dict[str, Dict] = {}
+        pending = []
+        for item in items:
+            self.stats['items'] += 1
+            shortcut, cache_key = self.service._shortcut(item['transcript'], item['nom'], item['prenom'])
+            if shortcut is not None:
+                self.stats['shortcut'] += 1
+                results[item['id']] = shortcut
+            else:
+                pending.append({**item, 'cache_key': cache_key})
+        return results, pending
+
+    def _pack(self, items: List[Dict]) -> Tuple[List[List[Dict]], List[Dict]]:
+        """Répartit les éléments en lots (taille et volume bornés) ; les transcripts trop longs restent seuls"""
+        packs: List[List[Dict]] = []
+        singles = []
+        current: List[Dict] = []
+        size = 0
+        for item in items:
+            length = len(item['transcript'])
+            if length > self.max_transcript_chars:
+                singles.append(item)
+                continue
+            if current and (len(current) >= self.max_items or size + length > self.max_chars):
+                packs.append(current)
+                current, size = [], 0
+            current.append(item)
+            size += length
+        if current:
+            packs.append(current)
+        # Un lot d'un seul transcript n'économise rien: analyse unitaire
+        singles.extend(pack[0] for pack in packs if len(pack) == 1)
+        return [pack for pack in packs if len(pack) > 1], singles
+
+    def build_request(self, pack: List[Dict]) -> Dict[str, Any]:
+        """Corps de la requête chat.completions d'un lot"""
+        sections = [
+            f"### id: {item['id']}\nContact attendu: {item['prenom']} {item['nom']}\nTRANSCRIPT:\n{item['transcript']}"
+            for item in pack
+        ]
+        user_prompt = f"Analyse ces {len(pack)} transcripts d'appel:\n\n" + "\n\n".join(sections)
+        return {
+            'model': ANALYSIS_MODEL,
+            'messages': [
+                {"role": "system", "content": PACKED_SYSTEM_PROMPT},
+                {"role": "user", "content": user_prompt}
+            ],
+            'temperature': 0.1,
+            'max_tokens': TOKENS_PER_ITEM * len(pack),
+            'response_format': response_format('packed_consent_identity_analysis', PACKED_SCHEMA)
+        }
+
+    async def _send_pack(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                         pack: List[Dict]) -> Optional[Tuple[str, float]]:
+        """Envoie un lot ; retourne (contenu de la réponse, durée) ou None si la requête a échoué"""
+        try:
+            started = time.monotonic()
+            response = await self.service.create_completion(client, semaphore, **self.build_request(pack))
+            return response.choices[0].message.content, time.monotonic() - started
+        except Exception as e:
+            logger.error(f"❌ Requête groupée en échec ({len(pack)} transcripts): {str(e)}")
+            return None
+
+    async def _collect(self, pack: List[Dict], verdicts: Optional[Tuple[str, float]],
+                       results: Dict[str, Dict]) -> List[Dict]:
+        """Range les verdicts valides d'un lot ; retourne les éléments à analyser seuls"""
+        self.stats['packed_requests'] += 1
+        if verdicts is None:
+            return list(pack)
+        content, latency = verdicts
+        parsed = parse_packed_response(content, [item['id'] for item in pack])
+        missing = []
+        for item in pack:
+            result = parsed.get(item['id'])
+            if result is None:
+                missing.append(item)
+                continue
+            self.stats['packed_items'] += 1
+            results[item['id']] = result
+            # Écriture du cache (fichier): hors de la boucle
+            await asyncio.to_thread(self.service.cache.put, item['cache_key'], result, latency / len(pack))
+        if missing:
+            logger.warning(f"⚠️ {len(missing)} verdict(s) absent(s) ou invalide(s) dans la réponse groupée: analyse unitaire")
+        return missing
+
+    async def _analyze_singles(self, client: AsyncOpenAI, semaphore: asyncio.Semaphore,
+                               items: List[Dict], results: Dict[str, Dict]):
+        """Analyse unitaire, en parallèle, des éléments qui n'ont pas de verdict groupé"""
+        self.stats['fallbacks'] += len(items)
+        verdicts = await asyncio.gather(*(
+            self.service.llm_analysis(client, semaphore, item['transcript'], item['nom'], item['prenom'], item['cache_key'])
+            for item in items
+        ))
+        for item, verdict in zip(items, verdicts):
+            results[item['id']] = verdict
+
+    def _fallback(self, items: List[Dict], results: Dict[str, Dict]):
+        """Point d'entrée synchrone de _analyze_singles (relecture d'un lot de fichiers)"""
+        async def run():
+            async with self.service.session() as (client, semaphore):
+                await self._analyze_singles(client, semaphore, items, results)
+
+        if items:
+            asyncio.run(run())
+
+    def batch_stats(self) -> Dict[str, Any]:
+        """Transcripts traités, requêtes groupées et requêtes unitaires évitées"""
+        return {**self.stats, 'requests_saved': self.stats['packed_items'] - self.stats['packed_requests']}
+
+    # ------------------------------------------------------------------
+    # Format fichier (JSONL de requêtes / JSONL de réponses)
+    # ------------------------------------------------------------------
+
+    def write_job(self, items: List[Dict[str, str]], path: str) -> Tuple[Dict[str, Dict], List[Dict]]:
+        """Écrit les requêtes groupées d'un lot au format JSONL des lots OpenAI
+
+        Une ligne par requête: {"custom_id", "method", "url", "body"}.
+
+        Returns:
+            (résultats déjà connus par règles locales / cache, éléments envoyés dans le fichier)
+        """
+        results, pending = self._prepare(items)
+        packs, singles = self._pack(pending)
+        with open(path, 'w', encoding='utf-8') as f:
+            for index, pack in enumerate(packs + [[item] for item in singles]):
+                f.write(json.dumps({
+                    'custom_id': f"request-{index}",
+                    'method': 'POST',
+                    'url': '/v1/chat/completions',
+                    'body': self.build_request(pack)
+                }, ensure_ascii=False) + '\n')
+        logger.info(f"📝 Lot écrit: {path} ({len(packs) + len(singles)} requête(s), {len(pending)} transcript(s))")
+        return results, pending
+
+    def serve_job(self, input_path: str, output_path: str) -> int:
+        """Exécute localement un fichier de requêtes (remplaçant local de l'API des lots)
+
+        Chaque ligne de sortie suit le format des lots OpenAI:
+        {"custom_id", "response": {"status_code", "body"}, "error"}.
+
+        Returns:
+            Le nombre de requêtes exécutées
+        """
+        with open(input_path, 'r', encoding='utf-8') as f:
+            requests_ = [json.loads(line) for line in f if line.strip()]
+
+        async def execute(client: AsyncOpenAI, semaphore: asyncio.Semaphore, request: Dict) -> Dict:
+            try:
+                response = await self.service.create_completion(client, semaphore, **request['body'])
+                return {'custom_id': request['custom_id'],
+                        'response': {'status_code': 200, 'body': response.model_dump()}, 'error': None}
+            except Exception as e:
+                return {'custom_id': request['custom_id'], 'response': None,
+                        'error': {'code': type(e).__name__, 'message': str(e)}}
+
+        async def execute_all() -> List[Dict]:
+            async with self.service.session() as (client, semaphore):
+                return await asyncio.gather(*(execute(client, semaphore, request) for request in requests_))
+
+        lines = asyncio.run(execute_all())
+        with open(output_path, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(json.dumps(line, ensure_ascii=False) + '\n')
+        logger.info(f"✅ Lot exécuté: {output_path} ({len(lines)} requête(s))")
+        return len(lines)
+
+    def read_job(self, output_path: str, items: List[Dict[str, str]], results: Dict[str, Dict],
+                 pending: List[Dict]) -> List[Dict[str, Any]]:
+        """Relit les réponses d'un lot, valide chaque verdict et analyse seuls les transcripts manquants
+
+        Args:
+            items: Éléments d'origine (pour l'ordre des résultats)
+            results, pending: Valeurs retournées par write_job
+        """
+        by_id = {item['id']: item for item in pending}
+        with open(output_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                response = (json.loads(line).get('response') or {})
+                if response.get('status_code') != 200:
+                    continue
+                self.stats['packed_requests'] += 1
+                content = response['body']['choices'][0]['message']['content']
+                for item_id, result in parse_packed_response(content, list(by_id)).items():
+                    if item_id in by_id and item_id not in results:
+                        self.stats['packed_items'] += 1
+                        results[item_id] = result
+                        self.service.cache.put(by_id[item_id]['cache_key'], result, 0)
+        self._fallback([item for item in pending if item['id'] not in results], results)
+        return [results[item['id']] for item in items]
+
+    def run_job(self, items: List[Dict[str, str]], job_dir: str) -> List[Dict[str, Any]]:
+        """Écrit, exécute localement puis relit un lot de fichiers dans `job_dir`"""
+        os.makedirs(job_dir, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        input_path = os.path.join(job_dir, f"batch-{stamp}.requests.jsonl")
+        output_path = os.path.join(job_dir, f"batch-{stamp}.responses.jsonl")
+        results, pending = self.write_job(items, input_path)
+        self.serve_job(input_path, output_path)
+        return self.read_job(output_path, items, results, pending)
+
+
+def parse_packed_response(content: str, expected_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """Verdicts valides d'une réponse groupée, par identifiant
+
+    Un verdict est retenu s'il porte un identifiant attendu (une seule
+    fois) et des valeurs true/false/null (éventuellement en texte) pour
+    consent et identity_confirmed. Une réponse à un seul transcript au format
+    unitaire ({"consent", ...} sans tableau) est aussi acceptée.
+    """
+    try:
+        data, _ = parse_json_reply(content)
+    except ValueError:
+        logger.error(f"❌ Réponse groupée illisible: {str(content)[:200]}")
+        return {}
+    if isinstance(data, dict) and 'results' not in data and len(expected_ids) == 1:
+        data = {'results': [{**data, 'id': expected_ids[0]}]}
+    entries = data.get('results') if isinstance(data, dict) else data
+    if not isinstance(entries, list):
+        return {}
+
+    verdicts: Dict[str, Dict[str, Any]] = {}
+    seen = set()
+    for entry in entries:
+        if not isinstance(entry, dict):
+            continue
+        item_id = str(entry.get('id'))
+        if item_id in seen:
+            # Deux verdicts pour un même transcript: aucun n'est fiable
+            verdicts.pop(item_id, None)
+            continue
+        seen.add(item_id)
+        if item_id not in expected_ids:
+            continue
+        try:
+            verdict, _ = normalize_verdict(entry)
+        except ValueError:
+            continue
+        verdict.pop('id', None)
+        verdicts[item_id] = verdict
+    return verdicts
+
+
+# ----------------------------------------------------------------------
+# Réanalyse des contacts 'to_analyze' d'une campagne
+# ----------------------------------------------------------------------
+
+def reanalyze_campaign(db, analyzer: BatchAnalyzer, job_dir: Optional[str] = None) -> Dict[str, int]:
+    """Réanalyse les transcripts des contacts dont l'analyse OpenAI avait échoué
+
+    Le dernier résultat de chaque contact 'to_analyze' est corrigé sur place
+    (aucun nouvel appel n'est compté) et le statut du contact recalculé.
+    """
+    from services.campaign_dispatcher import CampaignDispatcher
+
+    contacts = {c['id']: c for c in db.load_contacts() if c.get('status') == 'to_analyze'}
+    latest: Dict[str, Dict] = {}
+    for result in db.load_results(include_transcripts=True):
+        if result.get('contact_id') in contacts and result.get('call_sid') and result.get('transcription'):
+            latest[result['contact_id']] = result
+    items = [{'id': r['call_sid'], 'transcript': r['transcription'], 'nom': contacts[cid]['nom'],
+              'prenom': contacts[cid]['prenom']} for cid, r in latest.items()]
+    if not items:
+        logger.info("🤖 Aucun contact à réanalyser")
+        return {'to_analyze': len(contacts), 'reanalyzed': 0, 'still_failing': 0}
+
+    verdicts = analyzer.run_job(items, job_dir) if job_dir else analyzer.analyze(items)
+    updates = {}
+    for item, verdict in zip(items, verdicts):
+        if verdict.get('analysis_error'):
+            continue
+        updates[item['id']] = {
+            'consent': verdict.get('consent'),
+            'identity_confirmed': verdict.get('identity_confirmed'),
+            'reasoning': verdict.get('reasoning', ''),
+            'no_response': False,
+            'analysis_error': False,
+            'reanalyzed_at': datetime.now().isoformat()
+        }
+    db.update_results(updates)
+    # Une écriture par statut pour tout le lot, au lieu d'une par contact
+    by_status: Dict[str, List[str]] = {}
+    for contact_id, result in latest.items():
+        if result['call_sid'] in updates:
+            status = CampaignDispatcher.contact_status({**result, **updates[result['call_sid']]})
+            by_status.setdefault(status, []).append(contact_id)
+    for status, contact_ids in by_status.items():
+        db.bulk_update_status(contact_ids, status)
+
+    report = {'to_analyze': len(contacts), 'reanalyzed': len(updates), 'still_failing': len(items) - len(updates)}
+    logger.info(f"🤖 Réanalyse terminée: {report}")
+    return report
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Analyse groupée en ligne de commande
+
+        python -m services.batch_analysis reanalyze [--campaign ID] [--job-dir DIR]
+        python -m services.batch_analysis run transcripts.jsonl verdicts.jsonl
+
+    `run` lit un JSONL de transcripts ({"id", "transcript", "nom", "prenom"})
+    et écrit un JSONL de verdicts ({"id", "consent", "identity_confirmed", "reasoning"}).
+    """
+    parser = argparse.ArgumentParser(prog="python -m services.batch_analysis", description=main.__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    reanalyze = commands.add_parser('reanalyze', help="Réanalyse les contacts 'to_analyze' d'une campagne")
+    reanalyze.add_argument('--campaign', help="Campagne (défaut: campagne active)")
+    reanalyze.add_argument('--job-dir', help="Passe par un lot de fichiers JSONL dans ce dossier")
+    run = commands.add_parser('run', help="Analyse un fichier JSONL de transcripts")
+    run.add_argument('input')
+    run.add_argument('output')
+    run.add_argument('--job-dir', help="Passe par un lot de fichiers JSONL dans ce dossier")
+    for command in (reanalyze, run):
+        command.add_argument('--max-items', type=int, default=10, help="Transcripts par requête groupée")
+    args = parser.parse_args(argv)
+
+    analyzer = BatchAnalyzer(max_items=args.max_items)
+    if args.command == 'reanalyze':
+        from utils.database import create_database
+        db = create_database(campaign_id=args.campaign)
+        print(json.dumps(reanalyze_campaign(db, analyzer, args.job_dir), ensure_ascii=False))
+    else:
+        with open(args.input, 'r', encoding='utf-8') as f:
+            items = [json.loads(line) for line in f if line.strip()]
+        for item in items:
+            item['id'] = str(item['id'])
+        verdicts = analyzer.run_job(items, args.job_dir) if args.job_dir else analyzer.analyze(items)
+        with open(args.output, 'w', encoding='utf-8') as f:
+            for item, verdict in zip(items, verdicts):
+                f.write(json.dumps({'id': item['id'], **verdict}, ensure_ascii=False) + '\n')
+    print(json.dumps(analyzer.batch_stats()))
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(main())
@@ -0,0 +1,171 @@
+import random
+import time
+import logging
+from typing import Dict, Optional
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RINGING = 'ringing'
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+FINAL_STATES = (COMPLETED, FAILED)
+
+# Statuts renvoyés par Bland (API ou webhook) -> état du cycle de vie
+STATUS_MAP = {
+    'queued': QUEUED, 'new': QUEUED, 'pending': QUEUED,
+    'ringing': RINGING, 'initiated': RINGING, 'dialing': RINGING,
+    'in-progress': IN_PROGRESS, 'in_progress': IN_PROGRESS, 'started': IN_PROGRESS,
+    'answered': IN_PROGRESS, 'ongoing': IN_PROGRESS, 'active': IN_PROGRESS,
+    'completed': COMPLETED, 'done': COMPLETED, 'finished': COMPLETED,
+    'failed': FAILED, 'error': FAILED, 'busy': FAILED, 'no-answer': FAILED,
+    'canceled': FAILED, 'cancelled': FAILED
+}
+
+# Intervalle de polling par état: (intervalle initial, intervalle maximal) en secondes.
+# L'intervalle croît de `backoff` à chaque vérification sans changement d'état.
+# Pendant la conversation, le plafond borne le retard de détection de la fin
+# d'appel, pendant lequel l'appel garde sa place parmi les appels simultanés.
+POLL_POLICY = {
+    QUEUED: (2, 10),
+    RINGING: (2, 10),
+    IN_PROGRESS: (5, 10)
+}
+
+
+class CallLifecycle:
+    """Cycle de vie d'un appel: queued → ringing → in_progress → completed/failed
+
+    L'intervalle de polling dépend de l'état observé: court tant que
+    l'appel est en file ou sonne, puis croissant (backoff exponentiel avec
+    jitter, plafonné à 10s) pendant la conversation. L'échéance est dérivée de la durée
+    maximale de l'appel (`max_duration`, en minutes, la même valeur que
+    celle passée à make_call) plus le temps de sonnerie. Le temps passé
+    dans chaque état est enregistré pour pouvoir ajuster ces réglages.
+    """
+
+    def __init__(self, call_id: Optional[str], max_duration: int = 12,
+                 ring_timeout: float = 60, grace_period: float = 30,
+                 backoff: float = 1.5, jitter: float = 0.2, interval_scale: float = 1.0):
+        """
+        Args:
+            call_id: Identifiant Bland de l'appel
+            max_duration: Durée maximale de la conversation, en minutes
+            ring_timeout: Temps de file d'attente et de sonnerie toléré, en secondes
+            grace_period: Délai supplémentaire pour la mise à disposition du transcript
+            backoff: Facteur multiplicatif de l'intervalle à chaque vérification
+            jitter: Variation aléatoire relative de l'intervalle (0.2 = ±20%)
+            interval_scale: Facteur appliqué à POLL_POLICY (tests, réglages)
+        """
+        self.call_id = call_id
+        self.max_duration = max_duration
+        self.ring_timeout = ring_timeout
+        self.grace_period = grace_period
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval_scale = interval_scale
+
+        now = time.monotonic()
+        self.state = QUEUED
+        self.created_at = now
+        self._entered_at = {QUEUED: now}
+        self._durations: Dict[str, float] = {}
+        self._polls_in_state = 0
+        self.polls = 0
+
+    # ------------------------------------------------------------------
+    # Transitions
+    # ------------------------------------------------------------------
+
+    def observe(self, call_status: Dict) -> str:
+        """Met à jour l'état à partir de l'objet d'un appel (réponse de l'API ou callback)
+
+        Un statut inconnu laisse l'état inchangé.
+
+        Returns:
+            L'état courant
+        """
+        status = call_status.get('status') or ''
+        if not isinstance(status, str):
+            logger.error(f"❌ Statut illisible pour l'appel {self.call_id} (numéro invalide?): {status!r}")
+            self.transition(FAILED)
+            return self.state
+        state = STATUS_MAP.get(status.lower())
+        if call_status.get('completed') is True:
+            state = COMPLETED
+        if state is not None:
+            self.transition(state)
+        return self.state
+
+    def transition(self, state: str):
+        """Passe dans un nouvel état (les états finaux sont définitifs)"""
+        if state == self.state or self.state in FINAL_STATES:
+            return
+        now = time.monotonic()
+        self._durations[self.state] = self._durations.get(self.state, 0) + now - self._entered_at[self.state]
+        self._entered_at[state] = now
+        logger.debug(f"📶 Appel {self.call_id}: {self.state} -> {state}")
+        self.state = state
+        self._polls_in_state = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.state in FINAL_STATES
+
+    # ------------------------------------------------------------------
+    # Polling et échéance
+    # ------------------------------------------------------------------
+
+    @property
+    def deadline(self) -> float:
+        """Instant (time.monotonic) au-delà duquel l'appel est abandonné
+
+        Une fois la conversation commencée, l'échéance part de son début ;
+        avant, elle inclut le temps de sonnerie toléré.
+        """
+        talk_time = self.max_duration * 60 + self.grace_period
+        if IN_PROGRESS in self._entered_at:
+            return self._entered_at[IN_PROGRESS] + talk_time
+        return self.created_at + self.ring_timeout + talk_time
+
+    def remaining(self) -> float:
+        """Secondes restantes avant l'échéance"""
+        return max(0.0, self.deadline - time.monotonic())
+
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def next_poll_interval(self) -> float:
+        """Intervalle avant la prochaine vérification, selon l'état courant
+
+        Compte la vérification: l'intervalle suivant dans le même état sera plus long.
+        """
+        initial, maximum = POLL_POLICY.get(self.state, POLL_POLICY[IN_PROGRESS])
+        interval = min(maximum, initial * self.backoff ** self._polls_in_state)
+        # Le jitter ne dépasse jamais le plafond de l'état
+        interval = min(maximum, interval * random.uniform(1 - self.jitter, 1 + self.jitter)) * self.interval_scale
+        self._polls_in_state += 1
+        self.polls += 1
+        return min(interval, self.remaining())
+
+    # ------------------------------------------------------------------
+    # Mesures
+    # ------------------------------------------------------------------
+
+    def timings(self) -> Dict:
+        """Temps passé dans chaque état (secondes), durée totale et nombre de vérifications"""
+        now = time.monotonic()
+        durations = dict(self._durations)
+        if not self.finished:
+            durations[self.state] = durations.get(self.state, 0) + now - self._entered_at[self.state]
+        end = self._entered_at.get(self.state, now) if self.finished else now
+        return {
+            **{state: round(seconds, 2) for state, seconds in durations.items()},
+            'total': round(end - self.created_at, 2),
+            'final_state': self.state,
+            'timed_out': not self.finished,
+            'polls': self.polls
+        }
@@ -0,0 +1,616 @@
+import os
+import queue
+import threading
+import time
+import logging
+from typing import Dict, List, Iterator, Optional, Tuple
+from utils.database import StatusUpdateBatch
+from utils.call_journal import FINISHED
+from utils.dispatch_ledger import CLAIMED, PLACED, RELEASED, dispatch_key, is_stale
+from services.call_lifecycle import CallLifecycle, FAILED
+from services.rate_limiter import get_bucket
+from services.resilience import get_breaker
+from services.pipeline import Stage
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Secondes d'attente (réouverture du circuit) après lesquelles la réservation d'un
+# lancement est renouvelée avant d'envoyer la requête (voir dispatch_ledger.CLAIM_TIMEOUT)
+CLAIM_RENEWAL = 60
+
+
+class CampaignDispatcher:
+    """Exécute les appels d'une campagne avec plusieurs appels simultanés
+
+    La campagne est un pipeline de quatre étages reliés par des files
+    bornées (voir services.pipeline.Stage) :
+
+        appel (dial) → suivi (track) → analyse (analyze) → sauvegarde (persist)
+
+    Jusqu'à `max_concurrent_calls` appels sont en cours en même temps (un
+    thread de suivi par appel). L'analyse OpenAI et les écritures disque
+    ont leurs propres threads : un appel terminé libère aussitôt sa place
+    pour le contact suivant, même si l'analyse est lente. Un seul thread
+    écrit les résultats et statuts, un seul résultat par contact.
+
+    Avec un AsyncOpenAIService, l'étage d'analyse ne fait que soumettre les
+    transcripts au client asynchrone (analyze_in_background) : jusqu'à
+    `max_concurrency` analyses sont en cours sans occuper de thread.
+    """
+
+    FIRST_SENTENCE = "Bonjour, je suis une assistante virtuelle de VoiceCheck AI."
+
+    def __init__(self, blend_service, openai_service, db,
+                 max_concurrent_calls: int = 5,
+                 max_duration: int = 12,
+                 ring_timeout: float = 60,
+                 poll_interval_scale: float = 1.0,
+                 webhook_receiver=None,
+                 webhook_url: Optional[str] = None,
+                 fallback_poll_interval: float = 30,
+                 circuit_wait: float = 300,
+                 dial_workers: int = 2,
+                 analysis_workers: int = 2,
+                 queue_size: Optional[int] = None,
+                 campaign_id: Optional[str] = None):
+        """
+        Args:
+            blend_service: BlendService utilisé pour passer les appels
+            openai_service: OpenAIService (ou AsyncOpenAIService) utilisé pour analyser les transcripts
+            db: Base de la campagne active (JsonDatabase ou SqliteDatabase)
+            max_concurrent_calls: Nombre maximal d'appels simultanés
+            max_duration: Durée maximale d'un appel en minutes (transmise à Bland,
+                et base de l'échéance du suivi de l'appel)
+            ring_timeout: Temps de file d'attente et de sonnerie toléré, en secondes
+            poll_interval_scale: Facteur appliqué aux intervalles de polling de CallLifecycle
+            webhook_receiver: CallWebhookReceiver recevant les fins d'appel (None = polling seul)
+            webhook_url: URL publique du récepteur, transmise à Bland dans make_call
+            fallback_poll_interval: Secondes entre deux vérifications de secours
+                quand un récepteur de webhooks est utilisé
+            circuit_wait: Secondes d'attente maximale de la réouverture de Bland quand
+                son circuit est ouvert ; au-delà, la campagne est suspendue et les
+                contacts restants ne sont pas appelés
+            dial_workers: Threads de l'étage d'appel
+            analysis_workers: Threads de l'étage d'analyse OpenAI (avec un
+                AsyncOpenAIService, ils ne font que soumettre les analyses)
+            queue_size: Taille des files d'analyse et de sauvegarde (défaut: 10 × max_concurrent_calls) ;
+                une file pleine ralentit l'étage précédent
+            campaign_id: Campagne des contacts, partie de la clé d'idempotence des
+                appels (défaut: nom du dossier de la base)
+        """
+        self.blend_service = blend_service
+        self.openai_service = openai_service
+        self.db = db
+        self.max_concurrent_calls = max(1, max_concurrent_calls)
+        self.max_duration = max_duration
+        self.ring_timeout = ring_timeout
+        self.poll_interval_scale = poll_interval_scale
+        self.webhook_receiver = webhook_receiver
+        self.webhook_url = webhook_url if webhook_receiver else None
+        self.fallback_poll_interval = fallback_poll_interval
+        self.circuit_wait = circuit_wait
+        self.breaker = get_breaker('bland')
+        self.dial_workers = dial_workers
+        self.analysis_workers = analysis_workers
+        self.queue_size = queue_size or 10 * self.max_concurrent_calls
+        self.suspended = threading.Event()
+        self.cancelled = threading.Event()
+        self.campaign_id = campaign_id or os.path.basename(os.path.normpath(db.data_dir))
+        self.stages: Dict[str, Stage] = {}
+        # Analyses soumises au client asynchrone, bornées par sa concurrence
+        self.async_analysis = hasattr(openai_service, 'analyze_in_background')
+        self._analysis_slots = threading.BoundedSemaphore(getattr(openai_service, 'max_concurrency', 1))
+        self._pending_analyses = 0
+        self._analyses_done = threading.Condition()
+        # Fins d'appel détectées par webhook / par polling, requêtes de polling,
+        # et lancements en double évités par le registre d'idempotence
+        self.stats = {'webhook': 0, 'polling': 0, 'poll_requests': 0, 'deduplicated': 0, 'rate_limited': 0}
+        self._stats_lock = threading.Lock()
+        # Tentative de chaque contact, figée au début du lancement (voir _dial)
+        self._attempts: Dict[str, int] = {}
+        # Appels dont le résultat est sauvegardé, clos dans le journal après l'écriture de leur statut
+        self._finished_calls: List[str] = []
+
+    def dispatch(self, contacts: List[Dict], resumed_calls: Optional[List[Tuple[Dict, Dict]]] = None) -> Iterator[Dict]:
+        """Appelle tous les contacts et persiste chaque résultat dès qu'il est prêt
+
+        Args:
+            contacts: Contacts à appeler
+            resumed_calls: (contact, appel journalisé) des appels lancés avant un
+                arrêt du processus : ils sont suivis jusqu'à leur fin, sans rappeler
+
+        Yields:
+            Pour chaque contact, dans l'ordre de fin des traitements:
+            {'contact', 'result' (None si l'appel n'a pas pu être lancé),
+             'error' (message ou None), 'completed', 'total'}
+        """
+        resumed_calls = resumed_calls or []
+        total = len(contacts) + len(resumed_calls)
+        logger.info(f"🚀 Lancement de {len(contacts)} appel(s) et reprise de {len(resumed_calls)} appel(s) en cours, "
+                    f"{self.max_concurrent_calls} simultané(s) au maximum")
+
+        results_count = self.db.count_results_by_contact()
+        self._attempts = {contact['id']: results_count.get(contact['id'], 0) for contact in contacts}
+        self._outcomes: queue.Queue = queue.Queue()
+        self._call_slots = threading.BoundedSemaphore(self.max_concurrent_calls)
+        self._aborted = threading.Event()
+        self._status_updates = StatusUpdateBatch(self.db, on_flush=self._close_finished_calls)
+        self.stages = {
+            'dial': Stage('dial', self._dial_stage, self.dial_workers, self.queue_size, self._stage_error),
+            'track': Stage('track', self._track_stage, self.max_concurrent_calls, self.max_concurrent_calls,
+                           self._stage_error),
+            'analyze': Stage('analyze', self._analyze_stage, self.analysis_workers, self.queue_size, self._stage_error),
+            'persist': Stage('persist', self._persist_stage, 1, self.queue_size, self._stage_error)
+        }
+        for stage in self.stages.values():
+            stage.start()
+        feeder = threading.Thread(target=self._feed, args=(contacts, resumed_calls), name="dispatch-feeder", daemon=True)
+        feeder.start()
+
+        completed = 0
+        try:
+            while completed < total:
+                outcome = self._outcomes.get()
+                completed += 1
+                outcome.update({'completed': completed, 'total': total})
+                yield outcome
+        finally:
+            if completed < total:
+                # Abandon par l'appelant: les appels en cours restent ouverts dans le journal
+                self.cancel()
+                self._aborted.set()
+                for stage in self.stages.values():
+                    stage.abort()
+                self.stages['persist'].join()
+            else:
+                feeder.join()
+                for name in ('dial', 'track', 'analyze'):
+                    self.stages[name].close()
+                self._wait_analyses()
+                self.stages['persist'].close()
+            self._status_updates.flush()
+            logger.info(f"📊 Fins d'appel: {self.stats['webhook']} par webhook, {self.stats['polling']} par polling "
+                        f"({self.stats['poll_requests']} requête(s) de polling)")
+
+    def pipeline_stats(self) -> Dict[str, Dict]:
+        """Profondeur de file, attente et durée de traitement de chaque étage"""
+        return {name: stage.stats() for name, stage in self.stages.items()}
+
+    # ------------------------------------------------------------------
+    # Étages du pipeline
+    # ------------------------------------------------------------------
+
+    def _feed(self, contacts: List[Dict], resumed_calls: List[Tuple[Dict, Dict]]):
+        """Alimente le pipeline: appels repris d'abord (déjà payés), puis contacts à appeler"""
+        for contact, call in resumed_calls:
+            if not self._acquire_call_slot():
+                return
+            if not self.stages['track'].put({'contact': contact, 'call_id': call['call_id']}):
+                return
+        for contact in contacts:
+            if not self.stages['dial'].put({'contact': contact}):
+                return
+
+    def _acquire_call_slot(self) -> bool:
+        """Attend une place parmi les `max_concurrent_calls` appels simultanés"""
+        while not self._aborted.is_set():
+            if self._call_slots.acquire(timeout=0.5):
+                return True
+        return False
+
+    def _emit(self, contact: Dict, result: Optional[Dict] = None, error: Optional[str] = None):
+        self._outcomes.put({'contact': contact, 'result': result, 'error': error})
+
+    def _stage_error(self, job: Dict, error: Exception):
+        logger.error(f"❌ Erreur pour le contact {job['contact']['id']}: {str(error)}")
+        self._emit(job['contact'], error=str(error))
+
+    def _dial_stage(self, job: Dict):
+        contact = job['contact']
+        if self.cancelled.is_set():
+            self._emit(contact, error="Campagne annulée, contact laissé en attente")
+            return
+        if not self._acquire_call_slot():
+            return
+        try:
+            call_id, error = self._dial(contact)
+        except Exception:
+            self._call_slots.release()
+            raise
+        if error is not None:
+            self._call_slots.release()
+            self._emit(contact, error=error)
+            return
+        self.stages['track'].put({'contact': contact, 'call_id': call_id})
+
+    def _track_stage(self, job: Dict):
+        try:
+            result, transcript = self._track(job['contact'], job['call_id'])
+        finally:
+            # L'appel est terminé: sa place revient au contact suivant, sans attendre l'analyse
+            self._call_slots.release()
+        job.update({'result': result, 'transcript': transcript})
+        self.stages['analyze' if transcript else 'persist'].put(job)
+
+    def _analyze_stage(self, job: Dict):
+        if self.async_analysis:
+            self._submit_analysis(job)
+            return
+        self._analyze(job['contact'], job['result'], job['transcript'])
+        self.stages['persist'].put(job)
+
+    def _submit_analysis(self, job: Dict):
+        """Confie l'analyse au client asynchrone ; le résultat rejoint l'étage de sauvegarde à sa fin"""
+        contact = job['contact']
+        # Contre-pression: l'étage attend une place parmi les analyses en cours
+        self._analysis_slots.acquire()
+        with self._analyses_done:
+            self._pending_analyses += 1
+        logger.info(f"🤖 Début de l'analyse OpenAI pour {contact['prenom']} {contact['nom']}")
+        try:
+            future = self.openai_service.analyze_in_background(job['transcript'], contact['nom'], contact['prenom'])
+        except Exception:
+            self._analysis_finished()
+            raise
+        future.add_done_callback(lambda done: self._analysis_done(job, done))
+
+    def _analysis_done(self, job: Dict, future):
+        try:
+            self._apply_analysis(job['result'], future.result())
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'analyse OpenAI: {str(e)}")
+            logger.exception(e)
+            job['result']['error'] = str(e)
+        finally:
+            self._analysis_finished()
+        self.stages['persist'].put(job)
+
+    def _analysis_finished(self):
+        self._analysis_slots.release()
+        with self._analyses_done:
+            self._pending_analyses -= 1
+            self._analyses_done.notify_all()
+
+    def _wait_analyses(self):
+        """Attend la fin des analyses soumises au client asynchrone"""
+        with self._analyses_done:
+            self._analyses_done.wait_for(lambda: self._pending_analyses == 0)
+
+    def _persist_stage(self, job: Dict):
+        self._persist(job['result'], self._status_updates)
+        self._emit(job['contact'], result=job['result'])
+
+    def cancel(self):
+        """Ne lance plus de nouveaux appels ; les appels en cours sont menés à terme et sauvegardés"""
+        self.cancelled.set()
+
+    def _persist(self, result: Dict, status_updates: StatusUpdateBatch):
+        """Sauvegarde le résultat et met à jour le statut du contact"""
+        contact_id = result['contact_id']
+        logger.info(f"💾 Sauvegarde du résultat pour contact {contact_id}")
+        self.db.save_result(result)
+
+        status = self.contact_status(result)
+        if status == 'to_analyze':
+            logger.info(f"🤖 Contact {contact_id} marqué comme 'to_analyze' (analyse OpenAI en échec, transcript conservé)")
+        elif status == 'completed':
+            logger.info(f"✅ Contact {contact_id} marqué comme 'completed' (consent + identity OK)")
+        else:
+            logger.info(f"⏸️ Contact {contact_id} reste en 'pending' (consent={result.get('consent')}, identity={result.get('identity_confirmed')})")
+        if result.get('call_sid'):
+            self._finished_calls.append(result['call_sid'])
+        status_updates.add(contact_id, status)
+
+    @staticmethod
+    def contact_status(result: Dict) -> str:
+        """Statut du contact après un appel: 'completed', 'to_analyze' ou 'pending'"""
+        if result.get('analysis_error'):
+            return 'to_analyze'
+        if result.get('identity_confirmed') and result.get('consent'):
+            return 'completed'
+        return 'pending'
+
+    def _close_finished_calls(self):
+        """Clôt dans le journal les appels dont le résultat et le statut sont écrits"""
+        for call_id in self._finished_calls:
+            self.db.update_call_state(call_id, FINISHED)
+        self._finished_calls = []
+
+    def reconcile(self, inflight_calls: List[Dict]) -> List[Tuple[Dict, Dict]]:
+        """Trie les appels restés ouverts dans le journal après un arrêt du processus
+
+        Un appel dont le résultat a déjà été sauvegardé est clos (et le
+        statut de son contact réécrit) ; un appel dont le contact n'existe
+        plus est abandonné. Les autres sont à reprendre.
+
+        Returns:
+            (contact, appel journalisé) des appels à suivre jusqu'à leur fin
+        """
+        if not inflight_calls:
+            return []
+        saved = {r.get('call_sid'): r for r in self.db.load_results() if r.get('call_sid')}
+        contacts = {c['id']: c for c in self.db.load_contacts()}
+        to_resume = []
+        for call in inflight_calls:
+            call_id, contact_id = call['call_id'], call.get('contact_id')
+            if call_id in saved:
+                logger.info(f"🔁 Appel {call_id} déjà sauvegardé: réconcilié sans nouvel appel")
+                self.db.update_contact_status(contact_id, self.contact_status(saved[call_id]))
+                self.db.update_call_state(call_id, FINISHED, reconciled=True)
+            elif contact_id not in contacts:
+                logger.warning(f"⚠️ Appel {call_id}: contact {contact_id} introuvable, appel abandonné")
+                self.db.update_call_state(call_id, FINISHED, reconciled=True)
+            else:
+                logger.info(f"🔁 Reprise du suivi de l'appel {call_id} (contact {contact_id}, lancé le {call.get('dispatched_at')})")
+                to_resume.append((contacts[contact_id], call))
+        return to_resume
+
+    # ------------------------------------------------------------------
+    # Traitement d'un contact
+    # ------------------------------------------------------------------
+
+    def process_contact(self, contact: Dict) -> Tuple[Optional[Dict], Optional[str]]:
+        """Appelle un contact, attend le transcript et l'analyse (sans passer par le pipeline)
+
+        Returns:
+            (résultat à sauvegarder, None), ou (None, message d'erreur) si
+            l'appel n'a pas pu être lancé
+        """
+        if self.cancelled.is_set():
+            return None, "Campagne annulée, contact laissé en attente"
+        call_id, error = self._dial(contact)
+        if error is not None:
+            return None, error
+        return self.follow_call(contact, call_id)
+
+    def follow_call(self, contact: Dict, call_id: Optional[str]) -> Tuple[Optional[Dict], Optional[str]]:
+        """Attend la fin d'un appel lancé, récupère le transcript et l'analyse
+
+        Returns:
+            (résultat à sauvegarder, None)
+        """
+        result, transcript = self._track(contact, call_id)
+        if transcript:
+            self._analyze(contact, result, transcript)
+        return result, None
+
+    def _dial(self, contact: Dict) -> Tuple[Optional[str], Optional[str]]:
+        """Lance l'appel et le journalise
+
+        Le lancement est idempotent: la clé (campagne, contact, tentative) est
+        réservée dans le registre des lancements avant l'appel et transmise à
+        Bland dans les métadonnées. Un second lancement de la même tentative
+        retrouve l'appel déjà passé au lieu d'en payer un nouveau. Une
+        réservation restée sans call_id (arrêt pendant le lancement) n'est
+        reprise qu'une fois périmée et après vérification chez Bland, par la
+        clé, qu'aucun appel n'a été passé.
+
+        Returns:
+            (call_id, None), ou (None, message d'erreur) si l'appel n'a pas pu être lancé
+        """
+        # Tentative = résultats déjà sauvegardés + 1, comptés au début du lancement : un
+        # lancement en double parti de la même liste de contacts retrouve la même clé
+        if contact['id'] not in self._attempts:
+            self._attempts[contact['id']] = self.db.count_results_by_contact().get(contact['id'], 0)
+        key = dispatch_key(self.campaign_id, contact['id'], self._attempts[contact['id']] + 1)
+        existing = self.db.claim_dispatch(key, contact['id'])
+        if existing is not None and not existing.get('call_id') and is_stale(existing):
+            existing = self._reconcile_claim(key, contact, existing)
+        if existing is not None:
+            self._count('deduplicated')
+            call_id = existing.get('call_id')
+            if call_id and any(r.get('call_sid') == call_id for r in self.db.load_results()):
+                logger.warning(f"🔁 Lancement {key} déjà effectué et sauvegardé: appel en double ignoré")
+                return None, "Contact déjà appelé (résultat sauvegardé), lancement en double ignoré"
+            if call_id and not any(c['call_id'] == call_id for c in self.db.get_inflight_calls()):
+                # Arrêt entre le lancement et la journalisation: l'appel passé est suivi, pas relancé
+                logger.warning(f"🔁 Lancement {key} déjà effectué: suivi de l'appel {call_id}, sans nouvel appel")
+                self.db.journal_call(contact['id'], call_id, dispatch_key=key)
+                return call_id, None
+            logger.warning(f"🔁 Lancement {key} déjà en cours ailleurs: appel en double ignoré")
+            return None, "Appel déjà en cours de lancement pour ce contact, lancement en double ignoré"
+
+        logger.info(f"Début appel RÉEL pour {contact['prenom']} {contact['nom']} ({contact['telephone']})")
+
+        task_prompt = self.blend_service.build_task_prompt(nom=contact['nom'], prenom=contact['prenom'])
+        claimed_at = time.monotonic()
+        while True:
+            # Bland en panne: on attend la réouverture du circuit au lieu d'enchaîner les échecs
+            if self.suspended.is_set() or not self.breaker.wait_until_available(self.circuit_wait):
+                self.suspended.set()
+                self.db.update_dispatch(key, RELEASED, error="circuit ouvert")
+                return None, "Campagne suspendue: Bland indisponible (circuit ouvert), contact laissé en attente"
+            if time.monotonic() - claimed_at > CLAIM_RENEWAL:
+                # Après l'attente du circuit: la réservation ne doit pas paraître abandonnée pendant la requête
+                self.db.update_dispatch(key, CLAIMED, contact_id=contact['id'])
+                claimed_at = time.monotonic()
+            # circuit_open garantit qu'aucun appel n'a été passé (requête non envoyée): relancer est sans risque
+            call_response = self.blend_service.make_call(
+                to_number=contact['telephone'],
+                contact_id=contact['id'],
+                task_prompt=task_prompt,
+                first_sentence=self.FIRST_SENTENCE,
+                max_duration=self.max_duration,
+                language="fr",
+                webhook=self.webhook_url,
+                idempotency_key=key
+            )
+            if call_response.get('rate_limited'):
+                # 429: requête non traitée, remise en attente jusqu'à la fin de la pause Retry-After
+                self._count('rate_limited')
+                self._wait_dial_rate_limit(key, contact)
+                claimed_at = time.monotonic()
+                continue
+            if not call_response.get('circuit_open'):
+                break
+
+        if call_response.get('uncertain'):
+            # L'appel a peut-être été passé: la clé reste réservée, aucun nouveau lancement pour cette tentative
+            logger.error(f"Lancement {key} incertain: {call_response.get('message')}")
+            self.db.update_dispatch(key, CLAIMED, uncertain=True, error=call_response.get('message'))
+            return None, f"Erreur Blend: {call_response.get('message')}, contact non relancé"
+        if call_response.get('error'):
+            logger.error(f"Erreur Blend: {call_response.get('message')} - Response: {call_response}")
+            self.db.update_dispatch(key, RELEASED, error=call_response.get('message'))
+            return None, f"Erreur Blend: {call_response.get('message')} (status {call_response.get('status_code')})"
+
+        call_id = call_response.get('call_id') or call_response.get('id')
+        if call_id:
+            # Journalisé avant toute attente: après un arrêt, l'appel sera repris et non relancé
+            self.db.journal_call(contact['id'], call_id, dispatch_key=key)
+        self.db.update_dispatch(key, PLACED, call_id=call_id)
+        return call_id, None
+
+    def _wait_dial_rate_limit(self, key: str, contact: Dict):
+        """Attend la reprise de l'endpoint de lancement, en renouvelant la réservation du lancement"""
+        bucket = get_bucket('bland', 'dial')
+        while not bucket.wait_resumed(CLAIM_RENEWAL):
+            self.db.update_dispatch(key, CLAIMED, contact_id=contact['id'])
+        self.db.update_dispatch(key, CLAIMED, contact_id=contact['id'])
+
+    def _reconcile_claim(self, key: str, contact: Dict, existing: Dict) -> Optional[Dict]:
+        """Vérifie chez Bland une réservation périmée restée sans call_id
+
+        Returns:
+            L'entrée du registre à traiter comme un doublon (appel retrouvé, ou
+            vérification impossible), ou None si la clé a été reprise pour un lancement
+        """
+        lookup = self.blend_service.find_call(key, contact['telephone'])
+        if lookup.get('error'):
+            logger.error(f"❌ Lancement {key} interrompu et invérifiable chez Bland: contact non relancé")
+            return existing
+        if lookup.get('call_id'):
+            logger.warning(f"🔁 Lancement {key} interrompu: appel {lookup['call_id']} retrouvé chez Bland")
+            self.db.update_dispatch(key, PLACED, call_id=lookup['call_id'], reconciled=True)
+            return {**existing, 'state': PLACED, 'call_id': lookup['call_id']}
+        # Aucun appel chez Bland: la réservation est reprise, sauf si un autre lanceur l'a fait entre-temps
+        taken = self.db.claim_dispatch(key, contact['id'], takeover=existing)
+        if taken is None:
+            logger.warning(f"🔁 Lancement {key} interrompu sans appel passé chez Bland: nouveau lancement")
+        return taken
+
+    def _track(self, contact: Dict, call_id: Optional[str]) -> Tuple[Dict, str]:
+        """Suit l'appel jusqu'à sa fin
+
+        Returns:
+            (résultat sans analyse, transcript à analyser ou '' si pas de réponse)
+        """
+        call_completed, transcript, timings = self._wait_for_transcript(call_id, contact['id'])
+
+        result = {
+            'contact_id': contact['id'],
+            'nom': contact['nom'],
+            'prenom': contact['prenom'],
+            'telephone': contact['telephone'],
+            'call_sid': call_id,
+            'consent': None,
+            'identity_confirmed': None,
+            'no_response': True,
+            'transcription': transcript,
+            'call_timings': timings
+        }
+
+        if not call_completed or not transcript:
+            logger.info(f"📝 Création du résultat avec no_response=True pour contact {contact['id']}")
+            return result, ''
+        return result, transcript
+
+    def _analyze(self, contact: Dict, result: Dict, transcript: str):
+        """Analyse le transcript (OpenAI) et complète le résultat"""
+        logger.info(f"🤖 Début de l'analyse OpenAI pour {contact['prenom']} {contact['nom']}")
+        try:
+            analysis_result = self.openai_service.analyze_consent_and_identity(
+                transcript=transcript,
+                nom=contact['nom'],
+                prenom=contact['prenom']
+            )
+            self._apply_analysis(result, analysis_result)
+        except Exception as e:
+            logger.error(f"❌ Erreur lors de l'analyse OpenAI: {str(e)}")
+            logger.exception(e)
+            result['error'] = str(e)
+
+    @staticmethod
+    def _apply_analysis(result: Dict, analysis_result: Dict):
+        """Complète le résultat de l'appel avec le verdict de l'analyse"""
+        logger.info(f"✅ Analyse OpenAI terminée: consent={analysis_result.get('consent')}, identity={analysis_result.get('identity_confirmed')}")
+        logger.debug(f"Reasoning: {analysis_result.get('reasoning', 'N/A')}")
+        result.update({
+            'consent': analysis_result.get('consent'),
+            'identity_confirmed': analysis_result.get('identity_confirmed'),
+            'no_response': False,
+            'reasoning': analysis_result.get('reasoning', '')
+        })
+        if analysis_result.get('analysis_error'):
+            result['analysis_error'] = True
+
+    def _wait_for_transcript(self, call_id: Optional[str], contact_id: str) -> Tuple[bool, str, Dict]:
+        """Suit le cycle de vie de l'appel jusqu'à sa fin ou son échéance
+
+        Avec un récepteur de webhooks, la fin d'appel arrive par callback et
+        l'API n'est interrogée qu'en secours (au plus toutes les
+        `fallback_poll_interval` secondes) ; sinon l'intervalle de polling
+        suit l'état de l'appel (voir CallLifecycle).
+
+        Returns:
+            (appel terminé, transcript, temps passé dans chaque état)
+        """
+        receiver = self.webhook_receiver
+        lifecycle = CallLifecycle(
+            call_id,
+            max_duration=self.max_duration,
+            ring_timeout=self.ring_timeout,
+            interval_scale=self.poll_interval_scale
+        )
+
+        while not lifecycle.expired():
+            interval = lifecycle.next_poll_interval()
+            if receiver:
+                interval = max(interval, min(self.fallback_poll_interval, lifecycle.remaining()))
+                payload = receiver.wait(call_id, contact_id, timeout=interval)
+                if payload is not None:
+                    lifecycle.observe(payload)
+                    if lifecycle.finished:
+                        logger.info(f"📩 Fin d'appel reçue par webhook pour call_id: {call_id}")
+                        self._count('webhook')
+                        return self._call_outcome(payload, lifecycle)
+                    continue
+            else:
+                time.sleep(interval)
+
+            logger.info(f"⏳ Polling tentative {lifecycle.polls} pour call_id: {call_id} (état: {lifecycle.state})")
+            self._count('poll_requests')
+            call_status = self.blend_service.fetch_call_result(call_id)
+            if call_status.get('circuit_open'):
+                # L'appel est en cours chez Bland: on attend la fin de la panne sans l'abandonner
+                self.breaker.wait_until_available(lifecycle.remaining())
+                continue
+            if call_status.get('error'):
+                logger.error(f"❌ Erreur lors de la récupération du statut: {call_status.get('message')}")
+                return False, "", lifecycle.timings()
+
+            lifecycle.observe(call_status)
+            if lifecycle.finished:
+                if receiver:
+                    receiver.discard(call_id, contact_id)
+                self._count('polling')
+                return self._call_outcome(call_status, lifecycle)
+
+        timings = lifecycle.timings()
+        logger.warning(f"⚠️ Timeout: Appel non terminé après {timings['total']} secondes (état: {lifecycle.state}, {lifecycle.polls} vérification(s))")
+        return False, "", timings
+
+    def _call_outcome(self, call_status: Dict, lifecycle: CallLifecycle) -> Tuple[bool, str, Dict]:
+        """Transcript d'un appel terminé (vide si l'appel a échoué)"""
+        if lifecycle.state == FAILED:
+            logger.warning("⚠️ Appel échoué (numéro invalide ou erreur)")
+            return False, "", lifecycle.timings()
+        # Bland.ai utilise 'concatenated_transcript'
+        transcript = call_status.get('concatenated_transcript', '') or call_status.get('transcript', '') or call_status.get('transcription', '')
+        logger.info(f"✅ Appel terminé! Transcript récupéré (longueur: {len(transcript)} caractères)")
+        return True, transcript, lifecycle.timings()
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
@@ -0,0 +1,200 @@
+import threading
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from utils.config import Config
+from utils.database import create_database
+from utils.campaign_catalog import CampaignCatalog
+from utils import worker_state
+from utils.worker_state import WorkerState
+from services.twilio_service import BlendService
+from services.async_openai_service import AsyncOpenAIService
+from services.campaign_dispatcher import CampaignDispatcher
+from services.webhook_receiver import get_webhook_receiver, signed_webhook_url
+from services.http_client import connection_stats
+from services.rate_limiter import throttle_state
+from services.resilience import circuit_state
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class CampaignWorker:
+    """Exécute les campagnes mises en file par l'application, hors de toute session Streamlit
+
+    Le worker surveille data/worker.json : quand l'application y met la
+    campagne active en file, il appelle tous ses contacts en attente
+    (appel → suivi → analyse → sauvegarde, via CampaignDispatcher) et y
+    publie la progression. Une demande d'annulation arrête le lancement de
+    nouveaux appels ; les appels déjà en cours sont menés à terme et
+    sauvegardés.
+    """
+
+    def __init__(self, data_dir: Optional[str] = None, interval: float = 5):
+        """
+        Args:
+            data_dir: Dossier de données (par défaut Config.DATA_DIR)
+            interval: Secondes entre deux battements de cœur / vérifications de la file
+        """
+        self.data_dir = data_dir or Config().DATA_DIR
+        self.interval = interval
+        self.catalog = CampaignCatalog(self.data_dir)
+        self.state = WorkerState(self.data_dir)
+        self.stop_requested = threading.Event()
+        self.dispatcher: Optional[CampaignDispatcher] = None
+
+    def run_forever(self, once: bool = False):
+        """Boucle du worker: attend une campagne en file, l'exécute, recommence
+
+        Args:
+            once: Exécute la campagne en file (s'il y en a une) puis s'arrête
+        """
+        self._recover_interrupted()
+        logger.info(f"👷 Worker de campagne démarré (données: {self.data_dir})")
+        while not self.stop_requested.is_set():
+            state = self.heartbeat()
+            if state.get('status') == worker_state.QUEUED:
+                self.run_campaign(state['campaign_id'])
+            if once:
+                break
+            self.stop_requested.wait(self.interval)
+        logger.info("👷 Worker de campagne arrêté")
+
+    def stop(self):
+        """Arrêt propre (signal): plus de nouveaux appels, les appels en cours sont sauvegardés"""
+        self.stop_requested.set()
+        if self.dispatcher is not None:
+            self.dispatcher.cancel()
+
+    def heartbeat(self) -> Dict:
+        """Publie le battement de cœur et les diagnostics du processus"""
+        return self.state.heartbeat(diagnostics={
+            'connections': connection_stats(),
+            'rate_limits': throttle_state(),
+            'circuits': circuit_state(),
+            'dispatch': dict(self.dispatcher.stats) if self.dispatcher else {},
+            'pipeline': self.dispatcher.pipeline_stats() if self.dispatcher else {},
+            'analysis': self.dispatcher.openai_service.analysis_stats() if self.dispatcher else {}
+        })
+
+    def _recover_interrupted(self):
+        """Remet en file une campagne restée 'running' après l'arrêt brutal d'un worker"""
+        state = self.state.load()
+        if state.get('status') == worker_state.RUNNING and self.state.transition(
+                worker_state.RUNNING, status=worker_state.QUEUED, last_event="Reprise après l'arrêt du worker"):
+            logger.warning(f"⚠️ Campagne {state.get('campaign_id')} interrompue par l'arrêt du worker: remise en file")
+
+    # ------------------------------------------------------------------
+    # Exécution d'une campagne
+    # ------------------------------------------------------------------
+
+    def _fail_queued(self, event: str):
+        """Passe en échec une campagne encore en file (sans écraser une annulation)"""
+        self.state.transition(worker_state.QUEUED, status=worker_state.FAILED,
+                              finished_at=datetime.now().isoformat(), last_event=event)
+
+    def _prepare(self, db, campaign_id: str) -> Tuple[List[Dict], List[Tuple[Dict, Dict]]]:
+        """Construit le dispatcher de la campagne et reprend les appels lancés avant un arrêt
+
+        Returns:
+            (contacts à appeler, appels en cours repris)
+        """
+        config = Config()
+        webhook_receiver = webhook_url = None
+        if config.WEBHOOK_URL and not config.WEBHOOK_SECRET:
+            logger.warning("⚠️ WEBHOOK_URL sans WEBHOOK_SECRET: webhooks désactivés, fins d'appel par polling")
+        elif config.WEBHOOK_URL:
+            webhook_receiver = get_webhook_receiver(config.WEBHOOK_PORT, config.WEBHOOK_HOST, config.WEBHOOK_SECRET)
+            webhook_url = signed_webhook_url(config.WEBHOOK_URL, config.WEBHOOK_SECRET)
+        self.dispatcher = CampaignDispatcher(
+            BlendService(), AsyncOpenAIService(), db,
+            max_concurrent_calls=config.MAX_CONCURRENT_CALLS,
+            dial_workers=config.DIAL_WORKERS,
+            analysis_workers=config.ANALYSIS_WORKERS,
+            campaign_id=campaign_id,
+            # Fins d'appel reçues par webhook si configuré, le polling ne sert qu'en secours
+            webhook_receiver=webhook_receiver,
+            webhook_url=webhook_url
+        )
+        # Appels lancés avant un arrêt du worker: suivis jusqu'à leur fin, jamais relancés
+        resumed_calls = self.dispatcher.reconcile(db.get_inflight_calls())
+        resumed_ids = {contact['id'] for contact, _ in resumed_calls}
+        contacts = [c for c in db.get_pending_contacts() if c['id'] not in resumed_ids]
+        return contacts, resumed_calls
+
+    def run_campaign(self, campaign_id: str):
+        """Appelle tous les contacts en attente de la campagne et publie la progression"""
+        if self.catalog.get(campaign_id) is None or campaign_id != self.catalog.active()['id']:
+            logger.error(f"❌ Campagne {campaign_id} introuvable ou archivée")
+            self._fail_queued("Campagne introuvable ou archivée")
+            return
+
+        # Une erreur de préparation termine la campagne en échec au lieu de la laisser en file
+        db = None
+        try:
+            db = create_database(self.data_dir, campaign_id)
+            contacts, resumed_calls = self._prepare(db, campaign_id)
+        except Exception as e:
+            logger.error(f"❌ Impossible de préparer la campagne {campaign_id}: {str(e)}")
+            logger.exception(e)
+            if db is not None:
+                db.close()
+            self._fail_queued(f"Erreur au démarrage: {str(e)}")
+            return
+
+        event = f"{len(contacts)} contact(s) à appeler"
+        if resumed_calls:
+            event += f", {len(resumed_calls)} appel(s) en cours repris"
+        # Démarrage seulement si la campagne est toujours en file (pas annulée pendant la préparation)
+        if not self.state.transition(worker_state.QUEUED, status=worker_state.RUNNING,
+                                     started_at=datetime.now().isoformat(),
+                                     total=len(contacts) + len(resumed_calls), completed=0, errors=0,
+                                     last_event=event):
+            logger.info(f"⏹️ Campagne {campaign_id} annulée avant son démarrage: aucun appel lancé")
+            db.close()
+            return
+        logger.info(f"🚀 Campagne {campaign_id}: {event}")
+
+        # Battement de cœur et prise en compte des annulations pendant les appels
+        done = threading.Event()
+        monitor = threading.Thread(target=self._monitor, args=(done,), name="worker-heartbeat", daemon=True)
+        monitor.start()
+        errors = 0
+        try:
+            for outcome in self.dispatcher.dispatch(contacts, resumed_calls):
+                contact = outcome['contact']
+                if outcome['error']:
+                    errors += 1
+                    event = f"Erreur pour {contact['prenom']} {contact['nom']} : {outcome['error']}"
+                else:
+                    event = f"{contact['prenom']} {contact['nom']} terminé"
+                self.state.update(completed=outcome['completed'], errors=errors, last_event=event)
+
+            if self.stop_requested.is_set():
+                status, event = worker_state.QUEUED, "Worker arrêté: reprise des contacts restants au prochain démarrage"
+            elif self.dispatcher.cancelled.is_set():
+                status, event = worker_state.CANCELLED, "Campagne annulée, contacts non appelés laissés en attente"
+            elif self.dispatcher.suspended.is_set():
+                status, event = worker_state.SUSPENDED, "Bland indisponible: campagne suspendue"
+            else:
+                status, event = worker_state.COMPLETED, "Campagne terminée"
+        except Exception as e:
+            logger.error(f"❌ Erreur du worker pendant la campagne {campaign_id}: {str(e)}")
+            logger.exception(e)
+            status, event = worker_state.FAILED, f"Erreur: {str(e)}"
+        finally:
+            done.set()
+            monitor.join()
+            self.dispatcher.openai_service.close()
+            db.close()
+
+        self.state.update(status=status, finished_at=datetime.now().isoformat(), last_event=event)
+        self.heartbeat()
+        logger.info(f"🏁 Campagne {campaign_id}: {event}")
+
+    def _monitor(self, done: threading.Event):
+        while not done.wait(self.interval):
+            state = self.heartbeat()
+            if state.get('cancel_requested') and not self.dispatcher.cancelled.is_set():
+                logger.info("⏹️ Annulation demandée: plus de nouveaux appels")
+                self.dispatcher.cancel()
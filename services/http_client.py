@@ -0,0 +1,175 @@
+import threading
+import time
+import logging
+from typing import Dict
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from utils.config import Config
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Sessions partagées par tous les services et threads du processus (une par API)
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+class MeteredAdapter(HTTPAdapter):
+    """HTTPAdapter qui compte les requêtes envoyées, leur latence et les connexions ouvertes
+
+    Chaque ouverture de socket (poignée de main TCP/TLS) est comptée ; la
+    différence avec le nombre de requêtes correspond aux connexions
+    keep-alive réutilisées.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.connects = 0
+        self.total_latency = 0.0
+        super().__init__(*args, **kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        adapter = self
+
+        class MeteredHTTPConnection(HTTPConnection):
+            def connect(self):
+                adapter._count_connect()
+                super().connect()
+
+        class MeteredHTTPSConnection(HTTPSConnection):
+            def connect(self):
+                adapter._count_connect()
+                super().connect()
+
+        class MeteredHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = MeteredHTTPConnection
+
+        class MeteredHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = MeteredHTTPSConnection
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': MeteredHTTPConnectionPool,
+            'https': MeteredHTTPSConnectionPool
+        }
+
+    def _count_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def send(self, request, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            with self._lock:
+                self.requests += 1
+                self.total_latency += time.perf_counter() - start
+
+
+def create_session() -> requests.Session:
+    """Crée une session HTTP avec un pool de connexions keep-alive
+
+    Réglages (secrets.toml):
+    - HTTP_POOL_CONNECTIONS: nombre d'hôtes gardés en pool
+    - HTTP_POOL_MAXSIZE: connexions simultanées maximales par hôte (au-delà,
+      les requêtes attendent une connexion libre)
+    - HTTP_KEEP_ALIVE: réutilisation des connexions entre requêtes
+    """
+    config = Config()
+    session = requests.Session()
+    adapter = MeteredAdapter(
+        pool_connections=config.HTTP_POOL_CONNECTIONS,
+        pool_maxsize=config.HTTP_POOL_MAXSIZE,
+        pool_block=True
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if not config.HTTP_KEEP_ALIVE:
+        session.headers['Connection'] = 'close'
+    return session
+
+
+def get_session(name: str) -> requests.Session:
+    """Session partagée du processus pour une API donnée (ex: 'bland', 'vapi')"""
+    with _sessions_lock:
+        if name not in _sessions:
+            _sessions[name] = create_session()
+            logger.info(f"🔌 Session HTTP '{name}' créée (pool de connexions keep-alive)")
+        return _sessions[name]
+
+
+def session_stats(session: requests.Session) -> Dict:
+    """Requêtes envoyées, connexions ouvertes et taux de réutilisation d'une session"""
+    adapter = session.get_adapter('https://')
+    if not isinstance(adapter, MeteredAdapter):
+        return {}
+    with adapter._lock:
+        count, opened, latency = adapter.requests, adapter.connects, adapter.total_latency
+    return {
+        'requests': count,
+        'connections_opened': opened,
+        'connections_reused': max(0, count - opened),
+        'reuse_rate': round(max(0, count - opened) / count * 100, 1) if count else 0,
+        'avg_latency_ms': round(latency / count * 1000, 2) if count else 0
+    }
+
+
+def connection_stats() -> Dict[str, Dict]:
+    """Statistiques de réutilisation des connexions de toutes les sessions partagées"""
+    with _sessions_lock:
+        sessions = dict(_sessions)
+    return {name: session_stats(session) for name, session in sessions.items()}
+
+
+def _benchmark(requests_count: int = 200):
+    """Compare des requêtes sans session (une connexion par requête) et via la session partagée
+
+    Utilise un serveur HTTP local (keep-alive) qui répond comme l'API Bland.
+    """
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = json.dumps({'call_id': self.path.rsplit('/', 1)[-1], 'status': 'in-progress'}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_address[1]}/v1/calls"
+
+    start = time.perf_counter()
+    for i in range(requests_count):
+        requests.get(f"{url}/{i}", timeout=15).json()
+    unpooled = (time.perf_counter() - start) / requests_count * 1000
+
+    session = create_session()
+    start = time.perf_counter()
+    for i in range(requests_count):
+        session.get(f"{url}/{i}", timeout=15).json()
+    pooled = (time.perf_counter() - start) / requests_count * 1000
+
+    server.shutdown()
+    print(f"Sans session : {unpooled:.2f} ms/requête ({requests_count} connexions)")
+    print(f"Session pool : {pooled:.2f} ms/requête {session_stats(session)}")
+    print(f"Gain         : {(1 - pooled / unpooled) * 100:.0f}% (hors poignée de main TLS, absente en local)")
+
+
+if __name__ == "__main__":
+    # Usage: python -m services.http_client [nombre_de_requêtes]
+    import sys
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
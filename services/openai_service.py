@@ -1,22 +1,95 @@
+import itertools
+import re
+import threading
+import time
 import openai
 from openai import OpenAI
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
 from utils.config import Config
+from services.rate_limiter import get_bucket, rate_limit_delay, is_quota_exhausted
+from services.resilience import resilient_call
+from utils.analysis_cache import analysis_cache_key, get_analysis_cache
 import logging
 import json
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
+# Modèle à sorties structurées: la réponse est contrainte par ANALYSIS_SCHEMA
+ANALYSIS_MODEL = "gpt-4o-mini"
+# Version des prompts d'analyse, partie de la clé du cache : à incrémenter à chaque
+# modification des prompts pour ne pas resservir d'anciennes analyses
+PROMPT_VERSION = 1
+
+# Schéma JSON imposé à la réponse de l'analyse (response_format json_schema)
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'consent': {'type': ['boolean', 'null']},
+        'identity_confirmed': {'type': ['boolean', 'null']},
+        'reasoning': {'type': 'string'}
+    },
+    'required': ['consent', 'identity_confirmed', 'reasoning'],
+    'additionalProperties': False
+}
+# Modèles qui acceptent response_format json_schema ; les autres reçoivent json_object
+STRUCTURED_OUTPUT_MODELS = ('gpt-4o', 'gpt-4.1', 'gpt-5', 'o1', 'o3', 'o4')
+# Valeurs texte renvoyées à la place de true/false/null ("null", "true"...)
+VERDICT_STRINGS = {'true': True, 'false': False, 'null': None, 'none': None, '': None}
+
+# Marqueur ajouté par Bland quand l'appel est coupé sur un répondeur
+VOICEMAIL_MARKER = "<call ended due to voicemail detection>"
+# Phrases de répondeur (les mêmes indices que le prompt système). Une personne peut aussi
+# les prononcer (« je suis sur ma messagerie pro, rappelez plus tard ») : elles ne tranchent
+# que si l'interlocuteur n'a répondu à aucune question de l'assistant
+VOICEMAIL_PHRASES = ("je ne suis pas disponible", "laissez un message", "laisser un message", "me laisser un message",
+                     "rappellerai", "boîte vocale", "boite vocale", "messagerie")
+# Questions de l'assistant: consentement RGPD puis confirmation d'identité
+CONSENT_QUESTION_WORDS = ("rgpd", "acceptez", "consentez", "poursuivre")
+IDENTITY_QUESTION_WORDS = ("confirmez", "êtes-vous", "etes-vous")
+# Une réponse n'est un « oui » franc que si tous ses mots sont des mots d'acquiescement ou de
+# remplissage (plus le nom du contact) et qu'elle n'a pas de « ? » : « oui mais… », « euh oui
+# enfin… », « oui, attendez, c'est pour quoi ? » relèvent de l'analyse OpenAI
+AFFIRMATIVE_WORDS = ('oui', 'ouais', 'yes', 'ok', 'okay', "d'accord", 'dacord', 'confirme', 'accepte', "j'accepte",
+                     'exact', 'exactement', 'correct', 'vas-y', 'allez-y', 'absolument', 'parfait')
+NEGATIVE_WORDS = ('non', 'no', 'jamais', 'refuse', 'pas', 'aucun')
+FILLER_WORDS = ('euh', 'heu', 'hum', 'bah', 'ben', 'bon', 'alors', 'je', "c'est", 'moi', 'bien', 'merci',
+                'madame', 'monsieur')
+# Premier tour de l'interlocuteur en décrochant (« Allô ? ») : le « ? » n'y est pas une question
+GREETING_WORDS = ('allô', 'allo', 'bonjour', 'bonsoir', 'oui')
+
 
 class OpenAIService:
     """Service d'analyse des transcripts via OpenAI pour extraire consentement et identité."""
     
     def __init__(self):
         config = Config()
-        self.client = OpenAI(api_key=config.OPENAI_API_KEY)
+        # Les 429 sont gérés par le limiteur de débit partagé (services.rate_limiter)
+        self.client = OpenAI(api_key=config.OPENAI_API_KEY, max_retries=0)
+        self.bucket = get_bucket('openai', 'analysis')
+        self.cache = get_analysis_cache()
+        # Transcripts tranchés par les règles locales / servis par le cache / envoyés au LLM,
+        # réponses réparées localement / illisibles
+        self.stats = {'rules': 0, 'cache': 0, 'llm': 0, 'repaired': 0, 'parse_failures': 0}
+        self._stats_lock = threading.Lock()
         logger.info("OpenAIService initialisé")
     
+    def _create_completion(self, **kwargs):
+        """Appel chat.completions derrière le disjoncteur 'openai', avec reprises sur erreur passagère"""
+        return resilient_call('openai', lambda: self._send_completion(**kwargs), is_transient=_is_transient_openai)
+    
+    def _send_completion(self, **kwargs):
+        """Appel chat.completions en respectant la limite de débit (attente + reprise sur 429, sans abandon)"""
+        for attempt in itertools.count(1):
+            self.bucket.acquire()
+            try:
+                return self.client.chat.completions.create(**kwargs)
+            except openai.RateLimitError as e:
+                if is_quota_exhausted(e):
+                    raise
+                logger.warning(f"🚦 429 d'OpenAI ({attempt} refus consécutif(s)): requête en attente")
+                self.bucket.pause(rate_limit_delay(e.response.headers.get('retry-after'), attempt))
+    
     def analyze_consent_and_identity(self, transcript: str, nom: str, prenom: str) -> Dict[str, Any]:
         """Analyse le transcript complet pour extraire consentement RGPD et confirmation d'identité.
         
@@ -31,7 +104,57 @@ class OpenAIService:
                 - identity_confirmed: True/False/None (identité confirmée)
                 - reasoning: Explication du raisonnement
         """
+        shortcut, cache_key = self._shortcut(transcript, nom, prenom)
+        if shortcut is not None:
+            return shortcut
+        return self._llm_analysis(transcript, nom, prenom, cache_key)
+    
+    def _llm_analysis(self, transcript: str, nom: str, prenom: str, cache_key: str) -> Dict[str, Any]:
+        """Analyse d'un transcript par OpenAI (une requête), mise en cache si réussie"""
+        logger.info(f"🤖 Appel OpenAI pour analyser transcript (longueur: {len(transcript)} caractères)")
+        logger.debug(f"Transcript envoyé: {transcript[:200]}..." if len(transcript) > 200 else f"Transcript envoyé: {transcript}")
+
+        try:
+            started = time.monotonic()
+            response = self._create_completion(**self.build_request(transcript, nom, prenom))
+            return self._parse_response(response, cache_key, time.monotonic() - started)
+        except Exception as e:
+            return self._error_result(e)
+    
+    def _shortcut(self, transcript: str, nom: str, prenom: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Résultat obtenu sans appel OpenAI (règles locales puis cache), et clé du cache
         
+        Returns:
+            (résultat ou None si le LLM doit être appelé, clé du cache d'analyse)
+        """
+        # Cas sans ambiguïté (répondeur, « oui… oui » franc): tranchés localement, sans appel OpenAI
+        local_result = self.classify_transcript(transcript, nom, prenom)
+        if local_result is not None:
+            self._count('rules')
+            logger.info(f"⚡ Transcript tranché sans OpenAI: consent={local_result['consent']}, identity_confirmed={local_result['identity_confirmed']}")
+            return local_result, ''
+        # Transcript déjà analysé (même message de répondeur lors d'un rappel, réanalyse...)
+        cache_key = analysis_cache_key(transcript, nom, prenom, f"{ANALYSIS_MODEL}/{PROMPT_VERSION}")
+        cached_result = self.cache.get(cache_key)
+        if cached_result is not None:
+            self._count('cache')
+            logger.info(f"🗃️ Analyse servie par le cache: consent={cached_result.get('consent')}, identity_confirmed={cached_result.get('identity_confirmed')}")
+            return cached_result, cache_key
+        self._count('llm')
+        return None, cache_key
+    
+    def build_request(self, transcript: str, nom: str, prenom: str) -> Dict[str, Any]:
+        """Paramètres chat.completions de l'analyse d'un transcript (réponse contrainte par le schéma)"""
+        return {
+            'model': ANALYSIS_MODEL,
+            'messages': self.build_messages(transcript, nom, prenom),
+            'temperature': 0.1,
+            'max_tokens': 200,
+            'response_format': response_format('consent_identity_analysis', ANALYSIS_SCHEMA)
+        }
+    
+    def build_messages(self, transcript: str, nom: str, prenom: str) -> List[Dict[str, str]]:
+        """Messages système et utilisateur de l'analyse d'un transcript"""
         system_prompt = f"""Tu es un assistant d'analyse de conversations téléphoniques pour la conformité RGPD.
 Ton rôle est d'analyser le transcript d'un appel et d'extraire deux informations critiques.
 
@@ -73,66 +196,237 @@ TRANSCRIPT:
 {transcript}
 
 Extrais le consentement RGPD et la confirmation d'identité."""
-
-        logger.info(f"🤖 Appel OpenAI pour analyser transcript (longueur: {len(transcript)} caractères)")
-        logger.debug(f"Transcript envoyé: {transcript[:200]}..." if len(transcript) > 200 else f"Transcript envoyé: {transcript}")
-
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _parse_response(self, response, cache_key: str, latency: float) -> Dict[str, Any]:
+        """Extrait le JSON de la réponse OpenAI et met l'analyse en cache
+        
+        Les défauts courants (bloc de code markdown, texte avant ou après le
+        JSON, "null"/"true" en texte) sont réparés localement. Une réponse
+        illisible est une erreur d'analyse (contact 'to_analyze', transcript
+        à réanalyser) et non un « pas de réponse claire » qui ferait rappeler
+        le contact.
+        """
+        result_text = (response.choices[0].message.content or '').strip()
+        logger.info(f"✅ Réponse OpenAI reçue: {result_text}")
+        
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=0.1,
-                max_tokens=200
-            )
-            
-            result_text = response.choices[0].message.content.strip()
-            logger.info(f"✅ Réponse OpenAI reçue: {result_text}")
-            
-            # Parse le JSON retourné
-            result = json.loads(result_text)
-            
-            # Normalise les valeurs null en None
-            if result.get('consent') is None or result.get('consent') == 'null':
-                result['consent'] = None
-            if result.get('identity_confirmed') is None or result.get('identity_confirmed') == 'null':
-                result['identity_confirmed'] = None
-            
-            logger.info(f"📊 Résultat parsé: consent={result.get('consent')}, identity_confirmed={result.get('identity_confirmed')}")
-            return result
-            
-        except json.JSONDecodeError as e:
+            data, repaired = parse_json_reply(result_text)
+            result, normalized = normalize_verdict(data)
+        except ValueError as e:
+            self._count('parse_failures')
             logger.error(f"❌ Erreur de parsing JSON: {str(e)}")
-            logger.error(f"Raw response: {result_text if 'result_text' in locals() else 'N/A'}")
+            logger.error(f"Raw response: {result_text}")
             return {
                 'consent': None,
                 'identity_confirmed': None,
                 'reasoning': f'Erreur de parsing JSON: {str(e)}',
-                'raw_response': result_text if 'result_text' in locals() else ''
-            }
-        except Exception as e:
-            logger.error(f"❌ Erreur OpenAI: {str(e)}")
-            logger.exception(e)
-            return {
-                'consent': None,
-                'identity_confirmed': None,
-                'reasoning': f'Erreur OpenAI: {str(e)}'
+                'raw_response': result_text,
+                'analysis_error': True
             }
+        if repaired or normalized:
+            self._count('repaired')
+            logger.warning(f"🔧 Réponse OpenAI réparée localement: {result}")
+        
+        logger.info(f"📊 Résultat parsé: consent={result.get('consent')}, identity_confirmed={result.get('identity_confirmed')}")
+        self.cache.put(cache_key, result, latency)
+        return result
+    
+    @staticmethod
+    def _error_result(error: Exception) -> Dict[str, Any]:
+        logger.error(f"❌ Erreur OpenAI: {str(error)}")
+        logger.exception(error)
+        # Pas de verdict: le transcript devra être réanalysé, pas le contact rappelé
+        return {
+            'consent': None,
+            'identity_confirmed': None,
+            'reasoning': f'Erreur OpenAI: {str(error)}',
+            'analysis_error': True
+        }
     
     def quick_sentiment_check(self, text: str) -> str:
-        """Analyse rapide du sentiment (positif/négatif/neutre) d'une réponse courte."""
-        text_lower = text.lower().strip()
+        """Analyse rapide du sentiment (positif/négatif/neutre) d'une réponse courte.
         
-        # Mots-clés positifs
-        positive = ['oui', 'yes', 'ok', 'd\'accord', 'dacord', 'confirme', 'exact', 'correct', 'vas-y', 'accepte']
-        # Mots-clés négatifs
-        negative = ['non', 'no', 'jamais', 'refuse', 'pas', 'aucun']
+        Une réponse qui mêle acquiescement et négation (« oui pas de souci »,
+        « oui enfin non ») est neutre : elle n'est pas un « oui » franc.
+        """
+        # Comparaison mot à mot: « pas » ne doit pas être trouvé dans « passer », ni « no » dans « bonjour »
+        words = set(_words(text))
+        positive = bool(words & set(AFFIRMATIVE_WORDS))
+        negative = bool(words & set(NEGATIVE_WORDS))
         
-        if any(word in text_lower for word in positive):
+        if positive and not negative:
             return 'positive'
-        elif any(word in text_lower for word in negative):
+        elif negative and not positive:
             return 'negative'
         else:
             return 'neutral'
+    
+    def classify_transcript(self, transcript: str, nom: str, prenom: str) -> Optional[Dict[str, Any]]:
+        """Tranche sans LLM les transcripts sans ambiguïté
+        
+        - répondeur: marqueur de Bland, ou message d'absence seul propos de
+          l'interlocuteur, qui n'a répondu à aucune question de l'assistant
+          → consent=False, identity_confirmed=False
+        - « oui » franc à la question de consentement et à la question
+          d'identité, sans autre propos (chaque réponse est positive selon
+          quick_sentiment_check et n'est faite que de mots d'acquiescement ou
+          de remplissage, sans « ? ») → consent=True, identity_confirmed=True
+        
+        Returns:
+            Le même format que analyze_consent_and_identity, ou None si le
+            transcript doit être analysé par OpenAI
+        """
+        text = transcript.lower()
+        turns = _parse_turns(transcript)
+        user_turns = [t for speaker, t in turns if speaker == 'user']
+        
+        if VOICEMAIL_MARKER in text:
+            return {'consent': False, 'identity_confirmed': False,
+                    'reasoning': "Répondeur détecté (marqueur de détection de messagerie de Bland, règle locale)"}
+        replied = _answer_to(turns, lambda q: '?' in q or any(w in q for w in CONSENT_QUESTION_WORDS + IDENTITY_QUESTION_WORDS))
+        if (len(user_turns) == 1 and replied is None
+                and any(phrase in user_turns[0].lower() for phrase in VOICEMAIL_PHRASES)):
+            return {'consent': False, 'identity_confirmed': False,
+                    'reasoning': "Répondeur détecté (message d'absence sans autre réponse, règle locale)"}
+        
+        consent_answer = _answer_to(turns, lambda q: any(w in q for w in CONSENT_QUESTION_WORDS))
+        identity_answer = _answer_to(turns, lambda q: any(w in q for w in IDENTITY_QUESTION_WORDS)
+                                     and (nom.lower() in q or prenom.lower() in q))
+        if consent_answer is None or identity_answer is None or consent_answer == identity_answer:
+            return None
+        # Toute autre réponse (question, hésitation, réserve, négation) relève de l'analyse OpenAI
+        allowed = set(AFFIRMATIVE_WORDS) | set(FILLER_WORDS) | set(_words(f"{prenom} {nom}"))
+        for index, answer in enumerate(user_turns):
+            words = set(_words(answer))
+            if index < consent_answer and words <= set(GREETING_WORDS):
+                continue
+            if '?' in answer or not words <= allowed:
+                return None
+        if all(self.quick_sentiment_check(user_turns[i]) == 'positive' for i in (consent_answer, identity_answer)):
+            return {'consent': True, 'identity_confirmed': True,
+                    'reasoning': "Consentement et identité confirmés par des « oui » francs (règle locale)"}
+        return None
+    
+    def analysis_stats(self) -> Dict[str, Any]:
+        """Transcripts tranchés localement / servis par le cache / analysés par OpenAI, part évitée au LLM et réponses illisibles"""
+        with self._stats_lock:
+            total = self.stats['rules'] + self.stats['cache'] + self.stats['llm']
+            stats = {
+                'analyzed': total,
+                'rules': self.stats['rules'],
+                'cache': self.stats['cache'],
+                'llm': self.stats['llm'],
+                'bypass_rate': round((total - self.stats['llm']) / total * 100, 1) if total else 0,
+                'repaired': self.stats['repaired'],
+                'parse_failures': self.stats['parse_failures'],
+                'parse_failure_rate': round(self.stats['parse_failures'] / self.stats['llm'] * 100, 1) if self.stats['llm'] else 0
+            }
+        stats['analysis_cache'] = self.cache.stats()
+        return stats
+    
+    def _count(self, name: str):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+
+def response_format(name: str, schema: Dict[str, Any], model: str = ANALYSIS_MODEL) -> Dict[str, Any]:
+    """response_format imposant `schema` à la réponse (json_object si le modèle n'a pas de sorties structurées)"""
+    if model.startswith(STRUCTURED_OUTPUT_MODELS):
+        return {'type': 'json_schema', 'json_schema': {'name': name, 'strict': True, 'schema': schema}}
+    return {'type': 'json_object'}
+
+
+def parse_json_reply(text: str) -> Tuple[Any, bool]:
+    """Décode le JSON d'une réponse du modèle, en retirant bloc de code markdown et texte autour
+    
+    Returns:
+        (valeur décodée, True si la réponse a dû être réparée)
+    
+    Raises:
+        ValueError: si la réponse ne contient aucun JSON lisible
+    """
+    text = (text or '').strip()
+    try:
+        return json.loads(text), False
+    except json.JSONDecodeError:
+        pass
+    fenced = re.search(r"```(?:json)?\s*(.*?)(?:```|$)", text, re.DOTALL | re.IGNORECASE)
+    candidate = fenced.group(1) if fenced else text
+    starts = [index for index in (candidate.find('{'), candidate.find('[')) if index >= 0]
+    if not starts:
+        raise ValueError(f"aucun JSON dans la réponse: {text[:100]!r}")
+    try:
+        # raw_decode s'arrête à la fin du premier JSON: le texte qui suit est ignoré
+        value, _ = json.JSONDecoder().raw_decode(candidate[min(starts):])
+    except json.JSONDecodeError as e:
+        raise ValueError(str(e))
+    return value, True
+
+
+def normalize_verdict(data: Any) -> Tuple[Dict[str, Any], bool]:
+    """Vérifie et normalise un verdict {consent, identity_confirmed, reasoning}
+    
+    Returns:
+        (verdict, True si des valeurs texte "null"/"true"/"false" ont été converties)
+    
+    Raises:
+        ValueError: si un champ manque ou n'est pas true/false/null
+    """
+    if not isinstance(data, dict):
+        raise ValueError(f"objet JSON attendu, reçu {type(data).__name__}")
+    verdict = dict(data)
+    normalized = False
+    for field in ('consent', 'identity_confirmed'):
+        if field not in data:
+            raise ValueError(f"champ '{field}' absent")
+        value = data[field]
+        if isinstance(value, str) and value.strip().lower() in VERDICT_STRINGS:
+            value = VERDICT_STRINGS[value.strip().lower()]
+            normalized = True
+        if value is not True and value is not False and value is not None:
+            raise ValueError(f"valeur invalide pour '{field}': {value!r}")
+        verdict[field] = value
+    verdict['reasoning'] = str(data.get('reasoning') or '')
+    return verdict, normalized
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"[\w'-]+", text.lower().replace('’', "'"))
+
+
+def _parse_turns(transcript: str) -> List[Tuple[str, str]]:
+    """Découpe un transcript Bland (« user: … » / « assistant: … ») en tours de parole"""
+    turns: List[Tuple[str, str]] = []
+    for line in transcript.splitlines():
+        match = re.match(r"\s*(user|assistant|agent)\s*:\s*(.*)", line, re.IGNORECASE)
+        if match:
+            speaker = 'user' if match.group(1).lower() == 'user' else 'assistant'
+            turns.append((speaker, match.group(2).strip()))
+        elif turns and line.strip():
+            # Suite d'un tour sur plusieurs lignes
+            speaker, text = turns[-1]
+            turns[-1] = (speaker, f"{text} {line.strip()}")
+    return turns
+
+
+def _answer_to(turns: List[Tuple[str, str]], is_question) -> Optional[int]:
+    """Index (parmi les tours de l'interlocuteur) de la réponse à la première question reconnue"""
+    user_index = -1
+    asked = False
+    for speaker, text in turns:
+        if speaker == 'user':
+            user_index += 1
+            if asked:
+                return user_index
+        elif is_question(text.lower()):
+            asked = True
+    return None
+
+
+def _is_transient_openai(error, result) -> bool:
+    """Erreur réseau, timeout ou 5xx d'OpenAI (les 429 sont gérés par le limiteur de débit)"""
+    return isinstance(error, (openai.APIConnectionError, openai.InternalServerError, TimeoutError))
@@ -0,0 +1,137 @@
+import queue
+import threading
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Signal de fin envoyé à chaque thread d'un étage
+_STOP = object()
+
+
+class Stage:
+    """Étage d'un pipeline: une file bornée consommée par un groupe de threads
+
+    Chaque élément déposé est passé à `handler` par l'un des `workers`
+    threads ; le handler dépose lui-même son résultat dans l'étage suivant.
+    La file est bornée : quand l'étage ne suit plus, `put` bloque
+    l'étage précédent (contre-pression) au lieu d'accumuler du travail en
+    mémoire. La profondeur de file, l'attente en file et la durée de
+    traitement sont mesurées.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], None], workers: int = 1, maxsize: int = 0,
+                 on_error: Optional[Callable[[Any, Exception], None]] = None):
+        """
+        Args:
+            name: Nom de l'étage (logs et métriques)
+            handler: Traitement d'un élément
+            workers: Nombre de threads de l'étage
+            maxsize: Taille maximale de la file (0 = illimitée)
+            on_error: Appelé si le handler lève une exception
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.on_error = on_error
+        self.queue: queue.Queue = queue.Queue(maxsize)
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.errors = 0
+        self.busy = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.total_latency = 0.0
+
+    def start(self) -> 'Stage':
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def put(self, item: Any) -> bool:
+        """Dépose un élément (bloque tant que la file est pleine)
+
+        Returns:
+            False si l'étage est arrêté avant que l'élément ait pu être déposé
+        """
+        while not self._stopping.is_set():
+            try:
+                self.queue.put((time.monotonic(), item), timeout=0.5)
+            except queue.Full:
+                continue
+            with self._lock:
+                self.max_depth = max(self.max_depth, self.queue.qsize())
+            return True
+        return False
+
+    def close(self):
+        """Termine les threads une fois la file vidée"""
+        for _ in self._threads:
+            self.queue.put((time.monotonic(), _STOP))
+        for thread in self._threads:
+            thread.join()
+
+    def abort(self):
+        """Arrête l'étage sans attendre: les éléments en file sont abandonnés"""
+        self._stopping.set()
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            try:
+                self.queue.put_nowait((time.monotonic(), _STOP))
+            except queue.Full:
+                break
+
+    def join(self, timeout: Optional[float] = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            enqueued_at, item = self.queue.get()
+            if item is _STOP:
+                return
+            started = time.monotonic()
+            with self._lock:
+                self.busy += 1
+                self.total_wait += started - enqueued_at
+            try:
+                self.handler(item)
+            except Exception as e:
+                logger.error(f"❌ Étage {self.name}: {str(e)}")
+                logger.exception(e)
+                with self._lock:
+                    self.errors += 1
+                if self.on_error is not None:
+                    self.on_error(item, e)
+            finally:
+                with self._lock:
+                    self.busy -= 1
+                    self.processed += 1
+                    self.total_latency += time.monotonic() - started
+
+    def stats(self) -> Dict:
+        """Profondeur de file, attente moyenne en file et durée moyenne de traitement"""
+        with self._lock:
+            count = self.processed
+            return {
+                'workers': self.workers,
+                'busy': self.busy,
+                'queue_depth': self.queue.qsize(),
+                'max_queue_depth': self.max_depth,
+                'queue_size': self.maxsize or None,
+                'processed': count,
+                'errors': self.errors,
+                'avg_wait_ms': round(self.total_wait / count * 1000, 1) if count else 0,
+                'avg_latency_ms': round(self.total_latency / count * 1000, 1) if count else 0
+            }
@@ -0,0 +1,158 @@
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+from utils.config import Config
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Débit par défaut (requêtes/seconde, rafale max) par fournisseur et par endpoint.
+# Surchargeable dans secrets.toml: RATE_LIMIT_BLAND_DIAL = 1.0, RATE_BURST_BLAND_DIAL = 5...
+DEFAULT_LIMITS = {
+    ('bland', 'dial'): (1.0, 5),
+    ('bland', 'status'): (10.0, 20),
+    ('openai', 'analysis'): (3.0, 10)
+}
+
+# Pause maximale (secondes) après un 429 sans Retry-After. Une requête refusée
+# n'est jamais abandonnée: elle attend la fin de la pause puis est renvoyée
+MAX_RATE_LIMIT_BACKOFF = 60
+
+# Seaux partagés par toutes les sessions et tous les threads du processus
+_buckets: Dict[str, 'TokenBucket'] = {}
+_buckets_lock = threading.Lock()
+
+
+class TokenBucket:
+    """Seau à jetons: au plus `rate` requêtes/seconde, avec des rafales de `capacity`
+
+    Les requêtes en excès attendent leur jeton au lieu d'être rejetées.
+    Un 429 du fournisseur suspend le seau pendant la durée Retry-After :
+    toutes les requêtes de cet endpoint attendent la fin de la pause.
+    """
+
+    def __init__(self, name: str, rate: float, capacity: int):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+        self.waiting = 0
+        self.throttled = 0
+        self.rate_limited = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Attend (si nécessaire) puis consomme un jeton"""
+        with self._condition:
+            self.waiting += 1
+            waited = False
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    if now < self._paused_until:
+                        delay = self._paused_until - now
+                    elif self._tokens >= 1:
+                        self._tokens -= 1
+                        if waited:
+                            self.throttled += 1
+                        return
+                    else:
+                        delay = (1 - self._tokens) / self.rate
+                    waited = True
+                    self._condition.wait(delay)
+            finally:
+                self.waiting -= 1
+
+    def wait_resumed(self, timeout: float) -> bool:
+        """Attend la fin de la pause en cours (sans consommer de jeton)
+
+        Returns:
+            True si le seau n'est plus suspendu, False si `timeout` s'est écoulé avant
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    return True
+                if now >= deadline:
+                    return False
+                self._condition.wait(min(self._paused_until, deadline) - now)
+
+    def pause(self, seconds: float):
+        """Suspend le seau (réponse 429 avec Retry-After)"""
+        with self._condition:
+            self.rate_limited += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+            self._tokens = 0
+        logger.warning(f"🚦 Limite de débit atteinte sur {self.name}: pause de {seconds:.1f}s")
+
+    def state(self) -> Dict:
+        """État courant du seau pour le tableau de bord"""
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            return {
+                'rate_per_second': self.rate,
+                'tokens': round(self._tokens, 1),
+                'paused_for': round(max(0.0, self._paused_until - now), 1),
+                'waiting': self.waiting,
+                'throttled': self.throttled,
+                'rate_limited_429': self.rate_limited
+            }
+
+
+def get_bucket(provider: str, endpoint: str) -> TokenBucket:
+    """Seau partagé du processus pour un endpoint d'un fournisseur"""
+    name = f"{provider}.{endpoint}"
+    with _buckets_lock:
+        if name not in _buckets:
+            rate, capacity = DEFAULT_LIMITS.get((provider, endpoint), (5.0, 10))
+            config = Config()
+            key = f"{provider}_{endpoint}".upper()
+            rate = float(config.get_secret(f"RATE_LIMIT_{key}", rate))
+            capacity = int(config.get_secret(f"RATE_BURST_{key}", capacity))
+            _buckets[name] = TokenBucket(name, rate, capacity)
+        return _buckets[name]
+
+
+def throttle_state() -> Dict[str, Dict]:
+    """État de tous les seaux (débit, jetons disponibles, pause en cours, requêtes en attente)"""
+    with _buckets_lock:
+        buckets = dict(_buckets)
+    return {name: bucket.state() for name, bucket in sorted(buckets.items())}
+
+
+def rate_limit_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Pause après le `attempt`-ième 429 consécutif: Retry-After s'il est fourni, sinon délai croissant"""
+    return parse_retry_after(retry_after, default=min(MAX_RATE_LIMIT_BACKOFF, 2.0 ** (attempt - 1)))
+
+
+def is_quota_exhausted(error: Exception) -> bool:
+    """429 d'OpenAI pour crédit épuisé: attendre ne sert à rien, l'erreur est rendue"""
+    return getattr(error, 'code', None) == 'insufficient_quota'
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Durée d'attente (secondes) d'un en-tête Retry-After (nombre de secondes ou date HTTP)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,302 @@
+import asyncio
+import random
+import threading
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional
+import requests
+from urllib3.exceptions import ConnectTimeoutError
+from utils.config import Config
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Codes HTTP d'une panne passagère du fournisseur (les 429 relèvent du limiteur de débit)
+TRANSIENT_STATUS_CODES = (500, 502, 503, 504)
+
+# Disjoncteurs partagés par tous les services et threads du processus (un par fournisseur)
+_breakers: Dict[str, 'CircuitBreaker'] = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Le fournisseur est considéré en panne : la requête n'est pas envoyée"""
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"Service {name} indisponible (circuit ouvert, nouvel essai dans {retry_in:.0f}s)")
+
+
+class CircuitBreaker:
+    """Disjoncteur: coupe les requêtes vers un fournisseur quand son taux d'erreur explose
+
+    Fermé: les requêtes passent et leur issue est enregistrée sur une
+    fenêtre glissante. Au-delà de `failure_rate` d'erreurs passagères (sur
+    au moins `min_requests` requêtes), le circuit s'ouvre : plus aucune
+    requête pendant `cooldown` secondes. Il passe ensuite en semi-ouvert :
+    une seule requête d'essai, qui referme le circuit si elle réussit ou le
+    rouvre sinon.
+    """
+
+    def __init__(self, name: str, failure_rate: float = 0.5, window: int = 20,
+                 min_requests: int = 5, cooldown: float = 30):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.min_requests = min_requests
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._probing = False
+        self._condition = threading.Condition()
+        self.retries = 0
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self) -> bool:
+        """Autorise (ou non) l'envoi d'une requête ; en semi-ouvert, réserve la requête d'essai"""
+        with self._condition:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self._probing = False
+                logger.info(f"🔌 Circuit {self.name} semi-ouvert: requête d'essai")
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def retry_in(self) -> float:
+        """Secondes avant que le circuit n'accepte une nouvelle requête (0 s'il en accepte)"""
+        with self._condition:
+            if self.state == OPEN:
+                return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+            if self.state == HALF_OPEN and self._probing:
+                return self.cooldown
+            return 0.0
+
+    def wait_until_available(self, timeout: float) -> bool:
+        """Attend que le circuit accepte de nouveau des requêtes (au plus `timeout` secondes)
+
+        Returns:
+            False si le circuit est toujours ouvert à l'échéance
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                if self.state == CLOSED or (self.state == HALF_OPEN and not self._probing):
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if self.state == OPEN:
+                    cooldown_left = self._opened_at + self.cooldown - time.monotonic()
+                    if cooldown_left <= 0:
+                        return True
+                    remaining = min(remaining, cooldown_left)
+                self._condition.wait(remaining)
+
+    def record_success(self):
+        with self._condition:
+            if self.state == HALF_OPEN:
+                logger.info(f"✅ Circuit {self.name} refermé")
+                self.state = CLOSED
+                self._outcomes.clear()
+                self._probing = False
+            self._outcomes.append(True)
+            self._condition.notify_all()
+
+    def record_failure(self):
+        with self._condition:
+            self._outcomes.append(False)
+            if self.state == HALF_OPEN:
+                self._trip()
+            elif self.state == CLOSED and len(self._outcomes) >= self.min_requests:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate:
+                    self._trip()
+            self._condition.notify_all()
+
+    def record_retry(self):
+        with self._condition:
+            self.retries += 1
+
+    def _trip(self):
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._probing = False
+        self.trips += 1
+        logger.error(f"🔌 Circuit {self.name} ouvert: trop d'erreurs, requêtes suspendues {self.cooldown:.0f}s")
+
+    def stats(self) -> Dict:
+        """État du disjoncteur pour le tableau de bord"""
+        with self._condition:
+            outcomes = list(self._outcomes)
+        return {
+            'state': self.state,
+            'error_rate': round(outcomes.count(False) / len(outcomes) * 100, 1) if outcomes else 0,
+            'retry_in': round(self.retry_in(), 1),
+            'retries': self.retries,
+            'rejected': self.rejected,
+            'trips': self.trips
+        }
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Disjoncteur partagé du processus pour un fournisseur ('bland', 'vapi', 'openai')
+
+    Réglages (secrets.toml): CIRCUIT_FAILURE_RATE, CIRCUIT_MIN_REQUESTS, CIRCUIT_COOLDOWN
+    """
+    with _breakers_lock:
+        if name not in _breakers:
+            config = Config()
+            _breakers[name] = CircuitBreaker(
+                name,
+                failure_rate=float(config.get_secret("CIRCUIT_FAILURE_RATE", 0.5)),
+                min_requests=int(config.get_secret("CIRCUIT_MIN_REQUESTS", 5)),
+                cooldown=float(config.get_secret("CIRCUIT_COOLDOWN", 30))
+            )
+        return _breakers[name]
+
+
+def circuit_state() -> Dict[str, Dict]:
+    """État de tous les disjoncteurs (état, taux d'erreur, reprises, requêtes refusées)"""
+    with _breakers_lock:
+        breakers = dict(_breakers)
+    return {name: breaker.stats() for name, breaker in sorted(breakers.items())}
+
+
+def is_transient_http(error: Optional[BaseException], response: Any) -> bool:
+    """Erreur réseau, timeout ou 5xx : la même requête a des chances de passer plus tard"""
+    if error is not None:
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return getattr(response, 'status_code', None) in TRANSIENT_STATUS_CODES
+
+
+def was_never_sent(error: Optional[BaseException], response: Any) -> bool:
+    """La requête n'a pas pu atteindre le fournisseur: la renvoyer ne peut pas créer de doublon
+
+    Seuls les échecs d'établissement de la connexion (DNS, connexion refusée,
+    délai de connexion dépassé) le prouvent. Un délai de lecture dépassé, une
+    connexion coupée en cours de réponse ou une réponse 5xx (une passerelle
+    502/504 peut répondre après que le fournisseur a traité la requête) ne
+    prouvent rien : l'appelant doit vérifier si la requête a abouti.
+    """
+    if error is None:
+        return False
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and not isinstance(error, requests.Timeout):
+        # requests enveloppe l'erreur urllib3 (MaxRetryError.reason): NewConnectionError,
+        # NameResolutionError... dérivent de ConnectTimeoutError
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        return isinstance(reason, ConnectTimeoutError)
+    return False
+
+
+def resilient_call(name: str, func: Callable[[], Any],
+                   is_transient: Callable[[Optional[BaseException], Any], bool],
+                   max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 15.0,
+                   is_retryable: Optional[Callable[[Optional[BaseException], Any], bool]] = None) -> Any:
+    """Exécute `func` derrière le disjoncteur du fournisseur, avec reprises sur erreur passagère
+
+    Les erreurs passagères (selon `is_transient(exception, résultat)`) sont
+    retentées au plus `max_attempts` fois avec un délai exponentiel et du
+    jitter ; les autres issues (succès, erreur 4xx...) sont rendues telles
+    quelles. Après la dernière tentative, la dernière exception est relevée
+    ou le dernier résultat rendu.
+
+    Pour une requête non idempotente (lancement d'un appel payant),
+    `is_retryable` restreint les reprises aux échecs sans effet chez le
+    fournisseur (voir was_never_sent) : les autres erreurs passagères sont
+    comptées par le disjoncteur mais relevées telles quelles, sans nouvel
+    envoi, pour que l'appelant vérifie si la requête a abouti.
+
+    Raises:
+        CircuitOpenError: si le circuit du fournisseur est ouvert, ou s'ouvre
+            sur l'échec de cette requête (requête sans effet chez le fournisseur)
+    """
+    breaker = get_breaker(name)
+    for attempt in range(1, max_attempts + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(name, breaker.retry_in())
+        error, result = None, None
+        try:
+            result = func()
+        except Exception as e:
+            error = e
+
+        if not is_transient(error, result):
+            breaker.record_success()
+            if error is not None:
+                raise error
+            return result
+
+        breaker.record_failure()
+        if is_retryable is not None and not is_retryable(error, result):
+            # La requête a pu aboutir chez le fournisseur : pas de nouvel envoi
+            if error is not None:
+                raise error
+            return result
+        if breaker.state == OPEN:
+            # La requête n'a pas abouti et le fournisseur est en panne : l'appelant la reportera
+            raise CircuitOpenError(name, breaker.retry_in()) from error
+        if attempt == max_attempts:
+            if error is not None:
+                raise error
+            return result
+        delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+        breaker.record_retry()
+        logger.warning(f"🔁 Erreur passagère sur {name} ({error or getattr(result, 'status_code', result)}), "
+                       f"tentative {attempt + 1}/{max_attempts} dans {delay:.1f}s")
+        time.sleep(delay)
+
+
+async def async_resilient_call(name: str, func: Callable[[], Awaitable[Any]],
+                               is_transient: Callable[[Optional[BaseException], Any], bool],
+                               max_attempts: int = 3, base_delay: float = 1.0, max_delay: float = 15.0) -> Any:
+    """Variante asynchrone de resilient_call (même disjoncteur, mêmes reprises)
+
+    `func` retourne une coroutine ; les délais entre tentatives n'occupent
+    pas la boucle d'événements.
+
+    Raises:
+        CircuitOpenError: si le circuit du fournisseur est ouvert, ou s'ouvre
+            sur l'échec de cette requête
+    """
+    breaker = get_breaker(name)
+    for attempt in range(1, max_attempts + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(name, breaker.retry_in())
+        error, result = None, None
+        try:
+            result = await func()
+        except Exception as e:
+            error = e
+
+        if not is_transient(error, result):
+            breaker.record_success()
+            if error is not None:
+                raise error
+            return result
+
+        breaker.record_failure()
+        if breaker.state == OPEN:
+            raise CircuitOpenError(name, breaker.retry_in()) from error
+        if attempt == max_attempts:
+            if error is not None:
+                raise error
+            return result
+        delay = min(max_delay, base_delay * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+        breaker.record_retry()
+        logger.warning(f"🔁 Erreur passagère sur {name} ({error or getattr(result, 'status_code', result)}), "
+                       f"tentative {attempt + 1}/{max_attempts} dans {delay:.1f}s")
+        await asyncio.sleep(delay)
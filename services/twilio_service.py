@@ -1,3 +1,4 @@
+import itertools
 import requests
 import json
 import logging
@@ -5,6 +6,10 @@ import os
 from typing import Optional, Dict, Any
 from datetime import datetime
 from utils.config import Config
+from services.http_client import get_session
+from services.rate_limiter import get_bucket, rate_limit_delay
+from services.resilience import (resilient_call, is_transient_http, was_never_sent, CircuitOpenError,
+                                 TRANSIENT_STATUS_CODES)
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
@@ -48,9 +53,50 @@ class BlendService:
             "Authorization": self.api_key,  # Blend utilise la clé directement, pas Bearer
             "Content-Type": "application/json",
         }
+        # Session partagée: connexions keep-alive réutilisées entre appels et polling
+        self.session = get_session('bland')
         logger.info(f"BlendService initialisé - Endpoint: {self.endpoint}")
         logger.debug(f"API Key présente: {bool(self.api_key)} (longueur: {len(self.api_key) if self.api_key else 0})")
 
+    def _request(self, method: str, endpoint_name: str, url: str, idempotent: bool = True,
+                 **kwargs) -> requests.Response:
+        """Envoie une requête à Bland derrière le disjoncteur, avec reprises sur erreur passagère
+
+        Les erreurs réseau, timeouts et 5xx sont retentés (voir services.resilience) ;
+        une panne prolongée ouvre le circuit et lève CircuitOpenError. Une requête
+        non idempotente (`idempotent=False`, lancement d'un appel) n'est renvoyée
+        que si elle n'a pas pu atteindre Bland ; un 429 lui est rendu (l'endpoint
+        étant suspendu) pour que l'appelant la remette en attente.
+        """
+        return resilient_call(
+            'bland',
+            lambda: self._send(method, endpoint_name, url, wait_on_429=idempotent, **kwargs),
+            is_transient=is_transient_http,
+            is_retryable=None if idempotent else was_never_sent
+        )
+
+    def _send(self, method: str, endpoint_name: str, url: str, wait_on_429: bool = True,
+              **kwargs) -> requests.Response:
+        """Envoie une requête en respectant la limite de débit de l'endpoint
+
+        La requête attend son jeton (voir services.rate_limiter) ; un 429
+        suspend l'endpoint pendant la durée Retry-After puis la requête est
+        renvoyée, aussi longtemps que Bland la refuse : un épisode de 429 ne
+        devient jamais une erreur pour le contact. Avec `wait_on_429=False`,
+        le 429 est rendu après la suspension de l'endpoint.
+        """
+        bucket = get_bucket('bland', endpoint_name)
+        for attempt in itertools.count(1):
+            bucket.acquire()
+            resp = self.session.request(method, url, headers=self.headers, **kwargs)
+            if resp.status_code != 429:
+                return resp
+            if not wait_on_429:
+                bucket.pause(rate_limit_delay(resp.headers.get('Retry-After'), attempt))
+                return resp
+            logger.warning(f"🚦 429 de Bland sur {endpoint_name} ({attempt} refus consécutif(s)): requête en attente")
+            bucket.pause(rate_limit_delay(resp.headers.get('Retry-After'), attempt))
+
     def make_call(self,
                   to_number: str,
                   contact_id: str,
@@ -58,7 +104,9 @@ class BlendService:
                   first_sentence: str = "hello, je suis une IA",
                   voice: str = "e10f0745-ff46-4b37-9be1-34cbda38af91",
                   max_duration: int = 12,
-                  language: str = "fr") -> Dict[str, Any]:
+                  language: str = "fr",
+                  webhook: Optional[str] = None,
+                  idempotency_key: Optional[str] = None) -> Dict[str, Any]:
         """Initie un appel via Blend API.
 
         Args:
@@ -66,9 +114,15 @@ class BlendService:
             contact_id: Identifiant interne du contact (pour corrélation).
             task_prompt: Prompt détaillé décrivant le flow/contexte de l'appel.
             first_sentence: Phrase d'ouverture pour le modèle vocal.
+            webhook: URL à laquelle Bland postera l'appel terminé (transcript compris).
+            idempotency_key: Clé (campagne, contact, tentative) du lancement, transmise
+                dans les métadonnées pour identifier un appel lancé en double.
 
         Returns:
             La réponse JSON renvoyée par l'API Blend (ou un dict d'erreur).
+            Un dict d'erreur avec `circuit_open` ou `rate_limited` (429, endpoint
+            suspendu) garantit qu'aucun appel n'a été passé ; `uncertain` signale un lancement peut-être passé (délai de
+            réponse dépassé, 5xx) et introuvable chez Bland par sa clé d'idempotence.
         """
 
         data = {
@@ -93,6 +147,10 @@ class BlendService:
                 "contact_id": contact_id
             }
         }
+        if webhook:
+            data["webhook"] = webhook
+        if idempotency_key:
+            data["metadata"]["idempotency_key"] = idempotency_key
 
         # Logging de la requête
         logger.info(f"=== APPEL BLEND AI ===")
@@ -100,10 +158,12 @@ class BlendService:
         logger.info(f"Numéro: {to_number}")
         logger.info(f"Endpoint: {self.endpoint}")
         logger.debug(f"Headers: {json.dumps({k: v[:20] + '...' if k == 'Authorization' and len(v) > 20 else v for k, v in self.headers.items()}, indent=2)}")
-        logger.debug(f"Payload complet:\n{json.dumps(data, indent=2, ensure_ascii=False)}")
+        # L'URL de webhook porte le secret partagé du récepteur: masquée dans les logs
+        logged = {**data, "webhook": webhook.split('?')[0] + '?...'} if webhook else data
+        logger.debug(f"Payload complet:\n{json.dumps(logged, indent=2, ensure_ascii=False)}")
         
         try:
-            resp = requests.post(self.endpoint, headers=self.headers, json=data, timeout=30)
+            resp = self._request('POST', 'dial', self.endpoint, idempotent=False, json=data, timeout=30)
             
             # Log de la réponse
             logger.info(f"Status Code: {resp.status_code}")
@@ -119,6 +179,19 @@ class BlendService:
             return response_json if 'response_json' in locals() else resp.json()
             
         except requests.HTTPError as e:
+            if e.response.status_code == 429:
+                # Refusée sans être traitée: le lanceur attend la fin de la pause de l'endpoint puis la renvoie
+                logger.warning(f"🚦 Lancement refusé par Bland (429): remis en attente")
+                return {
+                    "error": True,
+                    "rate_limited": True,
+                    "message": "Limite de débit de Bland atteinte (429)",
+                    "status_code": 429
+                }
+            if e.response.status_code in TRANSIENT_STATUS_CODES and idempotency_key is not None:
+                # Un 5xx (passerelle) peut arriver après que Bland a passé l'appel: on le cherche
+                logger.error(f"❌ ERREUR HTTP {e.response.status_code} au lancement: {e.response.text}")
+                return self._reconcile_dial(idempotency_key, to_number, f"erreur HTTP {e.response.status_code}")
             logger.error(f"❌ ERREUR HTTP {e.response.status_code}")
             logger.error(f"Response Body: {e.response.text}")
             logger.error(f"Request URL: {e.request.url}")
@@ -133,6 +206,18 @@ class BlendService:
                 "request_url": e.request.url,
                 "request_body": data
             }
+        except CircuitOpenError as e:
+            logger.error(f"❌ {str(e)}")
+            return {
+                "error": True,
+                "circuit_open": True,
+                "message": str(e),
+                "status_code": None
+            }
+        except (requests.Timeout, requests.ConnectionError) as e:
+            # La requête a pu être traitée par Bland avant la coupure: on cherche l'appel au lieu de le relancer
+            logger.error(f"❌ Pas de réponse de Bland au lancement: {str(e)}")
+            return self._reconcile_dial(idempotency_key, to_number, f"pas de réponse de Bland: {str(e)}")
         except requests.RequestException as e:
             logger.error(f"❌ ERREUR REQUÊTE: {str(e)}")
             return {
@@ -141,6 +226,51 @@ class BlendService:
                 "status_code": getattr(e.response, 'status_code', None)
             }
 
+    def _reconcile_dial(self, idempotency_key: Optional[str], to_number: str, reason: str) -> Dict[str, Any]:
+        """Issue d'un lancement peut-être passé chez Bland: l'appel retrouvé par sa clé, sinon une erreur `uncertain`"""
+        if idempotency_key:
+            lookup = self.find_call(idempotency_key, to_number)
+            if lookup.get('call_id'):
+                logger.warning(f"🔁 Appel {lookup['call_id']} retrouvé par sa clé d'idempotence {idempotency_key}")
+                return {"status": "success", "call_id": lookup['call_id'], "recovered": True}
+        return {
+            "error": True,
+            "uncertain": True,
+            "message": f"Lancement incertain ({reason})",
+            "status_code": None
+        }
+
+    def find_call(self, idempotency_key: str, to_number: str, limit: int = 20) -> Dict[str, Any]:
+        """Cherche chez Bland l'appel lancé avec une clé d'idempotence (metadata.idempotency_key)
+
+        Les derniers appels vers `to_number` sont listés ; les métadonnées d'un
+        appel sont relues une à une si la liste ne les contient pas.
+
+        Returns:
+            {'call_id': id ou None si aucun appel ne porte la clé},
+            ou un dict d'erreur si Bland n'a pas pu être interrogé
+        """
+        try:
+            resp = self._request('GET', 'status', self.endpoint, params={'to_number': to_number, 'limit': limit},
+                                 timeout=15)
+            resp.raise_for_status()
+            calls = resp.json().get('calls') or []
+        except (requests.RequestException, CircuitOpenError, ValueError) as e:
+            logger.error(f"❌ Recherche de l'appel {idempotency_key} impossible: {str(e)}")
+            return {"error": True, "message": str(e)}
+
+        for call in calls:
+            call_id = call.get('call_id') or call.get('c_id') or call.get('id')
+            metadata = call.get('metadata')
+            if metadata is None and call_id:
+                details = self.fetch_call_result(call_id)
+                if details.get('error'):
+                    return {"error": True, "message": details.get('message')}
+                metadata = details.get('metadata')
+            if (metadata or {}).get('idempotency_key') == idempotency_key:
+                return {"call_id": call_id}
+        return {"call_id": None}
+
     def fetch_call_result(self, call_id: str) -> Dict[str, Any]:
         """Récupère l'état ou le résultat d'un appel (si l'API le permet).
 
@@ -156,7 +286,7 @@ class BlendService:
         logger.debug(f"URL: {url}")
         
         try:
-            resp = requests.get(url, headers=self.headers, timeout=15)
+            resp = self._request('GET', 'status', url, timeout=15)
             logger.info(f"Status Code: {resp.status_code}")
             
             resp.raise_for_status()
@@ -168,6 +298,9 @@ class BlendService:
             logger.error(f"❌ ERREUR HTTP lors de fetch_call_result: {e.response.status_code}")
             logger.error(f"Response: {e.response.text}")
             return {"error": True, "message": str(e), "response": e.response.text}
+        except CircuitOpenError as e:
+            logger.error(f"❌ {str(e)}")
+            return {"error": True, "circuit_open": True, "message": str(e)}
         except requests.RequestException as e:
             logger.error(f"❌ ERREUR lors de fetch_call_result: {str(e)}")
             return {"error": True, "message": str(e)}
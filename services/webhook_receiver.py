@@ -0,0 +1,232 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlencode, urlsplit, urlunsplit
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Taille maximale acceptée pour un callback (transcript compris)
+MAX_BODY_SIZE = 5 * 1024 * 1024
+
+# Un callback non réclamé est oublié au bout d'une heure
+UNCLAIMED_TTL = 3600
+
+# Paramètre de l'URL de webhook portant le secret partagé
+TOKEN_PARAM = 'token'
+# En-têtes acceptés à la place du paramètre: secret en clair, ou HMAC-SHA256 du corps
+SECRET_HEADER = 'X-Webhook-Secret'
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+# Récepteurs partagés par toutes les sessions Streamlit du processus (un par port)
+_receivers: Dict[int, 'CallWebhookReceiver'] = {}
+_receivers_lock = threading.Lock()
+
+
+class CallWebhookReceiver:
+    """Serveur HTTP local recevant les callbacks de fin d'appel de Bland
+
+    Bland poste l'objet de l'appel terminé (call_id, status, metadata,
+    concatenated_transcript...) sur l'URL passée dans le champ `webhook`
+    de make_call. Les callbacks sont corrélés par call_id (par
+    metadata.contact_id seulement si le call_id de l'appel est inconnu), et
+    réveillent immédiatement le thread qui attend cet appel : plus besoin
+    d'interroger l'API toutes les 5 secondes.
+
+    Un callback n'est accepté que s'il prouve la connaissance du secret
+    partagé (WEBHOOK_SECRET) : paramètre `token` de l'URL (voir
+    signed_webhook_url), en-tête X-Webhook-Secret, ou X-Webhook-Signature
+    (HMAC-SHA256 hexadécimal du corps). Sans secret, tout callback est
+    refusé. Le serveur n'écoute par défaut que sur 127.0.0.1 : il est
+    exposé par le tunnel ou le reverse proxy de WEBHOOK_URL.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8765, secret: Optional[str] = None):
+        self.host = host
+        self.port = port
+        self.secret = secret or ''
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._received: Dict[str, tuple] = {}
+        self._condition = threading.Condition()
+        self.callbacks_received = 0
+
+    # ------------------------------------------------------------------
+    # Cycle de vie du serveur
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Démarre le serveur dans un thread dédié (sans effet s'il tourne déjà)"""
+        if self._server is not None:
+            return
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY_SIZE:
+                    self._reply(413, {'error': 'payload too large'})
+                    return
+                body = self.rfile.read(length)
+                if not receiver.authorized(self.path, self.headers, body):
+                    logger.warning(f"⚠️ Callback non authentifié refusé ({self.address_string()})")
+                    self._reply(401, {'error': 'unauthorized'})
+                    return
+                try:
+                    payload = json.loads(body or b'{}')
+                except json.JSONDecodeError:
+                    self._reply(400, {'error': 'invalid json'})
+                    return
+                if not isinstance(payload, dict) or not receiver.handle(payload):
+                    self._reply(400, {'error': 'missing call_id'})
+                    return
+                self._reply(200, {'ok': True})
+
+            def _reply(self, code: int, body: Dict):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                logger.debug(f"Webhook {self.address_string()} - {format % args}")
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="call-webhook", daemon=True)
+        self._thread.start()
+        logger.info(f"📡 Récepteur de webhooks démarré sur {self.host}:{self.port}")
+        if not self.secret:
+            logger.warning("⚠️ WEBHOOK_SECRET non configuré: tous les callbacks seront refusés")
+
+    def stop(self):
+        """Arrête le serveur"""
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        logger.info("📡 Récepteur de webhooks arrêté")
+
+    def authorized(self, path: str, headers, body: bytes) -> bool:
+        """Le callback prouve-t-il la connaissance du secret partagé ?"""
+        if not self.secret:
+            return False
+        secret = self.secret.encode('utf-8')
+        token = parse_qs(urlsplit(path).query).get(TOKEN_PARAM, [''])[0]
+        if token and hmac.compare_digest(token.encode('utf-8'), secret):
+            return True
+        header = headers.get(SECRET_HEADER)
+        if header and hmac.compare_digest(header.encode('utf-8'), secret):
+            return True
+        signature = headers.get(SIGNATURE_HEADER)
+        if signature:
+            expected = hmac.new(secret, body, hashlib.sha256).hexdigest()
+            return hmac.compare_digest(signature.removeprefix('sha256=').encode('utf-8'), expected.encode('utf-8'))
+        return False
+
+    # ------------------------------------------------------------------
+    # Corrélation des callbacks
+    # ------------------------------------------------------------------
+
+    def handle(self, payload: Dict) -> bool:
+        """Enregistre un callback reçu et réveille le thread qui l'attend
+
+        Returns:
+            False si le callback ne peut pas être corrélé (ni call_id ni contact_id)
+        """
+        call_id = _call_id(payload)
+        contact_id = (payload.get('metadata') or {}).get('contact_id')
+        if not call_id and not contact_id:
+            logger.warning("⚠️ Callback sans call_id ni contact_id ignoré")
+            return False
+
+        now = time.monotonic()
+        with self._condition:
+            self._received = {k: v for k, v in self._received.items() if now - v[0] < UNCLAIMED_TTL}
+            for key in (f"call:{call_id}" if call_id else None, f"contact:{contact_id}" if contact_id else None):
+                if key:
+                    self._received[key] = (now, payload)
+            self.callbacks_received += 1
+            self._condition.notify_all()
+
+        logger.info(f"📩 Callback reçu pour call_id: {call_id} (contact {contact_id}, status: {payload.get('status')})")
+        return True
+
+    def wait(self, call_id: Optional[str], contact_id: Optional[str], timeout: float) -> Optional[Dict]:
+        """Attend le callback d'un appel (au plus `timeout` secondes)
+
+        Returns:
+            L'objet de l'appel posté par Bland, ou None si rien n'est arrivé à temps
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while True:
+                payload = self._match(call_id, contact_id)
+                if payload is not None:
+                    self.discard(call_id, contact_id)
+                    return payload
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._condition.wait(remaining)
+
+    def _match(self, call_id: Optional[str], contact_id: Optional[str]) -> Optional[Dict]:
+        if call_id and f"call:{call_id}" in self._received:
+            return self._received[f"call:{call_id}"][1]
+        # call_id connu: seul un callback portant ce call_id compte (ni une tentative
+        # précédente du même contact, ni un callback sans call_id)
+        if not call_id and contact_id and f"contact:{contact_id}" in self._received:
+            return self._received[f"contact:{contact_id}"][1]
+        return None
+
+    def discard(self, call_id: Optional[str], contact_id: Optional[str]):
+        """Oublie le callback d'un appel (ex: résultat obtenu par le polling de secours)"""
+        with self._condition:
+            self._received.pop(f"call:{call_id}", None)
+            self._received.pop(f"contact:{contact_id}", None)
+
+
+def _call_id(payload: Dict) -> Optional[str]:
+    return payload.get('call_id') or payload.get('c_id') or payload.get('id')
+
+
+def signed_webhook_url(url: str, secret: str) -> str:
+    """URL de webhook transmise à Bland, portant le secret partagé en paramètre `token`"""
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    query[TOKEN_PARAM] = [secret]
+    return urlunsplit(parts._replace(query=urlencode(query, doseq=True)))
+
+
+def get_webhook_receiver(port: int, host: str = "127.0.0.1", secret: Optional[str] = None) -> CallWebhookReceiver:
+    """Récepteur démarré du processus pour ce port (créé au premier appel)"""
+    with _receivers_lock:
+        if port not in _receivers:
+            receiver = CallWebhookReceiver(host=host, port=port, secret=secret)
+            receiver.start()
+            _receivers[port] = receiver
+        return _receivers[port]
+
+
+if __name__ == "__main__":
+    # Usage: WEBHOOK_SECRET=... python -m services.webhook_receiver [port]
+    # Lance le récepteur seul (sur 127.0.0.1) et journalise les callbacks reçus
+    import os
+    import sys
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    receiver = CallWebhookReceiver(port=int(sys.argv[1]) if len(sys.argv) > 1 else 8765,
+                                   secret=os.environ.get('WEBHOOK_SECRET'))
+    receiver.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        receiver.stop()
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.config import Config  # noqa: E402
+import services.rate_limiter as rate_limiter  # noqa: E402
+import services.resilience as resilience  # noqa: E402
+import utils.analysis_cache as analysis_cache  # noqa: E402
+import utils.json_database as json_database  # noqa: E402
+
+
+@pytest.fixture
+def secrets(monkeypatch, tmp_path):
+    """Secrets de test (au lieu de .streamlit/secrets.toml), données dans un dossier temporaire
+
+    Les registres partagés du processus (disjoncteurs, seaux, caches) sont
+    vidés pour que chaque test parte d'un état neuf.
+    """
+    values = {'DATA_DIR': str(tmp_path / 'data'), 'OPENAI_API_KEY': 'sk-test', 'BLEND_API_KEY': 'test'}
+    monkeypatch.setattr(Config, 'get_secret', staticmethod(lambda key, default='': values.get(key, default)))
+    monkeypatch.setattr(resilience, '_breakers', {})
+    monkeypatch.setattr(rate_limiter, '_buckets', {})
+    monkeypatch.setattr(analysis_cache, '_caches', {})
+    monkeypatch.setattr(json_database, '_shared_storage', {})
+    return values
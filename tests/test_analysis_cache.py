@@ -0,0 +1,50 @@
+import os
+
+from utils.analysis_cache import AnalysisCache
+
+
+def verdict(name):
+    return {'consent': True, 'identity_confirmed': True, 'reasoning': name}
+
+
+def test_hits_stay_in_memory_until_flushed(tmp_path):
+    path = str(tmp_path / 'analysis_cache.jsonl')
+    cache = AnalysisCache(path, max_entries=2, flush_interval=3600)
+    cache.put('a', verdict('a'), 1.0)
+    cache.put('b', verdict('b'), 1.0)
+    size = os.path.getsize(path)
+
+    assert cache.get('a')['reasoning'] == 'a'
+    assert os.path.getsize(path) == size
+
+    # L'ordre d'utilisation est écrit au flush et survit au redémarrage: 'b' est évincée
+    cache.flush()
+    reopened = AnalysisCache(path, max_entries=2)
+    reopened.put('c', verdict('c'), 1.0)
+    assert reopened.get('b') is None
+    assert reopened.get('a')['reasoning'] == 'a'
+
+
+def test_compaction_keeps_entries_written_by_other_processes(tmp_path):
+    path = str(tmp_path / 'analysis_cache.jsonl')
+    first = AnalysisCache(path, max_entries=3)
+    other = AnalysisCache(path, max_entries=3)
+
+    first.put('x', verdict('x'), 1.0)
+    other.put('other', verdict('other'), 2.0)
+    for _ in range(6):
+        first.put('y', verdict('y'), 1.0)
+
+    # `first` a compacté le journal sans avoir jamais lu l'entrée de l'autre processus
+    assert sum(1 for _ in open(path)) == 3
+    assert AnalysisCache(path, max_entries=3).get('other')['reasoning'] == 'other'
+
+
+def test_miss_reads_entries_added_by_other_processes(tmp_path):
+    path = str(tmp_path / 'analysis_cache.jsonl')
+    first = AnalysisCache(path)
+    other = AnalysisCache(path)
+
+    other.put('other', verdict('other'), 2.0)
+    assert first.get('other')['reasoning'] == 'other'
+    assert first.stats()['hits'] == 1
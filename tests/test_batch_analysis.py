@@ -0,0 +1,128 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from services.async_openai_service import AsyncOpenAIService
+from services.batch_analysis import BatchAnalyzer, reanalyze_campaign
+from services.campaign_dispatcher import CampaignDispatcher
+from utils.json_database import JsonDatabase
+
+
+def completion(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def test_batch_analysis_runs_on_the_async_service(secrets, monkeypatch):
+    service = AsyncOpenAIService(max_concurrency=3)
+    service.cache.clear()
+    requests_ = []
+    shortcut_threads = set()
+
+    shortcut = service._shortcut
+
+    def tracked_shortcut(*args):
+        shortcut_threads.add(threading.current_thread() is threading.main_thread())
+        return shortcut(*args)
+
+    async def create_completion(client, semaphore, **kwargs):
+        async with semaphore:
+            requests_.append(kwargs)
+            await asyncio.sleep(0.01)
+        user = kwargs['messages'][1]['content']
+        if kwargs['response_format']['json_schema']['name'].startswith('packed'):
+            ids = [line.split(': ', 1)[1] for line in user.splitlines() if line.startswith('### id: ')]
+            # Le verdict du dernier transcript manque: il est analysé seul
+            verdicts = [{'id': i, 'consent': True, 'identity_confirmed': True, 'reasoning': 'lot'} for i in ids[:-1]]
+            return completion(json.dumps({'results': verdicts}))
+        return completion('{"consent": false, "identity_confirmed": null, "reasoning": "seul"}')
+
+    monkeypatch.setattr(service, '_shortcut', tracked_shortcut)
+    monkeypatch.setattr(service, 'create_completion', create_completion)
+    items = [{'id': str(i), 'transcript': f'user: hmm {i}', 'nom': 'Lucas', 'prenom': 'Daniel'} for i in range(5)]
+    items.append({'id': 'long', 'transcript': 'user: ' + 'x' * 3000, 'nom': 'Lucas', 'prenom': 'Daniel'})
+
+    analyzer = BatchAnalyzer(service, max_items=5)
+    results = analyzer.analyze(items)
+
+    assert [r['reasoning'] for r in results] == ['lot'] * 4 + ['seul', 'seul']
+    assert len(requests_) == 3
+    assert analyzer.batch_stats()['fallbacks'] == 2
+
+    # Un second passage est servi par le cache, lu hors de la boucle d'événements
+    requests_.clear()
+    shortcut_threads.clear()
+    assert service.analyze_batch(items[:4]) == results[:4]
+    assert requests_ == []
+    assert shortcut_threads == {False}
+
+
+def test_dispatcher_analyze_stage_uses_the_async_service(secrets, tmp_path, monkeypatch):
+    service = AsyncOpenAIService(max_concurrency=4)
+    service.cache.clear()
+
+    async def create_completion(client, semaphore, **kwargs):
+        async with semaphore:
+            service.in_flight += 1
+            service.max_in_flight = max(service.max_in_flight, service.in_flight)
+            await asyncio.sleep(0.05)
+            service.in_flight -= 1
+        return completion('{"consent": true, "identity_confirmed": true, "reasoning": "async"}')
+
+    monkeypatch.setattr(service, 'create_completion', create_completion)
+    db = JsonDatabase(str(tmp_path / 'campaign'))
+    db.add_contacts([{'nom': 'Lucas', 'prenom': f'Daniel{i}', 'telephone': f'+3360000000{i}'} for i in range(6)])
+    contacts = db.load_contacts()
+
+    dispatcher = CampaignDispatcher(None, service, db, max_concurrent_calls=6, analysis_workers=1, campaign_id='camp')
+
+    def track(contact, call_id):
+        return {'contact_id': contact['id'], 'call_sid': call_id, 'nom': contact['nom']}, f"user: hmm {contact['id']}"
+
+    monkeypatch.setattr(dispatcher, '_track', track)
+    try:
+        outcomes = list(dispatcher.dispatch([], [(c, {'call_id': f"call-{c['id']}"}) for c in contacts]))
+    finally:
+        service.close()
+
+    assert [o['error'] for o in outcomes] == [None] * 6
+    assert {r['reasoning'] for r in db.load_results()} == {'async'}
+    assert db.get_statistics()['completed'] == 6
+    # Un seul thread d'analyse, plusieurs requêtes en cours: l'étage ne bloque pas sur OpenAI
+    assert service.max_in_flight > 1
+
+
+def test_reanalysis_updates_statuses_once_per_status(secrets, tmp_path, monkeypatch):
+    service = AsyncOpenAIService()
+    service.cache.clear()
+
+    async def create_completion(client, semaphore, **kwargs):
+        ids = [line.split(': ', 1)[1] for line in kwargs['messages'][1]['content'].splitlines()
+               if line.startswith('### id: ')]
+        # Consentement pour les appels pairs uniquement
+        verdicts = [{'id': i, 'consent': int(i.split('-')[1]) % 2 == 0, 'identity_confirmed': True, 'reasoning': 'lot'}
+                    for i in ids]
+        return completion(json.dumps({'results': verdicts}))
+
+    monkeypatch.setattr(service, 'create_completion', create_completion)
+    db = JsonDatabase(str(tmp_path / 'campaign'))
+    db.add_contacts([{'nom': 'Lucas', 'prenom': f'Daniel{i}', 'telephone': f'+3360000000{i}'} for i in range(4)])
+    contacts = db.load_contacts()
+    for contact in contacts:
+        db.save_result({'contact_id': contact['id'], 'call_sid': f"call-{contact['id']}", 'analysis_error': True,
+                        'transcription': f"user: hmm {contact['id']}"})
+    db.bulk_update_status([c['id'] for c in contacts], 'to_analyze')
+
+    bulk_calls = []
+    bulk_update_status = db.bulk_update_status
+    monkeypatch.setattr(db, 'bulk_update_status', lambda ids, status: (
+        bulk_calls.append((sorted(ids), status)), bulk_update_status(ids, status))[1])
+    monkeypatch.setattr(db, 'update_contact_status', lambda *args: pytest.fail("mise à jour contact par contact"))
+
+    report = reanalyze_campaign(db, BatchAnalyzer(service, max_items=10))
+
+    assert report == {'to_analyze': 4, 'reanalyzed': 4, 'still_failing': 0}
+    assert sorted(bulk_calls, key=lambda call: call[1]) == [(['2', '4'], 'completed'), (['1', '3'], 'pending')]
+    assert db.get_statistics()['completed'] == 2
@@ -0,0 +1,19 @@
+from services.call_lifecycle import IN_PROGRESS, POLL_POLICY, CallLifecycle
+
+
+def test_in_progress_polling_detects_the_end_within_ten_seconds():
+    lifecycle = CallLifecycle('call-1', max_duration=12)
+    lifecycle.observe({'status': 'in-progress'})
+    assert lifecycle.state == IN_PROGRESS
+
+    intervals = [lifecycle.next_poll_interval() for _ in range(50)]
+
+    assert max(intervals) <= POLL_POLICY[IN_PROGRESS][1] <= 10
+    # Le backoff atteint bien le plafond au lieu de rester à l'intervalle initial
+    assert max(intervals) > POLL_POLICY[IN_PROGRESS][0]
+
+
+def test_poll_interval_never_exceeds_the_deadline():
+    lifecycle = CallLifecycle('call-1', max_duration=0, ring_timeout=0, grace_period=1)
+    lifecycle.observe({'status': 'in-progress'})
+    assert lifecycle.next_poll_interval() <= 1
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from utils.campaign_counters import compute_statistics, result_deltas, status_deltas
+from utils.json_database import JsonDatabase
+from utils.sqlite_database import SqliteDatabase
+
+
+def test_deltas():
+    assert status_deltas('pending', 'completed') == {'pending': -1, 'completed': 1}
+    assert status_deltas('pending', 'to_analyze') == {'pending': -1}
+    assert status_deltas('completed', 'completed') == {}
+    assert result_deltas({'consent': False, 'identity_confirmed': None, 'no_response': True}) == {
+        'total_calls': 1, 'consent_refused': 1, 'no_response': 1}
+
+    stats = compute_statistics([{'status': 'pending'}, {'status': 'to_analyze'}],
+                               [{'consent': True, 'identity_confirmed': False}])
+    assert (stats['total_contacts'], stats['pending'], stats['completed']) == (2, 1, 0)
+    assert (stats['consent_given'], stats['identity_rejected']) == (1, 1)
+
+
+@pytest.mark.parametrize('engine', [JsonDatabase, SqliteDatabase])
+def test_counters_match_a_full_recount_after_random_writes(engine, secrets, tmp_path):
+    rng = random.Random(4)
+    db = engine(str(tmp_path / 'campaign'))
+    db.add_contacts([{'nom': 'Lucas', 'prenom': f'Daniel{i}', 'telephone': f'+336000{i:05d}'} for i in range(20)])
+
+    for step in range(60):
+        ids = [c['id'] for c in db.load_contacts()]
+        operation = rng.choice(['status', 'bulk', 'result', 'add'])
+        if operation == 'status':
+            db.update_contact_status(rng.choice(ids), rng.choice(['pending', 'completed', 'to_analyze']))
+        elif operation == 'bulk':
+            db.bulk_update_status(rng.sample(ids, 5), rng.choice(['pending', 'completed']))
+        elif operation == 'result':
+            db.save_result({'contact_id': rng.choice(ids), 'call_sid': f'call-{step}',
+                            'consent': rng.choice([True, False, None]),
+                            'identity_confirmed': rng.choice([True, False, None]),
+                            'no_response': rng.choice([True, False])})
+        else:
+            db.add_contacts([{'nom': 'Martin', 'prenom': f'Step{step}', 'telephone': f'+337000{step:05d}'}])
+        assert db.get_statistics() == compute_statistics(db.load_contacts(), db.load_results()), operation
+
+    db.update_results({'call-0': {'consent': True}, 'call-1': {'identity_confirmed': False}})
+    assert db.verify_statistics()
+
+
+def test_json_counters_see_writes_from_other_processes(secrets, tmp_path):
+    data_dir = str(tmp_path / 'campaign')
+    db = JsonDatabase(data_dir)
+    db.add_contacts([{'nom': 'Lucas', 'prenom': 'Daniel', 'telephone': '+33600000001'}])
+    assert db.get_statistics()['total_calls'] == 0
+
+    # Autre processus: instance sans cache partagé avec la première
+    db.close()
+    other = JsonDatabase(data_dir)
+    other.save_result({'contact_id': '1', 'call_sid': 'call-1', 'consent': True, 'identity_confirmed': True})
+    other.update_contact_status('1', 'completed')
+    other.compact_results()
+
+    stats = db.get_statistics()
+    assert (stats['total_calls'], stats['consent_given'], stats['completed']) == (1, 1, 1)
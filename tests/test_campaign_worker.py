@@ -0,0 +1,103 @@
+import pytest
+
+from services import campaign_worker
+from services.campaign_dispatcher import CampaignDispatcher
+from services.campaign_worker import CampaignWorker
+from utils import worker_state
+from utils.campaign_catalog import CampaignCatalog
+from utils.database import create_database
+from utils.worker_state import WorkerState
+
+
+@pytest.fixture(params=['json', 'sqlite'])
+def campaign(request, secrets):
+    """Campagne active de trois contacts, mise en file pour le worker"""
+    secrets['DB_ENGINE'] = request.param
+    data_dir = secrets['DATA_DIR']
+    campaign_id = CampaignCatalog(data_dir).active()['id']
+    db = create_database(data_dir, campaign_id)
+    db.add_contacts([{'nom': 'Lucas', 'prenom': f'Daniel{i}', 'telephone': f'+3360000000{i}'} for i in range(3)])
+    assert WorkerState(data_dir).request_start(campaign_id)
+    return data_dir, db
+
+
+@pytest.fixture
+def dispatched(monkeypatch):
+    """Remplace le pipeline d'appels: enregistre ce que le worker lui confie"""
+    calls = []
+
+    def dispatch(self, contacts, resumed_calls=None):
+        calls.append(([c['id'] for c in contacts], [(c['id'], call['call_id']) for c, call in resumed_calls or []]))
+        for completed, contact in enumerate(contacts, 1):
+            yield {'contact': contact, 'result': {}, 'error': None, 'completed': completed}
+
+    monkeypatch.setattr(CampaignDispatcher, 'dispatch', dispatch)
+    return calls
+
+
+def test_setup_failure_fails_the_campaign_instead_of_leaving_it_queued(campaign, dispatched, monkeypatch):
+    data_dir, _ = campaign
+
+    def broken_service():
+        raise RuntimeError("clé OpenAI invalide")
+
+    monkeypatch.setattr(campaign_worker, 'AsyncOpenAIService', broken_service)
+    CampaignWorker(data_dir, interval=0.05).run_forever(once=True)
+
+    state = WorkerState(data_dir).load()
+    assert state['status'] == worker_state.FAILED
+    assert "clé OpenAI invalide" in state['last_event'] and state['finished_at']
+    assert dispatched == []
+
+
+def test_cancel_during_setup_is_not_overwritten_by_running(campaign, dispatched, monkeypatch):
+    data_dir, _ = campaign
+    reconcile = CampaignDispatcher.reconcile
+
+    def reconcile_then_cancel(self, inflight_calls):
+        assert WorkerState(data_dir).request_cancel()
+        return reconcile(self, inflight_calls)
+
+    monkeypatch.setattr(CampaignDispatcher, 'reconcile', reconcile_then_cancel)
+    CampaignWorker(data_dir, interval=0.05).run_forever(once=True)
+
+    assert WorkerState(data_dir).load()['status'] == worker_state.CANCELLED
+    assert dispatched == []
+
+
+def test_cancel_while_running_stops_new_calls(campaign, monkeypatch):
+    data_dir, _ = campaign
+    seen_cancel = []
+
+    def dispatch(self, contacts, resumed_calls=None):
+        yield {'contact': contacts[0], 'result': {}, 'error': None, 'completed': 1}
+        assert WorkerState(data_dir).request_cancel()
+        # Le battement de cœur du worker relaie la demande au dispatcher
+        seen_cancel.append(self.cancelled.wait(5))
+
+    monkeypatch.setattr(CampaignDispatcher, 'dispatch', dispatch)
+    CampaignWorker(data_dir, interval=0.05).run_forever(once=True)
+
+    state = WorkerState(data_dir).load()
+    assert seen_cancel == [True]
+    assert (state['status'], state['completed']) == (worker_state.CANCELLED, 1)
+
+
+def test_crashed_worker_resumes_inflight_calls_without_redialing(campaign, dispatched):
+    data_dir, db = campaign
+    first, second, third = db.load_contacts()
+    db.journal_call(first['id'], 'call-1')
+    db.journal_call(second['id'], 'call-2')
+    # Résultat sauvegardé juste avant l'arrêt, statut du contact pas encore écrit
+    db.save_result({'contact_id': second['id'], 'call_sid': 'call-2', 'consent': True,
+                    'identity_confirmed': True, 'no_response': False, 'transcription': 'user: oui'})
+    state = WorkerState(data_dir)
+    state.update(status=worker_state.RUNNING)
+
+    CampaignWorker(data_dir, interval=0.05).run_forever(once=True)
+
+    assert dispatched == [([third['id']], [(first['id'], 'call-1')])]
+    assert {c['id']: c['status'] for c in db.load_contacts()}[second['id']] == 'completed'
+    assert [c['call_id'] for c in db.get_inflight_calls()] == ['call-1']
+    final = state.load()
+    assert (final['status'], final['total']) == (worker_state.COMPLETED, 2)
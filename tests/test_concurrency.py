@@ -0,0 +1,78 @@
+import multiprocessing
+
+import pytest
+
+from utils.json_database import JsonDatabase
+from utils.jsonl_log import JsonlLog
+
+PROCESSES = 4
+ROUNDS = 40
+
+
+def campaign_writer(args):
+    """Un processus de campagne: imports, résultats, statuts et compactions entrelacés"""
+    data_dir, worker = args
+    db = JsonDatabase(data_dir)
+    for round_ in range(ROUNDS):
+        report = db.add_contacts([
+            {'nom': f'Nom{worker}', 'prenom': f'Prenom{round_}-{k}', 'telephone': f'+336{worker:02d}{round_:03d}{k}'}
+            for k in range(2)
+        ])
+        assert report['count'] == 2
+        called = next(c for c in db.load_contacts()
+                      if c['nom'] == f'Nom{worker}' and c['prenom'] == f'Prenom{round_}-0')
+        db.save_result({'contact_id': called['id'], 'call_sid': f'call-{worker}-{round_}',
+                        'consent': True, 'identity_confirmed': round_ % 2 == 0, 'no_response': False,
+                        'transcription': f'user: oui {worker} {round_}'})
+        db.update_contact_status(called['id'], 'completed')
+        if round_ % 10 == 5:
+            db.contacts.compact()
+            db.compact_results()
+
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason="fork indisponible")
+def test_concurrent_processes_keep_campaign_consistent(secrets, tmp_path):
+    data_dir = str(tmp_path / 'campaign')
+    JsonDatabase(data_dir).close()
+
+    with multiprocessing.get_context('fork').Pool(PROCESSES) as pool:
+        pool.map(campaign_writer, [(data_dir, worker) for worker in range(PROCESSES)])
+
+    # Lecture par une instance neuve: rien ne vient du cache du processus
+    db = JsonDatabase(data_dir)
+    contacts = db.load_contacts()
+    results = db.load_results(include_transcripts=True)
+    total = PROCESSES * ROUNDS * 2
+
+    ids = [c['id'] for c in contacts]
+    assert len(ids) == len(set(ids)) == total
+    assert sorted(int(i) for i in ids) == list(range(1, total + 1))
+    assert len(results) == len({r['call_sid'] for r in results}) == PROCESSES * ROUNDS
+    assert {r['contact_id'] for r in results} == {c['id'] for c in contacts if c['status'] == 'completed'}
+    assert all(r['transcription'] == 'user: oui {} {}'.format(*r['call_sid'].split('-')[1:]) for r in results)
+
+    stats = db.get_statistics()
+    assert stats['total_contacts'] == total
+    assert stats['completed'] == stats['total_calls'] == PROCESSES * ROUNDS
+    assert stats['pending'] == total - PROCESSES * ROUNDS
+    assert db.verify_statistics()
+
+
+def test_counters_survive_a_crash_between_data_and_counter_writes(secrets, tmp_path):
+    data_dir = str(tmp_path / 'campaign')
+    db = JsonDatabase(data_dir)
+    db.add_contacts([{'nom': 'Lucas', 'prenom': 'Daniel', 'telephone': '+33600000001'}])
+    assert db.get_statistics()['pending'] == 1
+    db.close()
+
+    # Un processus tué juste après ses ajouts: aucune autre trace que les journaux
+    contact = dict(JsonDatabase(data_dir).load_contacts()[0], status='completed')
+    JsonlLog(str(tmp_path / 'campaign' / 'contacts.journal.jsonl')).append(contact)
+    JsonlLog(str(tmp_path / 'campaign' / 'results.jsonl')).append(
+        {'contact_id': contact['id'], 'call_sid': 'call-1', 'consent': True, 'identity_confirmed': True})
+
+    reopened = JsonDatabase(data_dir)
+    stats = reopened.get_statistics()
+    assert (stats['pending'], stats['completed'], stats['total_calls'], stats['consent_given']) == (0, 1, 1, 1)
+    assert reopened.verify_statistics()
+    assert not (tmp_path / 'campaign' / 'stats.json').exists()
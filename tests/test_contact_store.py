@@ -0,0 +1,75 @@
+import json
+
+import pytest
+
+from utils.contact_store import ContactStore
+
+
+def make_store(tmp_path, compact_threshold=1000):
+    snapshot = tmp_path / 'contacts.json'
+    if not snapshot.exists():
+        snapshot.write_text('[]')
+    return ContactStore(str(snapshot), str(tmp_path / 'contacts.journal.jsonl'), str(tmp_path / 'locks'),
+                        compact_threshold=compact_threshold)
+
+
+def contacts(*ids):
+    return [{'id': i, 'nom': 'Lucas', 'prenom': f'Daniel{i}', 'status': 'pending'} for i in ids]
+
+
+def crash_before_journal_reset(store, monkeypatch):
+    def crash(records):
+        raise SystemExit("arrêt brutal")
+
+    monkeypatch.setattr(store.journal, 'rewrite', crash)
+
+
+def test_journal_is_replayed_then_compacted(tmp_path):
+    store = make_store(tmp_path, compact_threshold=5)
+    store.add_many(contacts('1', '2'))
+    store.update('1', status='completed')
+
+    other = make_store(tmp_path)
+    assert other.count('completed') == 1 and other.count() == 2
+    assert len(store.journal.load()) == 3
+
+    store.update_many(['1', '2'], status='pending')
+    # 5 lignes de journal: réintégrées dans l'instantané
+    assert store.journal.load() == []
+    assert json.loads((tmp_path / 'contacts.json').read_text())['contacts'][0]['status'] == 'pending'
+    assert make_store(tmp_path).count('pending') == 2
+    assert other.count('pending') == 2
+
+
+def test_crash_after_compaction_does_not_replay_covered_entries(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.add_many(contacts('1', '2'))
+    store.update('2', status='completed')
+    crash_before_journal_reset(store, monkeypatch)
+    with pytest.raises(SystemExit):
+        store.compact()
+
+    # Le journal d'avant l'instantané est toujours là; un autre processus y ajoute une modification
+    recovered = make_store(tmp_path)
+    recovered.update('1', status='completed')
+
+    reloaded = make_store(tmp_path)
+    assert [c['id'] for c in reloaded.all()] == ['1', '2']
+    assert reloaded.count('completed') == 2
+
+
+def test_crash_after_replace_all_does_not_resurrect_contacts(tmp_path, monkeypatch):
+    store = make_store(tmp_path)
+    store.add_many(contacts('1', '2'))
+    crash_before_journal_reset(store, monkeypatch)
+    with pytest.raises(SystemExit):
+        store.replace_all([])
+
+    assert make_store(tmp_path).all() == []
+
+
+def test_legacy_list_snapshot_is_still_read(tmp_path):
+    (tmp_path / 'contacts.json').write_text(json.dumps(contacts('1')))
+    store = make_store(tmp_path)
+    store.update('1', status='completed')
+    assert make_store(tmp_path).get('1')['status'] == 'completed'
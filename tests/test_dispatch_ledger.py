@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from services.campaign_dispatcher import CampaignDispatcher
+from utils import dispatch_ledger
+from utils.dispatch_ledger import CLAIMED, PLACED, RELEASED, DispatchLedger
+from utils.json_database import JsonDatabase
+from utils.sqlite_database import SqliteDatabase
+
+
+def test_ledger_index_is_incremental_and_shared(tmp_path):
+    path = str(tmp_path / 'dispatches.jsonl')
+    ledger = DispatchLedger(path)
+    other = DispatchLedger(path)
+
+    start = time.perf_counter()
+    for i in range(2000):
+        assert ledger.claim(f'camp:{i}:1', str(i)) is None
+        ledger.update(f'camp:{i}:1', PLACED, call_id=f'call-{i}')
+    # Un registre reparsé à chaque réservation dépasserait largement ce budget
+    assert time.perf_counter() - start < 10
+
+    assert other.get('camp:1999:1')['call_id'] == 'call-1999'
+    assert other.claim('camp:5:1', '5')['state'] == PLACED
+    other.update('camp:7:1', RELEASED)
+    assert ledger.claim('camp:7:1', '7') is None
+
+    ledger.clear()
+    assert other.get('camp:5:1') is None
+
+
+@pytest.fixture(params=[JsonDatabase, SqliteDatabase])
+def db(request, secrets, tmp_path):
+    return request.param(str(tmp_path / 'campaign'))
+
+
+def test_stale_claim_is_never_taken_over_without_confirmation(db, monkeypatch):
+    monkeypatch.setattr(dispatch_ledger, 'CLAIM_TIMEOUT', 0)
+    assert db.claim_dispatch('camp:1:1', '1') is None
+
+    stale = db.claim_dispatch('camp:1:1', '1')
+    assert stale['state'] == CLAIMED and dispatch_ledger.is_stale(stale)
+
+    assert db.claim_dispatch('camp:1:1', '1', takeover=stale) is None
+    # La reprise est un compare-and-set: un second lanceur avec la même vue échoue
+    assert db.claim_dispatch('camp:1:1', '1', takeover=stale) is not None
+
+
+class FakeBland:
+    def __init__(self, lookup):
+        self.lookup = lookup
+        self.dialed = []
+
+    def find_call(self, idempotency_key, to_number):
+        return self.lookup
+
+    def build_task_prompt(self, nom, prenom):
+        return 'prompt'
+
+    def make_call(self, **kwargs):
+        self.dialed.append(kwargs['idempotency_key'])
+        return {'status': 'success', 'call_id': 'call-new'}
+
+
+@pytest.mark.parametrize('lookup, dialed, call_id', [
+    ({'call_id': 'call-old'}, [], 'call-old'),
+    ({'call_id': None}, ['camp:1:1'], 'call-new'),
+    ({'error': True, 'message': 'Bland indisponible'}, [], None),
+])
+def test_dispatcher_reconciles_stale_claim_with_provider(db, monkeypatch, lookup, dialed, call_id):
+    monkeypatch.setattr(dispatch_ledger, 'CLAIM_TIMEOUT', 0)
+    db.add_contacts([{'nom': 'Lucas', 'prenom': 'Daniel', 'telephone': '+33600000001'}])
+    contact = db.load_contacts()[0]
+    # Arrêt du worker pendant la requête de lancement: réservation sans call_id
+    assert db.claim_dispatch('camp:1:1', contact['id']) is None
+
+    bland = FakeBland(lookup)
+    dispatcher = CampaignDispatcher(bland, None, db, campaign_id='camp')
+    result, error = dispatcher._dial(contact)
+
+    assert bland.dialed == dialed
+    assert result == call_id
+    assert (error is None) == (call_id is not None)
+    if call_id:
+        assert [c['call_id'] for c in db.get_inflight_calls()] == [call_id]
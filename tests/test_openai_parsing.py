@@ -0,0 +1,60 @@
+from types import SimpleNamespace
+
+import pytest
+
+from services.openai_service import OpenAIService, normalize_verdict, parse_json_reply
+
+
+def response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+@pytest.mark.parametrize('text, value, repaired', [
+    ('{"consent": true}', {'consent': True}, False),
+    ('```json\n{"consent": true}\n```', {'consent': True}, True),
+    ('```\n[1, 2]', [1, 2], True),
+    ('Voici: {"consent": false} En espérant que ça aide. {"autre": 1}', {'consent': False}, True),
+])
+def test_parse_json_reply_repairs_common_defects(text, value, repaired):
+    assert parse_json_reply(text) == (value, repaired)
+
+
+@pytest.mark.parametrize('text', ['', 'Je ne peux pas répondre.', '{"consent": tru'])
+def test_parse_json_reply_rejects_replies_without_json(text):
+    with pytest.raises(ValueError):
+        parse_json_reply(text)
+
+
+def test_normalize_verdict_converts_text_values():
+    verdict, normalized = normalize_verdict({'consent': 'True ', 'identity_confirmed': 'null', 'reasoning': None})
+    assert verdict == {'consent': True, 'identity_confirmed': None, 'reasoning': ''}
+    assert normalized
+    assert normalize_verdict({'consent': False, 'identity_confirmed': True, 'reasoning': 'ok'})[1] is False
+
+
+@pytest.mark.parametrize('data', [
+    [{'consent': True}],
+    {'identity_confirmed': True},
+    {'consent': 'peut-être', 'identity_confirmed': True},
+    {'consent': 1, 'identity_confirmed': True},
+])
+def test_normalize_verdict_rejects_invalid_verdicts(data):
+    with pytest.raises(ValueError):
+        normalize_verdict(data)
+
+
+def test_repaired_reply_is_cached_and_unreadable_one_is_an_analysis_error(secrets):
+    service = OpenAIService()
+    service.cache.clear()
+
+    repaired = service._parse_response(
+        response('```json\n{"consent": true, "identity_confirmed": "false", "reasoning": "ok"}\n```'), 'k1', 1.0)
+    assert (repaired['consent'], repaired['identity_confirmed']) == (True, False)
+    assert service.cache.get('k1') == repaired
+
+    failed = service._parse_response(response('{"consent": "peut-être"}'), 'k2', 1.0)
+    assert failed['analysis_error'] and failed['consent'] is None
+    assert failed['raw_response'] == '{"consent": "peut-être"}'
+    assert service.cache.get('k2') is None
+    stats = service.analysis_stats()
+    assert (stats['repaired'], stats['parse_failures']) == (1, 1)
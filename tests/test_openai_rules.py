@@ -0,0 +1,83 @@
+import pytest
+
+from services.openai_service import OpenAIService
+
+CONSENT_QUESTION = ("assistant: Bonjour, conformément au règlement RGPD, acceptez-vous de poursuivre cet échange "
+                    "pour la vérification de vos données? Merci de répondre par oui ou par non.")
+IDENTITY_QUESTION = "assistant: Confirmez-vous être Daniel Lucas? Merci de répondre par oui ou par non."
+
+
+def transcript(consent_answer: str, identity_answer: str, greeting: str = "Allô ?") -> str:
+    return (f"assistant: Bonjour, je suis une assistante virtuelle de VoiceCheck AI.\nuser: {greeting}\n"
+            f"{CONSENT_QUESTION}\nuser: {consent_answer}\n{IDENTITY_QUESTION}\nuser: {identity_answer}\n"
+            "assistant: Parfait, merci pour votre confirmation. Au revoir.")
+
+
+@pytest.fixture
+def service(secrets):
+    return OpenAIService()
+
+
+@pytest.mark.parametrize('consent_answer, identity_answer', [
+    ("Oui.", "Oui c'est moi."),
+    ("Euh oui, d'accord.", "Oui, c'est bien moi, Daniel Lucas."),
+    ("J'accepte.", "Exact."),
+])
+def test_clean_yes_is_classified_locally(service, consent_answer, identity_answer):
+    result = service.classify_transcript(transcript(consent_answer, identity_answer), 'Lucas', 'Daniel')
+    assert (result['consent'], result['identity_confirmed']) == (True, True)
+
+
+@pytest.mark.parametrize('answer', [
+    "euh oui enfin j'hésite",
+    "oui, attendez, c'est pour quoi ?",
+    "oui mais c'est mon mari qui gère",
+    "exact mais je raccroche",
+    "oui ?",
+    "oui pas de souci",
+    "non",
+    "bien",
+])
+@pytest.mark.parametrize('question', ['consent', 'identity'])
+def test_hesitant_or_qualified_answer_goes_to_llm(service, answer, question):
+    answers = (answer, "Oui.") if question == 'consent' else ("Oui.", answer)
+    assert service.classify_transcript(transcript(*answers), 'Lucas', 'Daniel') is None
+
+
+def test_question_mark_outside_greeting_goes_to_llm(service):
+    text = transcript("Oui.", "Oui.") + "\nuser: Vous êtes qui ?"
+    assert service.classify_transcript(text, 'Lucas', 'Daniel') is None
+
+
+def test_voicemail_is_classified_locally(service):
+    text = ("assistant: Bonjour\nuser: Bonjour, vous êtes sur la messagerie de Daniel Lucas, laissez un message.\n"
+            "assistant: <Call ended due to voicemail detection>")
+    result = service.classify_transcript(text, 'Lucas', 'Daniel')
+    assert (result['consent'], result['identity_confirmed']) == (False, False)
+
+
+@pytest.mark.parametrize('reply', [
+    "je suis sur ma messagerie pro, rappelez plus tard",
+    "je ne suis pas disponible là, je vous rappellerai",
+    "laissez un message à ma secrétaire",
+])
+def test_live_person_mentioning_voicemail_goes_to_llm(service, reply):
+    text = f"assistant: Bonjour, je suis une assistante virtuelle de VoiceCheck AI.\n{CONSENT_QUESTION}\nuser: {reply}"
+    assert service.classify_transcript(text, 'Lucas', 'Daniel') is None
+
+
+def test_voicemail_greeting_before_any_question_is_classified_locally(service):
+    text = ("assistant: Bonjour, je suis une assistante virtuelle de VoiceCheck AI.\n"
+            "user: Vous êtes bien sur la boîte vocale de Daniel, je vous rappellerai.")
+    result = service.classify_transcript(text, 'Lucas', 'Daniel')
+    assert (result['consent'], result['identity_confirmed']) == (False, False)
+
+
+@pytest.mark.parametrize('text, sentiment', [
+    ("Oui, d'accord.", 'positive'),
+    ("Non merci.", 'negative'),
+    ("oui pas de souci", 'neutral'),
+    ("Bonjour, je passe", 'neutral'),
+])
+def test_quick_sentiment_check(service, text, sentiment):
+    assert service.quick_sentiment_check(text) == sentiment
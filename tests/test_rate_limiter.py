@@ -0,0 +1,141 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import httpx
+import openai
+import pytest
+import requests
+
+from services.campaign_dispatcher import CampaignDispatcher
+from services.openai_service import OpenAIService
+from services.rate_limiter import TokenBucket, get_bucket, parse_retry_after, rate_limit_delay
+from services.twilio_service import BlendService
+from utils.dispatch_ledger import CLAIMED, RELEASED
+from utils.json_database import JsonDatabase
+
+SUSTAINED = 12
+
+
+@pytest.fixture
+def secrets(secrets):
+    # Débits élevés: seules les pauses Retry-After ralentissent les tests
+    secrets.update({f'RATE_LIMIT_{key}': 1000 for key in ('BLAND_DIAL', 'BLAND_STATUS', 'OPENAI_ANALYSIS')})
+    return secrets
+
+
+class Response:
+    def __init__(self, status_code, body=None, retry_after='0'):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = {'Retry-After': retry_after} if status_code == 429 else {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+class ThrottledSession:
+    """Session Bland factice: `throttled` réponses 429 avant chaque succès"""
+
+    def __init__(self, throttled, retry_after='0'):
+        self.throttled = throttled
+        self.retry_after = retry_after
+        self.requests = []
+
+    def request(self, method, url, headers=None, json=None, params=None, timeout=None):
+        self.requests.append(method)
+        if len(self.requests) <= self.throttled:
+            return Response(429, retry_after=self.retry_after)
+        return Response(200, {'status': 'success', 'call_id': 'call-1'})
+
+
+def test_parse_retry_after_accepts_seconds_and_http_dates():
+    assert parse_retry_after('2.5') == 2.5
+    assert parse_retry_after(None) == 1.0
+    retry_at = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 < parse_retry_after(retry_at) <= 30
+    # Sans Retry-After: pause croissante, plafonnée
+    assert [rate_limit_delay(None, attempt) for attempt in (1, 2, 3)] == [1.0, 2.0, 4.0]
+    assert rate_limit_delay(None, 20) == 60
+    assert rate_limit_delay('7', 20) == 7.0
+
+
+def test_bucket_pause_holds_requests_until_retry_after():
+    bucket = TokenBucket('test', rate=100, capacity=1)
+    bucket.pause(0.2)
+    assert not bucket.wait_resumed(0.05)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.1
+    assert bucket.wait_resumed(0)
+    assert bucket.state()['rate_limited_429'] == 1
+
+
+def test_sustained_429_on_status_requests_never_gives_up(secrets):
+    service = BlendService()
+    service.session = ThrottledSession(SUSTAINED)
+
+    response = service._request('GET', 'status', service.endpoint)
+
+    assert response.status_code == 200
+    assert len(service.session.requests) == SUSTAINED + 1
+    assert get_bucket('bland', 'status').state()['rate_limited_429'] == SUSTAINED
+
+
+def rate_limit_error(code=None):
+    response = httpx.Response(429, headers={'retry-after': '0'}, request=httpx.Request('POST', 'http://openai'))
+    return openai.RateLimitError('429', response=response, body={'code': code} if code else None)
+
+
+def test_sustained_429_on_openai_never_gives_up(secrets):
+    service = OpenAIService()
+    attempts = []
+
+    def create(**kwargs):
+        attempts.append(kwargs)
+        if len(attempts) <= SUSTAINED:
+            raise rate_limit_error()
+        return SimpleNamespace(ok=True)
+
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    assert service._send_completion(model='m').ok
+    assert len(attempts) == SUSTAINED + 1
+
+
+def test_exhausted_openai_quota_is_not_waited_on(secrets):
+    service = OpenAIService()
+
+    def create(**kwargs):
+        raise rate_limit_error('insufficient_quota')
+
+    service.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    with pytest.raises(openai.RateLimitError):
+        service._send_completion(model='m')
+
+
+def test_rate_limited_dial_is_requeued_not_failed(secrets, tmp_path, monkeypatch):
+    monkeypatch.setattr('services.campaign_dispatcher.CLAIM_RENEWAL', 0.05)
+    db = JsonDatabase(str(tmp_path / 'campaign'))
+    db.add_contacts([{'nom': 'Lucas', 'prenom': 'Daniel', 'telephone': '+33600000001'}])
+    contact = db.load_contacts()[0]
+    service = BlendService()
+    service.session = ThrottledSession(3, retry_after='0.1')
+    renewals = []
+    update_dispatch = db.update_dispatch
+    monkeypatch.setattr(db, 'update_dispatch', lambda key, state, **fields: (
+        renewals.append(state), update_dispatch(key, state, **fields)))
+
+    dispatcher = CampaignDispatcher(service, None, db, campaign_id='camp')
+    call_id, error = dispatcher._dial(contact)
+
+    assert (call_id, error) == ('call-1', None)
+    assert service.session.requests == ['POST'] * 4
+    assert dispatcher.stats['rate_limited'] == 3
+    # La réservation est renouvelée pendant l'attente, jamais libérée
+    assert renewals.count(CLAIMED) >= 3 and RELEASED not in renewals
@@ -0,0 +1,134 @@
+import pytest
+import requests
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+
+from services.resilience import resilient_call, is_transient_http, was_never_sent
+from services.twilio_service import BlendService
+
+
+def connection_refused() -> requests.ConnectionError:
+    reason = NewConnectionError(None, "Connection refused")
+    return requests.ConnectionError(MaxRetryError(None, '/v1/calls', reason))
+
+
+class Response:
+    def __init__(self, status_code, body=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}", response=self)
+
+
+def failing(error, calls):
+    def func():
+        calls.append(1)
+        raise error
+    return func
+
+
+@pytest.mark.parametrize('error, sent', [
+    (requests.ReadTimeout("read timed out"), True),
+    (requests.ConnectionError("Connection aborted: RemoteDisconnected"), True),
+    (requests.ConnectTimeout("connect timed out"), False),
+    (connection_refused(), False),
+])
+def test_non_idempotent_request_is_only_retried_when_never_sent(secrets, error, sent):
+    calls = []
+    with pytest.raises(type(error)):
+        resilient_call('bland', failing(error, calls), is_transient=is_transient_http,
+                       base_delay=0, is_retryable=was_never_sent)
+    assert len(calls) == (1 if sent else 3)
+
+
+def test_idempotent_request_is_retried_on_read_timeout(secrets):
+    calls = []
+    with pytest.raises(requests.ReadTimeout):
+        resilient_call('openai', failing(requests.ReadTimeout("read timed out"), calls),
+                       is_transient=is_transient_http, base_delay=0)
+    assert len(calls) == 3
+
+
+@pytest.mark.parametrize('status', [500, 502, 503, 504])
+def test_5xx_is_not_retried_for_non_idempotent_request(secrets, status):
+    responses = [Response(status), Response(200, {'call_id': 'c1'})]
+    result = resilient_call('bland', lambda: responses.pop(0), is_transient=is_transient_http,
+                            base_delay=0, is_retryable=was_never_sent)
+    assert result.status_code == status
+    assert len(responses) == 1
+
+
+def test_5xx_is_retried_for_idempotent_request(secrets):
+    responses = [Response(503), Response(200, {'call_id': 'c1'})]
+    result = resilient_call('bland', lambda: responses.pop(0), is_transient=is_transient_http, base_delay=0)
+    assert result.status_code == 200
+
+
+class FakeBland:
+    """Session factice: le lancement expire (ou renvoie `dial_error`) côté client alors que Bland a passé l'appel"""
+
+    def __init__(self, dial_error=None):
+        self.posts = 0
+        self.calls = {}
+        self.dial_error = dial_error
+
+    def request(self, method, url, headers=None, json=None, params=None, timeout=None):
+        if method == 'POST':
+            self.posts += 1
+            self.calls[f"call-{self.posts}"] = json['metadata']
+            if self.dial_error is not None:
+                return Response(self.dial_error)
+            raise requests.ReadTimeout("read timed out")
+        if url.endswith('/v1/calls'):
+            return Response(200, {'calls': [{'call_id': call_id} for call_id in self.calls]})
+        call_id = url.rsplit('/', 1)[-1]
+        return Response(200, {'call_id': call_id, 'metadata': self.calls[call_id]})
+
+
+def test_make_call_read_timeout_looks_call_up_instead_of_redialing(secrets):
+    service = BlendService()
+    service.session = FakeBland()
+
+    response = service.make_call('+33600000000', '1', 'task', idempotency_key='camp:1:1')
+
+    assert service.session.posts == 1
+    assert response == {'status': 'success', 'call_id': 'call-1', 'recovered': True}
+
+
+def test_make_call_read_timeout_without_match_is_uncertain(secrets):
+    service = BlendService()
+    service.session = FakeBland()
+    service.find_call = lambda key, to_number: {'call_id': None}
+
+    response = service.make_call('+33600000000', '1', 'task', idempotency_key='camp:1:1')
+
+    assert service.session.posts == 1
+    assert response['error'] and response['uncertain'] and not response.get('circuit_open')
+
+
+@pytest.mark.parametrize('status', [502, 504])
+def test_make_call_gateway_error_looks_call_up_instead_of_redialing(secrets, status):
+    service = BlendService()
+    service.session = FakeBland(dial_error=status)
+
+    response = service.make_call('+33600000000', '1', 'task', idempotency_key='camp:1:1')
+
+    assert service.session.posts == 1
+    assert response == {'status': 'success', 'call_id': 'call-1', 'recovered': True}
+
+
+def test_make_call_gateway_error_without_match_is_uncertain(secrets):
+    service = BlendService()
+    service.session = FakeBland(dial_error=502)
+    service.find_call = lambda key, to_number: {'call_id': None}
+
+    response = service.make_call('+33600000000', '1', 'task', idempotency_key='camp:1:1')
+
+    assert service.session.posts == 1
+    assert response['error'] and response['uncertain'] and not response.get('circuit_open')
@@ -0,0 +1,75 @@
+import sqlite3
+
+from utils.json_database import JsonDatabase
+from utils.sqlite_database import SqliteDatabase
+
+
+def contacts(count):
+    return [{'nom': f'Nom{i}', 'prenom': f'Prenom{i}', 'telephone': f'+336000000{i:02d}'} for i in range(count)]
+
+
+def counters(db):
+    """Compteurs lus directement dans la table tenue par les triggers"""
+    with sqlite3.connect(db.db_file) as conn:
+        return dict(conn.execute("SELECT name, value FROM counters").fetchall())
+
+
+def test_sqlite_engine_matches_the_json_api(secrets, tmp_path):
+    engines = [JsonDatabase(str(tmp_path / 'json')), SqliteDatabase(str(tmp_path / 'sqlite'))]
+    for db in engines:
+        db.add_contacts(contacts(3))
+        db.update_contact_status('1', 'completed')
+        db.bulk_update_status(['2', '3'], 'to_analyze')
+        db.save_result({'contact_id': '1', 'call_sid': 'call-1', 'consent': True,
+                        'identity_confirmed': True, 'no_response': False, 'transcription': 'user: oui'})
+
+    json_db, sqlite_db = engines
+    assert ([(c['id'], c['status']) for c in sqlite_db.load_contacts()]
+            == [(c['id'], c['status']) for c in json_db.load_contacts()])
+    assert [c['id'] for c in sqlite_db.get_completed_contacts()] == ['1']
+    [result] = sqlite_db.load_results()
+    assert 'transcription' not in result
+    assert sqlite_db.load_transcript(result['transcript_ref']) == 'user: oui'
+    assert sqlite_db.load_results(include_transcripts=True)[0]['transcription'] == 'user: oui'
+    assert sqlite_db.count_results_by_contact() == {'1': 1}
+    assert sqlite_db.get_statistics() == json_db.get_statistics()
+
+
+def test_triggers_follow_every_write(secrets, tmp_path):
+    db = SqliteDatabase(str(tmp_path / 'sqlite'))
+    db.add_contacts(contacts(4))
+    assert (counters(db)['total_contacts'], counters(db)['pending']) == (4, 4)
+
+    db.update_contact_status('1', 'completed')
+    db.update_contact_status('1', 'completed')
+    db.bulk_update_status(['2', '3'], 'to_analyze')
+    assert (counters(db)['pending'], counters(db)['completed']) == (1, 1)
+
+    db.save_result({'contact_id': '1', 'call_sid': 'call-1', 'consent': True, 'identity_confirmed': True})
+    db.save_result({'contact_id': '2', 'call_sid': 'call-2', 'consent': False, 'identity_confirmed': None,
+                    'no_response': True})
+    stats = counters(db)
+    assert (stats['total_calls'], stats['consent_given'], stats['consent_refused']) == (2, 1, 1)
+    assert (stats['identity_confirmed'], stats['identity_rejected'], stats['no_response']) == (1, 0, 1)
+
+    # Réécriture des résultats et suppression de contacts: triggers de suppression
+    db.update_results({'call-2': {'consent': True}})
+    db.save_contacts([c for c in db.load_contacts() if c['id'] != '4'])
+    stats = counters(db)
+    assert (stats['consent_given'], stats['consent_refused']) == (2, 0)
+    assert (stats['total_contacts'], stats['pending']) == (3, 0)
+    assert db.verify_statistics()
+
+    db.reset_campaign()
+    assert set(counters(db).values()) == {0}
+
+
+def test_missing_counters_are_rebuilt_on_open(secrets, tmp_path):
+    db = SqliteDatabase(str(tmp_path / 'sqlite'))
+    db.add_contacts(contacts(2))
+    with sqlite3.connect(db.db_file) as conn:
+        conn.execute("DELETE FROM counters WHERE name = 'pending'")
+
+    reopened = SqliteDatabase(str(tmp_path / 'sqlite'))
+    assert reopened.get_statistics()['pending'] == 2
+    assert reopened.verify_statistics()
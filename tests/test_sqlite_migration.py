@@ -0,0 +1,41 @@
+from utils.database import create_database
+from utils.json_database import JsonDatabase
+from utils.sqlite_database import SqliteDatabase
+
+
+def contacts(count, start=0):
+    return [{'nom': f'Nom{i}', 'prenom': f'Prenom{i}', 'telephone': f'+336000000{i:02d}'}
+            for i in range(start, start + count)]
+
+
+def test_add_contacts_after_json_migration(secrets):
+    json_db = create_database()
+    json_db.add_contacts(contacts(5))
+    json_db.save_result({'contact_id': '2', 'call_sid': 'call-2', 'consent': True, 'identity_confirmed': True})
+    json_db.close()
+
+    secrets['DB_ENGINE'] = 'sqlite'
+    db = create_database()
+    assert isinstance(db, SqliteDatabase)
+    db.add_contacts(contacts(3, start=5))
+
+    ids = [c['id'] for c in db.load_contacts()]
+    assert len(ids) == len(set(ids)) == 8
+    assert sorted(int(i) for i in ids) == list(range(1, 9))
+    assert db.verify_statistics()
+
+
+def test_migration_keeps_ids_of_deleted_json_contacts_retired(secrets, tmp_path):
+    data_dir = str(tmp_path / 'partition')
+    json_db = JsonDatabase(data_dir)
+    json_db.add_contacts(contacts(5))
+    # Les contacts 4 et 5 sont supprimés: leurs ids ne doivent pas être redistribués
+    json_db.save_contacts([c for c in json_db.load_contacts() if int(c['id']) <= 3])
+    json_db.close()
+
+    from utils.sqlite_database import migrate_from_json
+    migrate_from_json(data_dir)
+    db = SqliteDatabase(data_dir)
+    db.add_contacts(contacts(2, start=5))
+
+    assert sorted(int(c['id']) for c in db.load_contacts()) == [1, 2, 3, 6, 7]
@@ -0,0 +1,139 @@
+import hashlib
+import hmac
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from services.campaign_dispatcher import CampaignDispatcher
+from services.twilio_service import BlendService
+from services.webhook_receiver import CallWebhookReceiver, signed_webhook_url
+from utils.json_database import JsonDatabase
+
+SECRET = 'webhook-secret'
+
+
+class StandInBland:
+    """API Bland de substitution: POST /v1/calls poste ensuite des callbacks sur le webhook
+
+    Avant le vrai callback signé, elle poste un callback sans secret et un
+    callback sans call_id pour le même contact (usurpation) : aucun des deux
+    ne doit être retenu.
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.callback_codes = []
+        bland = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, code, body):
+                data = json.dumps(body).encode('utf-8')
+                self.send_response(code)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                call_id = 'call-' + uuid.uuid4().hex[:8]
+                bland.calls[call_id] = body
+                threading.Timer(0.1, bland.send_callbacks, (call_id,)).start()
+                self._send(200, {'status': 'success', 'call_id': call_id})
+
+            def do_GET(self):
+                self._send(200, {'call_id': self.path.rsplit('/', 1)[-1], 'status': 'in-progress'})
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/calls"
+
+    def send_callbacks(self, call_id):
+        body = self.calls[call_id]
+        webhook, metadata = body['webhook'], body['metadata']
+        unsigned_url = webhook.split('?')[0]
+        forged = {'status': 'completed', 'metadata': metadata, 'concatenated_transcript': 'user: forgé'}
+        genuine = {'call_id': call_id, 'status': 'completed', 'completed': True, 'metadata': metadata,
+                   'concatenated_transcript': 'user: oui c\'est moi'}
+        for url, payload in ((unsigned_url, {**forged, 'call_id': call_id}), (webhook, forged), (webhook, genuine)):
+            self.callback_codes.append(requests.post(url, json=payload, timeout=5).status_code)
+
+
+@pytest.fixture
+def receiver():
+    receiver = CallWebhookReceiver(port=0, secret=SECRET)
+    receiver.start()
+    yield receiver
+    receiver.stop()
+
+
+def post(receiver, payload, url=None, headers=None):
+    url = url or f"http://127.0.0.1:{receiver.port}/"
+    return requests.post(url, data=json.dumps(payload), headers=headers or {}, timeout=5).status_code
+
+
+def test_receiver_binds_locally_by_default():
+    assert CallWebhookReceiver().host == '127.0.0.1'
+
+
+def test_callbacks_require_the_shared_secret(receiver):
+    payload = {'call_id': 'call-1', 'status': 'completed'}
+    body = json.dumps(payload).encode('utf-8')
+    signature = hmac.new(SECRET.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    base = f"http://127.0.0.1:{receiver.port}/"
+
+    assert post(receiver, payload) == 401
+    assert post(receiver, payload, url=signed_webhook_url(base, 'wrong')) == 401
+    assert post(receiver, payload, headers={'X-Webhook-Signature': '0' * 64}) == 401
+    assert receiver.callbacks_received == 0
+
+    assert post(receiver, payload, url=signed_webhook_url(base, SECRET)) == 200
+    assert post(receiver, payload, headers={'X-Webhook-Secret': SECRET}) == 200
+    assert post(receiver, payload, headers={'X-Webhook-Signature': f'sha256={signature}'}) == 200
+    assert receiver.callbacks_received == 3
+
+
+def test_receiver_without_secret_refuses_everything():
+    receiver = CallWebhookReceiver(port=0)
+    receiver.start()
+    try:
+        assert post(receiver, {'call_id': 'call-1'}, headers={'X-Webhook-Secret': ''}) == 401
+    finally:
+        receiver.stop()
+
+
+def test_contact_only_callback_is_ignored_when_call_id_is_known(receiver):
+    receiver.handle({'metadata': {'contact_id': '1'}, 'status': 'completed'})
+    assert receiver.wait('call-1', '1', timeout=0.05) is None
+    # Sans call_id connu, le contact reste le seul moyen de corréler
+    assert receiver.wait(None, '1', timeout=0.05)['status'] == 'completed'
+
+
+def test_dispatcher_receives_only_the_signed_callback(secrets, tmp_path, receiver):
+    bland = StandInBland()
+    service = BlendService()
+    service.endpoint = bland.url
+    db = JsonDatabase(str(tmp_path / 'campaign'))
+    db.add_contacts([{'nom': 'Lucas', 'prenom': 'Daniel', 'telephone': '+33600000001'}])
+
+    class Analysis:
+        def analyze_consent_and_identity(self, transcript, nom, prenom):
+            return {'consent': True, 'identity_confirmed': True, 'reasoning': transcript}
+
+    dispatcher = CampaignDispatcher(
+        service, Analysis(), db, poll_interval_scale=0.01, campaign_id='camp',
+        webhook_receiver=receiver,
+        webhook_url=signed_webhook_url(f"http://127.0.0.1:{receiver.port}/bland", SECRET)
+    )
+    [outcome] = list(dispatcher.dispatch(db.get_pending_contacts()))
+
+    assert outcome['error'] is None
+    assert outcome['result']['transcription'] == "user: oui c'est moi"
+    assert dispatcher.stats['webhook'] == 1
+    assert bland.callback_codes == [401, 200, 200]
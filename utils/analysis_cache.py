@@ -0,0 +1,196 @@
+import atexit
+import hashlib
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import logging
+from utils.config import Config
+from utils.jsonl_log import JsonlLog
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Caches partagés par tous les services et threads du processus (un par fichier)
+_caches: Dict[str, 'AnalysisCache'] = {}
+_caches_lock = threading.Lock()
+
+
+def analysis_cache_key(transcript: str, nom: str, prenom: str, version: str) -> str:
+    """Empreinte SHA-256 du transcript normalisé, du contact et de la version prompt/modèle
+
+    La normalisation (casse, espaces) fait qu'un même message de répondeur
+    retranscrit avec une mise en forme différente retombe sur la même clé.
+    """
+    def normalize(text: str) -> str:
+        return re.sub(r"\s+", " ", text.replace('’', "'")).strip().lower()
+
+    payload = "\x1f".join((version, normalize(prenom), normalize(nom), normalize(transcript)))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    """Cache persistant des analyses OpenAI, adressé par contenu (analysis_cache.jsonl)
+
+    Chaque analyse réussie est ajoutée au journal avec la durée de l'appel
+    OpenAI qu'elle a coûté. Une lecture ne touche que la mémoire : l'ordre
+    d'utilisation (LRU) est tenu en mémoire et les « touches » sont écrites
+    en une seule fois, au plus toutes les `flush_interval` secondes (et à
+    l'arrêt du processus). Au chargement, le journal est rejoué dans l'ordre :
+    l'ordre d'utilisation survit au redémarrage. Au-delà de `max_entries`,
+    l'entrée la moins récemment utilisée est évincée.
+
+    Plusieurs processus partagent le fichier : un défaut de cache relit
+    d'abord les lignes ajoutées par les autres, et la compaction (quand le
+    journal dépasse le double de `max_entries`) fusionne le contenu actuel
+    du fichier sous son verrou exclusif, sans effacer leurs entrées.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000, flush_interval: float = 30):
+        self.max_entries = max(1, max_entries)
+        self.flush_interval = flush_interval
+        self.log = JsonlLog(path)
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self._touched: 'OrderedDict[str, None]' = OrderedDict()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._lines = 0
+        self._inode = None
+        self._offset = 0
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        with self._lock:
+            self._follow()
+        logger.info(f"🗃️ Cache d'analyse chargé: {len(self._entries)} entrée(s) ({self.log.path})")
+
+    def _replay(self, records: List[Dict], entries: 'OrderedDict[str, Dict]'):
+        """Rejoue des lignes du journal (analyses et touches) dans l'ordre"""
+        for record in records:
+            key = record.get('key')
+            if 'result' in record:
+                entries[key] = {'result': record['result'], 'latency': record.get('latency', 0)}
+            if key in entries:
+                entries.move_to_end(key)
+        while len(entries) > self.max_entries:
+            entries.popitem(last=False)
+
+    def _follow(self):
+        """Relit les lignes ajoutées au journal depuis la dernière lecture (autres processus compris)"""
+        records, self._inode, self._offset, restarted = self.log.follow(self._inode, self._offset)
+        if restarted:
+            # Journal compacté ou vidé par un autre processus: il contient toutes les entrées vivantes
+            self._entries = OrderedDict()
+            self._lines = 0
+        self._replay(records, self._entries)
+        # Nos touches pas encore écrites restent les plus récentes
+        for key in self._touched:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+        self._lines += len(records)
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Résultat en cache (copie), ou None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._follow()
+                entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._touched[key] = None
+            self._touched.move_to_end(key)
+            self.hits += 1
+            self.saved_seconds += entry['latency']
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._write([])
+            return dict(entry['result'])
+
+    def put(self, key: str, result: Dict, latency: float):
+        """Met en cache une analyse réussie et la durée de l'appel OpenAI évité aux prochaines lectures"""
+        with self._lock:
+            self._entries[key] = {'result': dict(result), 'latency': round(latency, 3)}
+            self._entries.move_to_end(key)
+            self._touched.pop(key, None)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._write([{'key': key, 'result': dict(result), 'latency': round(latency, 3)}])
+
+    def flush(self):
+        """Écrit les touches en attente (ordre d'utilisation) dans le journal"""
+        with self._lock:
+            self._write([])
+
+    def _write(self, records: List[Dict]):
+        """Ajoute les touches en attente puis `records` en une seule écriture (verrou mémoire pris)"""
+        records = [{'key': key} for key in self._touched] + records
+        self._touched.clear()
+        self._last_flush = time.monotonic()
+        if not records:
+            return
+        start, end = self.log.extend(records)
+        self._lines += len(records)
+        # Sans écriture intercalée, inutile de relire nos propres lignes
+        if start == self._offset:
+            self._offset = end
+        if self._lines > 2 * self.max_entries:
+            self._compact()
+
+    def _compact(self):
+        """Réécrit le journal à partir de son contenu actuel, sous verrou exclusif
+
+        Le fichier est relu sous le verrou : les entrées ajoutées par les
+        autres processus sont conservées.
+        """
+        with self.log.lock.exclusive():
+            entries: 'OrderedDict[str, Dict]' = OrderedDict()
+            records, _ = self.log.read_from(0)
+            self._replay(records, entries)
+            # Une ligne par entrée encore en cache, de la moins à la plus récemment utilisée
+            self.log._rewrite_locked([{'key': key, **entry} for key, entry in entries.items()])
+            self._inode = None
+            self._offset = 0
+            self._follow()
+
+    def stats(self) -> Dict:
+        """Taux de succès du cache et temps d'appel OpenAI économisé"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups * 100, 1) if lookups else 0,
+                'saved_seconds': round(self.saved_seconds, 1)
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._touched.clear()
+            self.log.rewrite([])
+            self._lines = 0
+            self._inode = None
+            self._offset = 0
+            self._follow()
+
+
+def get_analysis_cache() -> AnalysisCache:
+    """Cache d'analyse partagé du processus (data/analysis_cache.jsonl)
+
+    Réglage (secrets.toml): ANALYSIS_CACHE_SIZE (nombre d'analyses gardées)
+    """
+    config = Config()
+    path = os.path.abspath(os.path.join(config.DATA_DIR, "analysis_cache.jsonl"))
+    with _caches_lock:
+        if path not in _caches:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _caches[path] = AnalysisCache(path, max_entries=int(config.get_secret("ANALYSIS_CACHE_SIZE", 5000)))
+            # Ordre d'utilisation des dernières lectures écrit à l'arrêt du processus
+            atexit.register(_caches[path].flush)
+        return _caches[path]
@@ -0,0 +1,74 @@
+import gzip
+import hashlib
+import os
+import shutil
+from typing import Dict, Optional
+import logging
+from utils.file_lock import atomic_write
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class BlobStore:
+    """Stockage adressé par contenu de textes volumineux (transcripts)
+
+    Chaque texte est compressé (gzip) et rangé sous son empreinte SHA-256:
+    blobs/ab/abcdef....gz. Un même texte n'est stocké qu'une fois et un blob
+    n'est jamais modifié après écriture, ce qui rend les écritures
+    concurrentes sûres sans verrou.
+    """
+
+    def __init__(self, blob_dir: str):
+        self.blob_dir = blob_dir
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+    def _path(self, ref: str) -> str:
+        return os.path.join(self.blob_dir, ref[:2], ref + '.gz')
+
+    def put(self, text: str) -> str:
+        """Stocke un texte et retourne sa référence (empreinte SHA-256)"""
+        data = text.encode('utf-8')
+        ref = hashlib.sha256(data).hexdigest()
+        path = self._path(ref)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write(path, gzip.compress(data, mtime=0))
+        return ref
+
+    def get(self, ref: str) -> Optional[str]:
+        """Relit un texte à partir de sa référence (None si introuvable)"""
+        try:
+            with gzip.open(self._path(ref), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            logger.warning(f"⚠️ Blob introuvable: {ref}")
+            return None
+
+    def clear(self):
+        """Supprime tous les blobs"""
+        shutil.rmtree(self.blob_dir, ignore_errors=True)
+        os.makedirs(self.blob_dir, exist_ok=True)
+
+
+def externalize_transcript(result: Dict, blobs: BlobStore) -> Dict:
+    """Déplace la transcription d'un résultat dans le BlobStore
+
+    Le résultat ne garde que `transcript_ref` (et la longueur du texte) ;
+    les résultats sans transcription sont retournés tels quels.
+    """
+    transcript = result.get('transcription')
+    if not transcript:
+        return result
+    externalized = {key: value for key, value in result.items() if key != 'transcription'}
+    externalized['transcript_ref'] = blobs.put(transcript)
+    externalized['transcript_length'] = len(transcript)
+    return externalized
+
+
+def attach_transcript(result: Dict, blobs: BlobStore) -> Dict:
+    """Recharge la transcription référencée par un résultat (champ `transcription`)"""
+    if 'transcription' in result:
+        return result
+    ref = result.get('transcript_ref')
+    return dict(result, transcription=(blobs.get(ref) or '') if ref else '')
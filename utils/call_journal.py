@@ -0,0 +1,64 @@
+from datetime import datetime
+from typing import List, Dict, Optional
+import logging
+from utils.jsonl_log import JsonlLog
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Appel lancé chez le fournisseur, résultat pas encore sauvegardé
+DISPATCHED = 'dispatched'
+# Résultat sauvegardé (ou appel réconcilié après une reprise)
+FINISHED = 'finished'
+
+
+class CallJournal:
+    """Journal des appels lancés (calls.jsonl), moteur JSON
+
+    Chaque appel est journalisé dès que le fournisseur a renvoyé son
+    call_id, puis clos quand son résultat est sauvegardé. Après un arrêt
+    brutal, les appels encore ouverts sont repris (suivi jusqu'à leur fin)
+    au lieu de rappeler les contacts. Le journal est append-only : chaque
+    ligne est un événement, le dernier état d'un call_id fait foi.
+    """
+
+    def __init__(self, path: str):
+        self.log = JsonlLog(path)
+
+    def journal_call(self, contact_id: str, call_id: str, **fields) -> Dict:
+        """Enregistre un appel lancé (état 'dispatched')"""
+        now = datetime.now().isoformat()
+        entry = {**fields, 'call_id': call_id, 'contact_id': contact_id, 'state': DISPATCHED,
+                 'dispatched_at': now, 'updated_at': now}
+        self.log.append(entry)
+        return entry
+
+    def update_call_state(self, call_id: str, state: str, **fields):
+        """Change l'état d'un appel journalisé"""
+        self.log.append({**fields, 'call_id': call_id, 'state': state, 'updated_at': datetime.now().isoformat()})
+
+    def calls(self) -> List[Dict]:
+        """Dernier état connu de chaque appel journalisé, dans l'ordre de lancement"""
+        calls: Dict[str, Dict] = {}
+        for event in self.log.load():
+            call_id = event.get('call_id')
+            if call_id:
+                calls.setdefault(call_id, {}).update(event)
+        return list(calls.values())
+
+    def get_call(self, call_id: str) -> Optional[Dict]:
+        return next((c for c in self.calls() if c['call_id'] == call_id), None)
+
+    def inflight(self) -> List[Dict]:
+        """Appels lancés dont le résultat n'a pas été sauvegardé"""
+        return [c for c in self.calls() if c.get('state') == DISPATCHED]
+
+    def compact(self) -> int:
+        """Réécrit le journal avec une ligne par appel (dernier état)"""
+        with self.log.lock.exclusive():
+            calls = self.calls()
+            self.log._rewrite_locked(calls)
+        return len(calls)
+
+    def clear(self):
+        self.log.rewrite([])
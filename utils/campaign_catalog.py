@@ -0,0 +1,167 @@
+import gzip
+import json
+import os
+import shutil
+from datetime import datetime
+from typing import List, Dict, Optional
+import logging
+from utils.file_lock import FileLock, atomic_write
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Fichiers d'un ancien dossier data/ non partitionné, repris dans la première campagne
+LEGACY_FILES = [
+    "contacts.json", "contacts.journal.jsonl", "results.jsonl", "results.json",
+    "stats.json", "sequence.json", "voicecheck.db", "voicecheck.db-wal",
+    "voicecheck.db-shm", "blobs"
+]
+
+SEGMENT_FILE = "segment.json.gz"
+
+
+class CampaignCatalog:
+    """Catalogue des campagnes (data/catalog.json)
+
+    Chaque campagne est une partition autonome, data/campaigns/<id>/, qui
+    contient ses propres contacts, résultats et compteurs : les lectures
+    ne portent que sur la campagne active. Une campagne archivée est
+    compactée en un unique segment compressé en lecture seule
+    (segment.json.gz), toujours exportable.
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = data_dir
+        self.catalog_file = os.path.join(data_dir, "catalog.json")
+        self.campaigns_dir = os.path.join(data_dir, "campaigns")
+        self.lock = FileLock(self.catalog_file + '.lock')
+        os.makedirs(self.campaigns_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def _read(self) -> Dict:
+        if not os.path.exists(self.catalog_file):
+            return {'next_id': 1, 'campaigns': []}
+        with open(self.catalog_file, 'r') as f:
+            return json.load(f)
+
+    def _write(self, catalog: Dict):
+        atomic_write(self.catalog_file, json.dumps(catalog, indent=2))
+
+    def list(self) -> List[Dict]:
+        """Toutes les campagnes, de la plus ancienne à la plus récente"""
+        return self._read()['campaigns']
+
+    def get(self, campaign_id: str) -> Optional[Dict]:
+        """Campagne par id"""
+        return next((c for c in self.list() if c['id'] == campaign_id), None)
+
+    def archived(self) -> List[Dict]:
+        """Campagnes archivées, de la plus récente à la plus ancienne"""
+        return [c for c in reversed(self.list()) if c['status'] == 'archived']
+
+    def active(self) -> Dict:
+        """Campagne active (créée au besoin, en reprenant un ancien dossier data/ non partitionné)"""
+        campaign = next((c for c in self.list() if c['status'] == 'active'), None)
+        if campaign is not None:
+            return campaign
+        with self.lock.exclusive():
+            catalog = self._read()
+            campaign = next((c for c in catalog['campaigns'] if c['status'] == 'active'), None)
+            if campaign is None:
+                first = not catalog['campaigns']
+                campaign = self._create_locked(catalog, None)
+                if first:
+                    self._adopt_legacy_files(campaign['id'])
+                self._write(catalog)
+        return campaign
+
+    def partition_dir(self, campaign_id: str) -> str:
+        """Dossier de la partition d'une campagne"""
+        return os.path.join(self.campaigns_dir, campaign_id)
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+
+    def _create_locked(self, catalog: Dict, name: Optional[str]) -> Dict:
+        campaign_id = f"{catalog['next_id']:04d}"
+        now = datetime.now()
+        campaign = {
+            'id': campaign_id,
+            'name': name or f"Campagne du {now.strftime('%Y-%m-%d %H:%M')}",
+            'status': 'active',
+            'created_at': now.isoformat(),
+            'archived_at': None
+        }
+        catalog['next_id'] += 1
+        catalog['campaigns'].append(campaign)
+        os.makedirs(self.partition_dir(campaign_id), exist_ok=True)
+        logger.info(f"🆕 Campagne {campaign_id} créée: {campaign['name']}")
+        return campaign
+
+    def create(self, name: Optional[str] = None) -> Dict:
+        """Crée une nouvelle campagne active (la campagne active doit avoir été archivée)"""
+        with self.lock.exclusive():
+            catalog = self._read()
+            if any(c['status'] == 'active' for c in catalog['campaigns']):
+                raise ValueError("Une campagne est déjà active, archivez-la d'abord")
+            campaign = self._create_locked(catalog, name)
+            self._write(catalog)
+        return campaign
+
+    def _adopt_legacy_files(self, campaign_id: str):
+        """Déplace les fichiers d'un dossier data/ non partitionné dans la partition donnée"""
+        moved = []
+        for name in LEGACY_FILES:
+            source = os.path.join(self.data_dir, name)
+            if os.path.exists(source):
+                os.replace(source, os.path.join(self.partition_dir(campaign_id), name))
+                moved.append(name)
+            if os.path.exists(source + '.lock'):
+                os.remove(source + '.lock')
+        shutil.rmtree(os.path.join(self.data_dir, "locks"), ignore_errors=True)
+        if moved:
+            logger.info(f"🔁 Données existantes reprises dans la campagne {campaign_id}: {', '.join(moved)}")
+
+    def archive(self, campaign_id: str, contacts: List[Dict], results: List[Dict], statistics: Dict) -> Dict:
+        """Compacte une campagne en segment compressé en lecture seule
+
+        Le segment contient les contacts, les résultats (transcriptions
+        comprises) et les statistiques finales ; les fichiers de travail de
+        la partition sont ensuite supprimés.
+        """
+        with self.lock.exclusive():
+            catalog = self._read()
+            campaign = next(c for c in catalog['campaigns'] if c['id'] == campaign_id)
+            if campaign['status'] == 'archived':
+                raise ValueError(f"La campagne {campaign_id} est déjà archivée")
+
+            campaign['status'] = 'archived'
+            campaign['archived_at'] = datetime.now().isoformat()
+            campaign['statistics'] = statistics
+
+            partition = self.partition_dir(campaign_id)
+            segment_file = os.path.join(partition, SEGMENT_FILE)
+            segment = {'campaign': campaign, 'contacts': contacts, 'results': results}
+            atomic_write(segment_file, gzip.compress(json.dumps(segment).encode('utf-8')))
+            os.chmod(segment_file, 0o444)
+            for name in os.listdir(partition):
+                if name == SEGMENT_FILE:
+                    continue
+                path = os.path.join(partition, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    os.remove(path)
+            self._write(catalog)
+
+        logger.info(f"🗄️ Campagne {campaign_id} archivée: {len(contacts)} contacts, {len(results)} résultats")
+        return campaign
+
+    def load_segment(self, campaign_id: str) -> Dict:
+        """Relit le segment d'une campagne archivée (campaign, contacts, results)"""
+        with gzip.open(os.path.join(self.partition_dir(campaign_id), SEGMENT_FILE), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
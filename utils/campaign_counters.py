@@ -0,0 +1,102 @@
+import threading
+from typing import List, Dict, Optional
+import logging
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+COUNTER_NAMES = [
+    'total_contacts', 'total_calls', 'pending', 'completed',
+    'consent_given', 'consent_refused',
+    'identity_confirmed', 'identity_rejected', 'no_response'
+]
+
+
+def compute_statistics(contacts: List[Dict], results: List[Dict]) -> Dict:
+    """Calcul complet des compteurs à partir des données (utilisé pour reconstruire/vérifier)"""
+    stats = dict.fromkeys(COUNTER_NAMES, 0)
+    stats['total_contacts'] = len(contacts)
+    for contact in contacts:
+        stats.update(_add(stats, status_deltas(None, contact.get('status'))))
+    for result in results:
+        stats.update(_add(stats, result_deltas(result)))
+    return stats
+
+
+def result_deltas(result: Dict) -> Dict[str, int]:
+    """Variation des compteurs induite par un nouveau résultat d'appel"""
+    deltas = {'total_calls': 1}
+    if result.get('consent') == True:
+        deltas['consent_given'] = 1
+    elif result.get('consent') == False:
+        deltas['consent_refused'] = 1
+    if result.get('identity_confirmed') == True:
+        deltas['identity_confirmed'] = 1
+    elif result.get('identity_confirmed') == False:
+        deltas['identity_rejected'] = 1
+    if result.get('no_response') == True:
+        deltas['no_response'] = 1
+    return deltas
+
+
+def status_deltas(old_status: Optional[str], new_status: Optional[str]) -> Dict[str, int]:
+    """Variation des compteurs pending/completed pour un changement de statut"""
+    deltas = {}
+    if old_status == new_status:
+        return deltas
+    if old_status in ('pending', 'completed'):
+        deltas[old_status] = -1
+    if new_status in ('pending', 'completed'):
+        deltas[new_status] = deltas.get(new_status, 0) + 1
+    return deltas
+
+
+def _add(stats: Dict, deltas: Dict[str, int]) -> Dict:
+    return {name: stats.get(name, 0) + value for name, value in deltas.items()}
+
+
+class CampaignCounters:
+    """Compteurs de campagne dérivés des données elles-mêmes
+
+    Aucun fichier de compteurs séparé : les compteurs de contacts sont lus
+    sur l'index par statut du ContactStore, ceux des résultats sont
+    accumulés en suivant results.jsonl (seules les lignes ajoutées depuis
+    la lecture précédente sont parsées ; une réécriture ou compaction du
+    journal relance un recalcul complet).
+
+    Les écritures ne paient donc ni verrou exclusif ni fsync supplémentaire,
+    et un crash entre l'ajout d'une donnée et la mise à jour des compteurs
+    ne peut plus les désynchroniser : ils sont recalculés à l'ouverture.
+    """
+
+    def __init__(self, contacts, results):
+        self.contacts = contacts
+        self.results = results
+        self._lock = threading.Lock()
+        self._result_stats: Dict[str, int] = {}
+        self._inode = None
+        self._offset = 0
+
+    def load(self) -> Dict:
+        """Compteurs à jour (lecture incrémentale des résultats ajoutés depuis le dernier appel)"""
+        stats = dict.fromkeys(COUNTER_NAMES, 0)
+        with self._lock:
+            records, self._inode, self._offset, restarted = self.results.follow(self._inode, self._offset)
+            if restarted:
+                self._result_stats = {}
+            for record in records:
+                self._result_stats.update(_add(self._result_stats, result_deltas(record)))
+            stats.update(self._result_stats)
+
+        by_status = self.contacts.count_by_status()
+        stats['total_contacts'] = sum(by_status.values())
+        for status in ('pending', 'completed'):
+            stats[status] = by_status.get(status, 0)
+        return stats
+
+    def reset(self):
+        """Oublie l'état incrémental : le prochain `load()` recalcule tout"""
+        with self._lock:
+            self._result_stats = {}
+            self._inode = None
+            self._offset = 0
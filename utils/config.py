@@ -38,3 +38,65 @@ class Config:
     @property
     def BLEND_ENDPOINT(self) -> str:
         return self.get_secret('BLEND_ENDPOINT', 'https://api.bland.ai/v1/calls')
+    
+    # Stockage
+    @property
+    def DB_ENGINE(self) -> str:
+        """Moteur de stockage: 'json' (fichiers data/*.json) ou 'sqlite' (data/voicecheck.db)"""
+        return self.get_secret('DB_ENGINE', 'json')
+    
+    @property
+    def DATA_DIR(self) -> str:
+        return self.get_secret('DATA_DIR', 'data')
+    
+    # Campagne
+    @property
+    def MAX_CONCURRENT_CALLS(self) -> int:
+        """Nombre maximal d'appels simultanés pendant une campagne"""
+        return int(self.get_secret('MAX_CONCURRENT_CALLS', 5))
+    
+    @property
+    def DIAL_WORKERS(self) -> int:
+        """Threads de lancement des appels (étage 'dial' du pipeline de campagne)"""
+        return int(self.get_secret('DIAL_WORKERS', 2))
+    
+    @property
+    def ANALYSIS_WORKERS(self) -> int:
+        """Threads d'analyse OpenAI (étage 'analyze' du pipeline de campagne)"""
+        return int(self.get_secret('ANALYSIS_WORKERS', 2))
+    
+    @property
+    def WEBHOOK_URL(self) -> str:
+        """URL publique du récepteur de webhooks (vide = détection des fins d'appel par polling)"""
+        return self.get_secret('WEBHOOK_URL', '')
+    
+    @property
+    def WEBHOOK_PORT(self) -> int:
+        """Port local du récepteur de webhooks"""
+        return int(self.get_secret('WEBHOOK_PORT', 8765))
+    
+    @property
+    def WEBHOOK_HOST(self) -> str:
+        """Adresse d'écoute du récepteur de webhooks (locale: exposé par le tunnel de WEBHOOK_URL)"""
+        return self.get_secret('WEBHOOK_HOST', '127.0.0.1')
+    
+    @property
+    def WEBHOOK_SECRET(self) -> str:
+        """Secret partagé exigé de chaque callback (vide = webhooks désactivés)"""
+        return self.get_secret('WEBHOOK_SECRET', '')
+    
+    # Connexions HTTP (API Bland, Vapi)
+    @property
+    def HTTP_POOL_CONNECTIONS(self) -> int:
+        """Nombre d'hôtes dont les connexions sont gardées en pool"""
+        return int(self.get_secret('HTTP_POOL_CONNECTIONS', 4))
+    
+    @property
+    def HTTP_POOL_MAXSIZE(self) -> int:
+        """Connexions simultanées maximales par hôte (au moins MAX_CONCURRENT_CALLS)"""
+        return int(self.get_secret('HTTP_POOL_MAXSIZE', max(10, self.MAX_CONCURRENT_CALLS)))
+    
+    @property
+    def HTTP_KEEP_ALIVE(self) -> bool:
+        """Réutilisation des connexions entre requêtes"""
+        return str(self.get_secret('HTTP_KEEP_ALIVE', True)).lower() not in ('false', '0', 'no')
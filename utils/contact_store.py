@@ -0,0 +1,265 @@
+import json
+import os
+import threading
+from typing import List, Dict, Optional, Tuple
+import logging
+from utils.jsonl_log import JsonlLog
+from utils.file_lock import FileLock, StripedLocks, atomic_write
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class ContactStore:
+    """Contacts indexés en mémoire (id → contact, statut → ids)
+
+    Persistance en deux fichiers:
+    - contacts.json: instantané complet, avec la position du journal qu'il
+      couvre déjà (inode et taille au moment de l'écriture)
+    - contacts.journal.jsonl: enregistrements modifiés depuis l'instantané
+
+    Une modification ne réécrit que les contacts modifiés (ajout en fin de
+    journal). Le journal est réintégré dans l'instantané au-delà de
+    `compact_threshold` lignes. Les écritures faites par une autre instance
+    sont détectées (inode/mtime/taille de l'instantané, inode/taille du
+    journal) et relues avant chaque accès ; sinon les lectures sont servies
+    depuis la mémoire sans aucun parsing. Un crash entre l'écriture de
+    l'instantané et la remise à zéro du journal ne fait rejouer aucune
+    entrée deux fois : la partie du journal couverte par l'instantané est
+    sautée.
+
+    Concurrence entre processus : une modification verrouille uniquement
+    les enregistrements concernés (verrous répartis) et prend le verrou de
+    table en mode partagé ; seules la compaction et la réécriture complète
+    prennent le verrou de table en exclusif.
+    """
+
+    def __init__(self, snapshot_file: str, journal_file: str, lock_dir: str, compact_threshold: int = 1000):
+        self.snapshot_file = snapshot_file
+        self.journal = JsonlLog(journal_file)
+        self.compact_threshold = compact_threshold
+        self.table_lock = FileLock(snapshot_file + '.lock')
+        self.record_locks = StripedLocks(lock_dir, 'contact')
+
+        self._by_id: Dict[str, Dict] = {}
+        self._by_status: Dict[str, Dict[str, None]] = {}
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._journal_inode = None
+        self._snapshot_signature = None
+        self._loaded = False
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    # ------------------------------------------------------------------
+    # Chargement et synchronisation avec le disque
+    # ------------------------------------------------------------------
+
+    def _signature(self):
+        stat = os.stat(self.snapshot_file)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _load(self):
+        """Charge l'instantané puis rejoue le journal"""
+        with open(self.snapshot_file, 'r') as f:
+            stat = os.fstat(f.fileno())
+            snapshot = json.load(f)
+
+        # Ancien format: liste de contacts, sans position de journal
+        if isinstance(snapshot, list):
+            snapshot = {'contacts': snapshot}
+        self._by_id = {}
+        self._by_status = {}
+        for contact in snapshot['contacts']:
+            self._index(contact)
+
+        self._snapshot_signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        self._journal_inode = os.stat(self.journal.path).st_ino
+        covered = snapshot.get('journal') or {}
+        # Journal pas encore vidé après l'écriture de l'instantané (crash): sa partie couverte est sautée
+        self._journal_offset = covered.get('offset', 0) if covered.get('inode') == self._journal_inode else 0
+        self._journal_lines = 0
+        self._replay_journal()
+        self._loaded = True
+
+    def _replay_journal(self):
+        records, self._journal_offset = self.journal.read_from(self._journal_offset)
+        for record in records:
+            self._index(record)
+        self._journal_lines += len(records)
+
+    def refresh(self):
+        """Relit les modifications faites sur disque par d'autres instances"""
+        with self._lock:
+            if (not self._loaded or self._signature() != self._snapshot_signature
+                    or os.stat(self.journal.path).st_ino != self._journal_inode):
+                self.misses += 1
+                self._load()
+            elif self.journal.size() > self._journal_offset:
+                self.misses += 1
+                self._replay_journal()
+            else:
+                self.hits += 1
+
+    def cache_stats(self) -> Dict:
+        """Compteurs de succès/échecs du cache de lecture"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _index(self, contact: Dict):
+        """Insère ou remplace un contact dans les index"""
+        contact_id = contact['id']
+        previous = self._by_id.get(contact_id)
+        if previous is not None:
+            self._by_status.get(previous.get('status'), {}).pop(contact_id, None)
+        self._by_id[contact_id] = contact
+        self._by_status.setdefault(contact.get('status'), {})[contact_id] = None
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    def all(self) -> List[Dict]:
+        """Tous les contacts, dans l'ordre d'ajout"""
+        with self._lock:
+            self.refresh()
+            return list(self._by_id.values())
+
+    def get(self, contact_id: str) -> Optional[Dict]:
+        """Contact par id (O(1))"""
+        with self._lock:
+            self.refresh()
+            return self._by_id.get(contact_id)
+
+    def with_status(self, status: str) -> List[Dict]:
+        """Contacts ayant le statut donné, via l'index par statut"""
+        with self._lock:
+            self.refresh()
+            return [self._by_id[contact_id] for contact_id in self._by_status.get(status, {})]
+
+    def count(self, status: Optional[str] = None) -> int:
+        """Nombre de contacts (au total ou pour un statut)"""
+        with self._lock:
+            self.refresh()
+            if status is None:
+                return len(self._by_id)
+            return len(self._by_status.get(status, {}))
+
+    def count_by_status(self) -> Dict[Optional[str], int]:
+        """Nombre de contacts par statut, lu sur l'index (sans parcours)"""
+        with self._lock:
+            self.refresh()
+            return {status: len(ids) for status, ids in self._by_status.items()}
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def _append(self, records: List[Dict]):
+        """Écrit des enregistrements en fin de journal et les indexe (verrous fichier déjà pris)
+
+        L'écriture (avec fsync) se fait hors du verrou mémoire pour ne pas
+        bloquer les lectures ni les écritures des autres threads.
+        """
+        start, end = self.journal.extend(records)
+        with self._lock:
+            for record in records:
+                self._index(record)
+            self._journal_lines += len(records)
+            # Sans écriture intercalée, inutile de relire nos propres lignes
+            if start == self._journal_offset:
+                self._journal_offset = end
+
+    def add_many(self, contacts: List[Dict]):
+        """Ajoute un lot de contacts et le persiste en une seule écriture
+
+        Les petits lots vont dans le journal ; au-delà de `compact_threshold`
+        contacts, l'instantané est directement réécrit avec le lot.
+        """
+        if not contacts:
+            return
+        if len(contacts) < self.compact_threshold:
+            with self.table_lock.shared():
+                self._append(contacts)
+            self._compact_if_needed()
+        else:
+            with self.table_lock.exclusive():
+                with self._lock:
+                    self.refresh()
+                    self._write_snapshot(list(self._by_id.values()) + contacts)
+
+    def update_many(self, contact_ids: List[str], **fields) -> List[Tuple[Optional[Dict], Optional[Dict]]]:
+        """Modifie les mêmes champs sur plusieurs contacts, en une seule écriture
+
+        Seuls les enregistrements concernés sont verrouillés : d'autres
+        processus peuvent modifier d'autres contacts en parallèle.
+
+        Returns:
+            Pour chaque id, le couple (contact avant, contact après) ;
+            (None, None) si le contact n'existe pas
+        """
+        changes = []
+        with self.record_locks.hold(contact_ids), self.table_lock.shared():
+            with self._lock:
+                self.refresh()
+                records = []
+                for contact_id in contact_ids:
+                    previous = self._by_id.get(contact_id)
+                    if previous is None:
+                        changes.append((None, None))
+                        continue
+                    updated = dict(previous, **fields)
+                    records.append(updated)
+                    changes.append((previous, updated))
+            if records:
+                self._append(records)
+        self._compact_if_needed()
+        return changes
+
+    def update(self, contact_id: str, **fields) -> Tuple[Optional[Dict], Optional[Dict]]:
+        """Modifie les champs d'un contact
+
+        Returns:
+            (contact avant, contact après), ou (None, None) s'il n'existe pas
+        """
+        return self.update_many([contact_id], **fields)[0]
+
+    def _compact_if_needed(self):
+        if self._journal_lines >= self.compact_threshold:
+            self.compact()
+
+    def compact(self):
+        """Réintègre le journal dans l'instantané"""
+        with self.table_lock.exclusive():
+            with self._lock:
+                self.refresh()
+                self._write_snapshot(list(self._by_id.values()))
+        logger.info(f"🗜️ Journal des contacts compacté dans {self.snapshot_file}")
+
+    def replace_all(self, contacts: List[Dict]):
+        """Remplace tous les contacts (réécriture de l'instantané, journal vidé)"""
+        with self.table_lock.exclusive():
+            with self._lock:
+                self._write_snapshot(contacts)
+
+    def _write_snapshot(self, contacts: List[Dict]):
+        """Réécrit l'instantané et vide le journal (verrou de table exclusif déjà pris)
+
+        L'instantané enregistre la position du journal qu'il remplace : si le
+        processus s'arrête avant que le journal soit vidé, ces entrées ne
+        sont pas rejouées au chargement suivant.
+        """
+        journal = os.stat(self.journal.path)
+        snapshot = {'journal': {'inode': journal.st_ino, 'offset': journal.st_size}, 'contacts': contacts}
+        atomic_write(self.snapshot_file, json.dumps(snapshot, indent=2))
+        self.journal.rewrite([])
+
+        self._by_id = {}
+        self._by_status = {}
+        for contact in contacts:
+            self._index(contact)
+        self._snapshot_signature = self._signature()
+        self._journal_inode = os.stat(self.journal.path).st_ino
+        self._journal_offset = 0
+        self._journal_lines = 0
+        self._loaded = True
@@ -71,13 +71,15 @@ class CsvHandler:
         contacts = []
         errors = []
         
-        for idx, row in df.iterrows():
+        # zip sur les colonnes plutôt que iterrows (qui crée une Series par ligne)
+        rows = zip(df['nom'], df['prenom'], df['telephone'])
+        for idx, (nom, prenom, telephone) in enumerate(rows):
             try:
-                telephone = CsvHandler.format_phone_number(str(row['telephone']))
+                telephone = CsvHandler.format_phone_number(str(telephone))
                 
                 contact = {
-                    'nom': str(row['nom']).strip(),
-                    'prenom': str(row['prenom']).strip(),
+                    'nom': str(nom).strip(),
+                    'prenom': str(prenom).strip(),
                     'telephone': telephone
                 }
                 contacts.append(contact)
@@ -118,6 +120,10 @@ class CsvHandler:
             'repondeur', 'no_response', 'reasoning'
         ]
         
+        # Transcriptions présentes uniquement pour un export complet
+        if 'transcription' in df.columns:
+            columns.append('transcription')
+        
         # Ajouter les colonnes manquantes
         for col in columns:
             if col not in df.columns:
@@ -137,7 +143,8 @@ class CsvHandler:
             'identity_confirmed': 'Identité confirmée',
             'repondeur': 'Répondeur détecté',
             'no_response': 'Pas de réponse',
-            'reasoning': 'Raison'
+            'reasoning': 'Raison',
+            'transcription': 'Transcription'
         })
         
         return result_df
@@ -0,0 +1,91 @@
+import os
+import logging
+from typing import Callable, Dict, List, Optional
+from utils.config import Config
+from utils.json_database import JsonDatabase
+from utils.sqlite_database import SqliteDatabase, migrate_from_json
+from utils.campaign_catalog import CampaignCatalog
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+def create_database(data_dir: str = None, campaign_id: str = None):
+    """Instancie le moteur de stockage choisi par Config.DB_ENGINE
+
+    La base ouverte est la partition de la campagne `campaign_id` (par
+    défaut la campagne active du catalogue). Au premier démarrage en mode
+    'sqlite', les données JSON existantes de la partition sont migrées
+    automatiquement.
+    """
+    config = Config()
+    catalog = CampaignCatalog(data_dir or config.DATA_DIR)
+    data_dir = catalog.partition_dir(campaign_id or catalog.active()['id'])
+    engine = config.DB_ENGINE.lower()
+    
+    if engine == 'sqlite':
+        db_file = os.path.join(data_dir, "voicecheck.db")
+        has_json_data = any(
+            os.path.exists(os.path.join(data_dir, name))
+            for name in ("contacts.json", "results.jsonl", "results.json")
+        )
+        if not os.path.exists(db_file) and has_json_data:
+            logger.info(f"🔁 Première utilisation de SQLite: migration des fichiers JSON de {data_dir}")
+            migrate_from_json(data_dir)
+        return SqliteDatabase(data_dir)
+    
+    if engine != 'json':
+        logger.warning(f"⚠️ Moteur de stockage inconnu '{engine}', utilisation de JSON")
+    return JsonDatabase(data_dir)
+
+
+def start_new_campaign(data_dir: str = None, name: str = None) -> Dict:
+    """Archive la campagne active en segment compressé puis en démarre une nouvelle
+
+    Returns:
+        La nouvelle campagne active
+    """
+    catalog = CampaignCatalog(data_dir or Config().DATA_DIR)
+    active = catalog.active()
+    db = create_database(data_dir, active['id'])
+    catalog.archive(
+        active['id'],
+        db.load_contacts(),
+        db.load_results(include_transcripts=True),
+        db.get_statistics()
+    )
+    db.close()
+    return catalog.create(name)
+
+
+class StatusUpdateBatch:
+    """Regroupe les changements de statut pour les écrire par lots via bulk_update_status"""
+    
+    def __init__(self, db, batch_size: int = 20, on_flush: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            db: Base de la campagne
+            batch_size: Nombre de changements au-delà duquel le lot est écrit
+            on_flush: Appelé après chaque écriture d'un lot (ex: clore les appels journalisés)
+        """
+        self.db = db
+        self.batch_size = batch_size
+        self.on_flush = on_flush
+        self._pending: Dict[str, List[str]] = {}
+        self._count = 0
+    
+    def add(self, contact_id: str, status: str):
+        """Enregistre un changement de statut (écrit dès que le lot est plein)"""
+        self._pending.setdefault(status, []).append(contact_id)
+        self._count += 1
+        if self._count >= self.batch_size:
+            self.flush()
+    
+    def flush(self):
+        """Écrit tous les changements en attente (un appel par statut)"""
+        for status, contact_ids in self._pending.items():
+            self.db.bulk_update_status(contact_ids, status)
+        self._pending = {}
+        self._count = 0
+        if self.on_flush is not None:
+            self.on_flush()
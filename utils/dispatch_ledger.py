@@ -0,0 +1,137 @@
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+from utils.file_lock import FileLock
+from utils.jsonl_log import JsonlLog
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+# Lancement réservé: la requête vers le fournisseur est envoyée ou sur le point de l'être
+CLAIMED = 'claimed'
+# Le fournisseur a renvoyé un call_id: l'appel (payant) est passé
+PLACED = 'placed'
+# Lancement refusé par le fournisseur: la clé peut de nouveau être réservée
+RELEASED = 'released'
+
+# Au-delà de ce délai (secondes) sans nouvelle, une réservation sans call_id est
+# peut-être un lancement interrompu (arrêt du processus pendant la requête). Le
+# lanceur renouvelle sa réservation avant chaque requête de lancement et pendant
+# ses attentes (réouverture du circuit, fin de pause après un 429) : le délai
+# couvre une seule requête, reprises et timeouts compris.
+CLAIM_TIMEOUT = 900
+
+
+def dispatch_key(campaign_id: str, contact_id: str, attempt: int) -> str:
+    """Clé d'idempotence d'un lancement d'appel: une par (campagne, contact, tentative)"""
+    return f"{campaign_id}:{contact_id}:{attempt}"
+
+
+def is_claimable(entry: Optional[Dict]) -> bool:
+    """La clé peut-elle être (de nouveau) réservée sans vérification ?
+
+    Une réservation sans call_id n'est jamais reprise d'office : l'appel a
+    pu être passé (arrêt juste après la requête). Voir is_stale.
+    """
+    return entry is None or entry.get('state') == RELEASED
+
+
+def is_stale(entry: Optional[Dict]) -> bool:
+    """Réservation sans call_id restée sans nouvelle au-delà de CLAIM_TIMEOUT
+
+    Elle ne peut être reprise (can_take_over) qu'après avoir vérifié auprès
+    du fournisseur, par la clé d'idempotence, qu'aucun appel n'a été passé.
+    """
+    if entry is None or entry.get('state') != CLAIMED or entry.get('call_id'):
+        return False
+    claimed_at = datetime.fromisoformat(entry['updated_at'])
+    return (datetime.now() - claimed_at).total_seconds() >= CLAIM_TIMEOUT
+
+
+def can_take_over(entry: Optional[Dict], takeover: Optional[Dict]) -> bool:
+    """La clé peut-elle être réservée: libre, ou réservation périmée vérifiée et inchangée depuis"""
+    if is_claimable(entry):
+        return True
+    return (takeover is not None and entry.get('state') == CLAIMED and not entry.get('call_id')
+            and entry.get('updated_at') == takeover.get('updated_at'))
+
+
+class DispatchLedger:
+    """Registre des lancements d'appels (dispatches.jsonl), moteur JSON
+
+    Avant chaque appel, la clé d'idempotence (campagne, contact, tentative)
+    est réservée ; le call_id renvoyé par le fournisseur y est ensuite
+    inscrit. Un second lancement avec la même clé (rerun Streamlit,
+    reprise, redémarrage du worker) retrouve l'appel déjà passé au lieu
+    d'en payer un nouveau. Comme CallJournal, le registre est append-only :
+    le dernier événement d'une clé fait foi.
+
+    Le dernier état de chaque clé est indexé en mémoire ; seules les lignes
+    ajoutées depuis la dernière lecture sont relues (comme ContactStore) :
+    une réservation ne reparse pas tout le registre.
+    """
+
+    def __init__(self, path: str):
+        self.log = JsonlLog(path)
+        # Sérialise « lire puis réserver » entre threads et processus
+        self.claim_lock = FileLock(path + '.claim.lock')
+        self._entries: Dict[str, Dict] = {}
+        self._offset = 0
+        self._inode = None
+        self._lock = threading.RLock()
+
+    def _refresh(self):
+        """Indexe les événements ajoutés au registre depuis la dernière lecture"""
+        stat = os.stat(self.log.path)
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # Registre réécrit (clear, compaction): relecture complète
+            self._entries = {}
+            self._offset = 0
+            self._inode = stat.st_ino
+        if stat.st_size > self._offset:
+            events, self._offset = self.log.read_from(self._offset)
+            for event in events:
+                self._index(event)
+
+    def _index(self, event: Dict):
+        key = event.get('key')
+        if key is not None:
+            self._entries[key] = {**self._entries.get(key, {}), **event}
+
+    def claim(self, key: str, contact_id: str, takeover: Optional[Dict] = None) -> Optional[Dict]:
+        """Réserve la clé
+
+        Args:
+            takeover: Réservation périmée (is_stale) dont le fournisseur a confirmé
+                qu'elle n'a passé aucun appel ; elle est reprise si elle n'a pas changé
+
+        Returns:
+            None si la clé est réservée pour l'appelant, sinon l'entrée existante
+            (appel déjà passé ou lancement en cours)
+        """
+        with self.claim_lock.exclusive():
+            existing = self.get(key)
+            if not can_take_over(existing, takeover):
+                return existing
+            self.update(key, CLAIMED, contact_id=contact_id)
+        return None
+
+    def update(self, key: str, state: str, **fields):
+        event = {**fields, 'key': key, 'state': state, 'updated_at': datetime.now().isoformat()}
+        self.log.extend([event])
+        with self._lock:
+            # Relecture incrémentale: notre ligne est indexée à sa place parmi celles des autres écrivains
+            self._refresh()
+
+    def get(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            self._refresh()
+            entry = self._entries.get(key)
+            return dict(entry) if entry is not None else None
+
+    def clear(self):
+        self.log.rewrite([])
+        with self._lock:
+            self._refresh()
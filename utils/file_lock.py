@@ -0,0 +1,100 @@
+import os
+import threading
+import zlib
+from contextlib import contextmanager, ExitStack
+from typing import Iterable, Union
+import logging
+
+try:
+    import fcntl
+except ImportError:  # Windows: verrous consultatifs indisponibles
+    fcntl = None
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+if fcntl is None:
+    logger.warning("⚠️ fcntl indisponible: les écritures concurrentes entre processus ne sont pas verrouillées")
+
+
+class FileLock:
+    """Verrou consultatif inter-processus (flock) sur un fichier .lock
+
+    En mode partagé, plusieurs détenteurs peuvent écrire en parallèle
+    (ex: ajouts en fin de journal) ; le mode exclusif est réservé aux
+    réécritures complètes (compaction, réinitialisation).
+    Chaque acquisition ouvre son propre descripteur : le verrou exclut
+    aussi les autres threads du même processus.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    @contextmanager
+    def _acquire(self, mode: int):
+        if fcntl is None:
+            yield
+            return
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, mode)
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+            os.close(fd)
+
+    def shared(self):
+        """Verrou partagé (plusieurs détenteurs simultanés)"""
+        return self._acquire(fcntl.LOCK_SH if fcntl else None)
+
+    def exclusive(self):
+        """Verrou exclusif (un seul détenteur)"""
+        return self._acquire(fcntl.LOCK_EX if fcntl else None)
+
+
+class StripedLocks:
+    """Verrous par enregistrement, répartis sur un nombre fixe de fichiers
+
+    Deux enregistrements différents tombent le plus souvent sur des
+    fichiers différents et peuvent donc être modifiés en parallèle par
+    plusieurs processus.
+    """
+
+    def __init__(self, lock_dir: str, prefix: str, stripes: int = 64):
+        self.lock_dir = lock_dir
+        self.prefix = prefix
+        self.stripes = stripes
+        os.makedirs(self.lock_dir, exist_ok=True)
+
+    def _stripe(self, key: str) -> int:
+        return zlib.crc32(str(key).encode('utf-8')) % self.stripes
+
+    def _lock(self, stripe: int) -> FileLock:
+        return FileLock(os.path.join(self.lock_dir, f"{self.prefix}-{stripe:02d}.lock"))
+
+    @contextmanager
+    def hold(self, keys: Iterable[str]):
+        """Verrouille (en exclusif) tous les enregistrements donnés
+
+        Les fichiers sont acquis dans un ordre fixe pour éviter les interblocages.
+        """
+        with ExitStack() as stack:
+            for stripe in sorted({self._stripe(key) for key in keys}):
+                stack.enter_context(self._lock(stripe).exclusive())
+            yield
+
+
+def atomic_write(path: str, content: Union[str, bytes]):
+    """Écrit un fichier de façon atomique (fichier temporaire unique + fsync + rename)"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            if isinstance(content, str):
+                content = content.encode('utf-8')
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
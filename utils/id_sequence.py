@@ -0,0 +1,54 @@
+import json
+import os
+from typing import Callable
+import logging
+from utils.file_lock import FileLock, atomic_write
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class IdSequence:
+    """Séquence monotone d'identifiants persistée dans un petit fichier JSON
+
+    Les identifiants ne sont jamais réutilisés, même après une
+    réinitialisation de campagne. Une allocation par bloc coûte une seule
+    écriture, quel que soit le nombre d'identifiants demandés. L'allocation
+    se fait sous verrou exclusif : deux imports simultanés ne reçoivent
+    jamais les mêmes identifiants.
+    """
+
+    def __init__(self, path: str, initial_value: Callable[[], int]):
+        """
+        Args:
+            path: Fichier de persistance (ex: data/sequence.json)
+            initial_value: Appelée une seule fois si le fichier n'existe pas,
+                retourne le plus grand identifiant déjà utilisé
+        """
+        self.path = path
+        self.initial_value = initial_value
+        self.lock = FileLock(path + '.lock')
+
+    def _read(self) -> int:
+        if not os.path.exists(self.path):
+            last_id = self.initial_value()
+            logger.info(f"🔢 Séquence d'identifiants initialisée à {last_id + 1}")
+            return last_id + 1
+        with open(self.path, 'r') as f:
+            return json.load(f)['next_id']
+
+    def peek(self) -> int:
+        """Prochain identifiant qui sera alloué (sans le réserver)"""
+        with self.lock.exclusive():
+            return self._read()
+
+    def allocate(self, count: int) -> int:
+        """Réserve `count` identifiants consécutifs
+
+        Returns:
+            Le premier identifiant du bloc
+        """
+        with self.lock.exclusive():
+            first_id = self._read()
+            atomic_write(self.path, json.dumps({'next_id': first_id + count}))
+        return first_id
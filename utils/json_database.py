@@ -1,152 +1,305 @@
 import json
 import os
+import threading
+import time
 from datetime import datetime
 from typing import List, Dict, Optional
 import logging
+from utils.jsonl_log import JsonlLog
+from utils.contact_store import ContactStore
+from utils.file_lock import FileLock, atomic_write
+from utils.id_sequence import IdSequence
+from utils.blob_store import BlobStore, externalize_transcript, attach_transcript
+from utils.call_journal import CallJournal
+from utils.dispatch_ledger import DispatchLedger
+from utils.campaign_counters import CampaignCounters, compute_statistics
 
 # Configuration du logger
 logger = logging.getLogger(__name__)
 
+# Journaux et index partagés par toutes les instances d'un même dossier :
+# Streamlit recrée JsonDatabase à chaque rerun et dans chaque session, le
+# cache de lecture doit donc vivre au niveau du processus.
+_shared_storage: Dict[str, Dict] = {}
+_shared_storage_lock = threading.Lock()
+
 class JsonDatabase:
     """Gestion de la base de données JSON"""
     
     def __init__(self, data_dir: str = "data"):
         self.data_dir = data_dir
         self.contacts_file = os.path.join(data_dir, "contacts.json")
-        self.results_file = os.path.join(data_dir, "results.json")
+        self.contacts_journal_file = os.path.join(data_dir, "contacts.journal.jsonl")
+        self.results_file = os.path.join(data_dir, "results.jsonl")
+        self.legacy_results_file = os.path.join(data_dir, "results.json")
+        self.calls_file = os.path.join(data_dir, "calls.jsonl")
+        self.dispatches_file = os.path.join(data_dir, "dispatches.jsonl")
+        self.lock_dir = os.path.join(data_dir, "locks")
+        self.blobs = BlobStore(os.path.join(data_dir, "blobs"))
         self._ensure_files()
+        storage = self._get_shared_storage()
+        self.results_log = storage['results']
+        self.contacts = storage['contacts']
+        self.call_journal = storage['calls']
+        self.dispatch_ledger = storage['dispatches']
+        self.counters = storage['counters']
+        self.id_sequence = IdSequence(os.path.join(data_dir, "sequence.json"), self._max_contact_id)
         logger.info(f"JsonDatabase initialisée - contacts: {self.contacts_file}, results: {self.results_file}")
     
     def _ensure_files(self):
         """Crée les fichiers s'ils n'existent pas"""
         os.makedirs(self.data_dir, exist_ok=True)
         
-        if not os.path.exists(self.contacts_file):
-            with open(self.contacts_file, 'w') as f:
-                json.dump([], f)
+        with FileLock(self.contacts_file + '.lock').exclusive():
+            if not os.path.exists(self.contacts_file):
+                atomic_write(self.contacts_file, json.dumps([]))
+        
+        with FileLock(self.results_file + '.lock').exclusive():
+            if not os.path.exists(self.results_file):
+                self._migrate_legacy_results()
+    
+    def _get_shared_storage(self) -> Dict:
+        """Retourne (en les créant au besoin) le journal des résultats et l'index des contacts du dossier"""
+        key = os.path.abspath(self.data_dir)
+        with _shared_storage_lock:
+            if key not in _shared_storage:
+                results = JsonlLog(self.results_file)
+                contacts = ContactStore(self.contacts_file, self.contacts_journal_file, self.lock_dir)
+                _shared_storage[key] = {
+                    'results': results,
+                    'contacts': contacts,
+                    'calls': CallJournal(self.calls_file),
+                    'dispatches': DispatchLedger(self.dispatches_file),
+                    'counters': CampaignCounters(contacts, results)
+                }
+            return _shared_storage[key]
+    
+    def close(self):
+        """Libère le cache partagé du dossier (ex: après archivage de la campagne)"""
+        with _shared_storage_lock:
+            _shared_storage.pop(os.path.abspath(self.data_dir), None)
+    
+    def cache_stats(self) -> Dict:
+        """Compteurs du cache de lecture (succès = aucun parsing JSON)"""
+        return {
+            'contacts': self.contacts.cache_stats(),
+            'results': self.results_log.cache_stats()
+        }
+    
+    def _migrate_legacy_results(self):
+        """Convertit l'ancien results.json (liste JSON) en journal JSON Lines"""
+        if not os.path.exists(self.legacy_results_file):
+            return
+        
+        with open(self.legacy_results_file, 'r') as f:
+            results = json.load(f)
         
-        if not os.path.exists(self.results_file):
-            with open(self.results_file, 'w') as f:
-                json.dump([], f)
+        results = [externalize_transcript(result, self.blobs) for result in results]
+        atomic_write(self.results_file, ''.join(json.dumps(result) + '\n' for result in results))
+        os.replace(self.legacy_results_file, self.legacy_results_file + '.migrated')
+        logger.info(f"🔁 {len(results)} résultats migrés de {self.legacy_results_file} vers {self.results_file}")
     
     def load_contacts(self) -> List[Dict]:
         """Charge tous les contacts"""
-        with open(self.contacts_file, 'r') as f:
-            return json.load(f)
+        return [dict(c) for c in self.contacts.all()]
     
     def save_contacts(self, contacts: List[Dict]):
         """Sauvegarde tous les contacts"""
-        with open(self.contacts_file, 'w') as f:
-            json.dump(contacts, f, indent=2)
-    
-    def add_contacts(self, new_contacts: List[Dict]):
-        """Ajoute de nouveaux contacts"""
-        contacts = self.load_contacts()
-        for contact in new_contacts:
-            contact['id'] = self._generate_id(contacts)
-            contact['created_at'] = datetime.now().isoformat()
+        self.contacts.replace_all(contacts)
+    
+    def add_contacts(self, new_contacts: List[Dict]) -> Dict:
+        """Ajoute de nouveaux contacts (import en masse, une seule écriture)
+        
+        Returns:
+            Rapport d'import: nombre de lignes, durée et débit (lignes/s)
+        """
+        start = time.perf_counter()
+        created_at = datetime.now().isoformat()
+        first_id = self.id_sequence.allocate(len(new_contacts))
+        
+        for offset, contact in enumerate(new_contacts):
+            contact['id'] = str(first_id + offset)
+            contact['created_at'] = created_at
             contact['status'] = 'pending'
-            contacts.append(contact)
-        self.save_contacts(contacts)
+        
+        self.contacts.add_many(new_contacts)
+        
+        duration = time.perf_counter() - start
+        rows_per_second = round(len(new_contacts) / duration) if duration > 0 else 0
+        logger.info(f"📥 {len(new_contacts)} contacts importés en {duration:.2f}s ({rows_per_second} lignes/s)")
+        return {'count': len(new_contacts), 'duration': duration, 'rows_per_second': rows_per_second}
     
     def update_contact_status(self, contact_id: str, status: str):
         """Met à jour le statut d'un contact"""
         logger.info(f"📝 Mise à jour du statut du contact {contact_id} -> {status}")
         
-        contacts = self.load_contacts()
-        found = False
-        for contact in contacts:
-            if contact['id'] == contact_id:
-                contact['status'] = status
-                contact['updated_at'] = datetime.now().isoformat()
-                found = True
-                logger.info(f"✅ Contact {contact_id} mis à jour: {contact['prenom']} {contact['nom']} -> {status}")
-                break
-        
-        if not found:
+        previous, contact = self.contacts.update(contact_id, status=status, updated_at=datetime.now().isoformat())
+        
+        if previous is None:
             logger.warning(f"⚠️ Contact {contact_id} non trouvé lors de la mise à jour du statut")
+            return
         
-        self.save_contacts(contacts)
+        logger.info(f"✅ Contact {contact_id} mis à jour: {contact['prenom']} {contact['nom']} -> {status}")
+    
+    def bulk_update_status(self, contact_ids: List[str], status: str) -> int:
+        """Met à jour le statut de plusieurs contacts en une seule écriture
+        
+        Returns:
+            Le nombre de contacts effectivement mis à jour
+        """
+        changes = self.contacts.update_many(contact_ids, status=status, updated_at=datetime.now().isoformat())
+        updated = 0
+        
+        for contact_id, (previous, _) in zip(contact_ids, changes):
+            if previous is None:
+                logger.warning(f"⚠️ Contact {contact_id} non trouvé lors de la mise à jour du statut")
+                continue
+            updated += 1
+        
+        logger.info(f"📝 {updated} contact(s) passé(s) au statut {status}")
+        return updated
     
     def get_pending_contacts(self) -> List[Dict]:
         """Récupère les contacts en attente"""
-        contacts = self.load_contacts()
-        return [c for c in contacts if c.get('status') == 'pending']
+        return [dict(c) for c in self.contacts.with_status('pending')]
     
     def get_completed_contacts(self) -> List[Dict]:
         """Récupère les contacts terminés"""
-        contacts = self.load_contacts()
-        return [c for c in contacts if c.get('status') == 'completed']
+        return [dict(c) for c in self.contacts.with_status('completed')]
+    
+    def load_results(self, include_transcripts: bool = False) -> List[Dict]:
+        """Charge tous les résultats
+        
+        Args:
+            include_transcripts: Recharge aussi les transcriptions depuis le
+                BlobStore (export complet) ; sinon seule `transcript_ref` est présente
+        """
+        results = self.results_log.load()
+        if include_transcripts:
+            return [attach_transcript(result, self.blobs) for result in results]
+        return results
     
-    def load_results(self) -> List[Dict]:
-        """Charge tous les résultats"""
-        with open(self.results_file, 'r') as f:
-            return json.load(f)
+    def load_transcript(self, ref: str) -> Optional[str]:
+        """Charge une transcription à la demande à partir de sa référence"""
+        return self.blobs.get(ref)
     
     def save_results(self, results: List[Dict]):
         """Sauvegarde tous les résultats"""
-        with open(self.results_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        self.results_log.rewrite([externalize_transcript(result, self.blobs) for result in results])
+    
+    def compact_results(self) -> int:
+        """Compacte le journal des résultats
+        
+        Supprime les lignes corrompues et déplace dans le BlobStore les
+        transcriptions encore stockées en ligne (résultats antérieurs).
+        """
+        return self.results_log.compact(lambda result: externalize_transcript(result, self.blobs))
+    
+    def update_results(self, updates: Dict[str, Dict]) -> int:
+        """Corrige sur place des résultats déjà sauvegardés (ex: réanalyse d'un transcript)
+    
+        Args:
+            updates: Champs à modifier, par call_sid
+    
+        Returns:
+            Le nombre de résultats modifiés
+        """
+        if not updates:
+            return 0
+        updated = []
+    
+        def apply(result: Dict) -> Dict:
+            fields = updates.get(result.get('call_sid'))
+            if fields is None:
+                return result
+            updated.append(result.get('call_sid'))
+            return {**result, **fields}
+    
+        self.results_log.compact(apply)
+        return len(updated)
     
     def save_result(self, result: Dict):
         """Sauvegarde un résultat d'appel"""
         logger.info(f"💾 Début de la sauvegarde du résultat pour contact_id: {result.get('contact_id')}")
         logger.debug(f"Résultat à sauvegarder: {result}")
         
-        results = self.load_results()
         result['timestamp'] = datetime.now().isoformat()
-        results.append(result)
-        
-        with open(self.results_file, 'w') as f:
-            json.dump(results, f, indent=2)
+        self.results_log.append(externalize_transcript(result, self.blobs))
         
-        logger.info(f"✅ Résultat sauvegardé dans {self.results_file} (total: {len(results)} résultats)")
+        logger.info(f"✅ Résultat sauvegardé dans {self.results_file}")
     
-    def get_statistics(self) -> Dict:
-        """Calcule les statistiques"""
-        results = self.load_results()
-        contacts = self.load_contacts()
-        
-        total_contacts = len(contacts)
-        total_calls = len(results)
-        
-        consent_given = len([r for r in results if r.get('consent') == True])
-        consent_refused = len([r for r in results if r.get('consent') == False])
-        
-        identity_confirmed = len([r for r in results if r.get('identity_confirmed') == True])
-        identity_rejected = len([r for r in results if r.get('identity_confirmed') == False])
+    def journal_call(self, contact_id: str, call_id: str, **fields) -> Dict:
+        """Journalise un appel dès que le fournisseur a renvoyé son call_id"""
+        return self.call_journal.journal_call(contact_id, call_id, **fields)
+    
+    def update_call_state(self, call_id: str, state: str, **fields):
+        """Change l'état d'un appel journalisé (ex: 'finished' une fois le résultat sauvegardé)"""
+        self.call_journal.update_call_state(call_id, state, **fields)
+    
+    def get_inflight_calls(self) -> List[Dict]:
+        """Appels lancés dont le résultat n'a pas encore été sauvegardé (à reprendre après un arrêt)"""
+        return self.call_journal.inflight()
+    
+    def claim_dispatch(self, key: str, contact_id: str, takeover: Optional[Dict] = None) -> Optional[Dict]:
+        """Réserve une clé d'idempotence avant de lancer un appel
         
-        no_response = len([r for r in results if r.get('no_response') == True])
+        Args:
+            takeover: Réservation périmée vérifiée auprès du fournisseur, à reprendre
         
-        return {
-            'total_contacts': total_contacts,
-            'total_calls': total_calls,
-            'pending': len([c for c in contacts if c.get('status') == 'pending']),
-            'completed': len([c for c in contacts if c.get('status') == 'completed']),
-            'consent_given': consent_given,
-            'consent_refused': consent_refused,
-            'identity_confirmed': identity_confirmed,
-            'identity_rejected': identity_rejected,
-            'no_response': no_response
-        }
+        Returns:
+            None si l'appel peut être lancé, sinon l'entrée existante du registre
+        """
+        return self.dispatch_ledger.claim(key, contact_id, takeover)
     
-    def _generate_id(self, contacts: List[Dict]) -> str:
-        """Génère un ID unique"""
-        if not contacts:
-            return "1"
-        max_id = max([int(c['id']) for c in contacts if c.get('id', '').isdigit()], default=0)
-        return str(max_id + 1)
+    def update_dispatch(self, key: str, state: str, **fields):
+        """Inscrit l'issue d'un lancement (call_id renvoyé, ou refus du fournisseur)"""
+        self.dispatch_ledger.update(key, state, **fields)
+    
+    def count_results_by_contact(self) -> Dict[str, int]:
+        """Nombre de résultats d'appel déjà sauvegardés, par contact"""
+        counts: Dict[str, int] = {}
+        for result in self.results_log.load():
+            counts[result.get('contact_id')] = counts.get(result.get('contact_id'), 0) + 1
+        return counts
+    
+    def get_statistics(self) -> Dict:
+        """Retourne les statistiques (dérivées de l'index des contacts et du journal des résultats)"""
+        return self.counters.load()
+    
+    def rebuild_statistics(self) -> Dict:
+        """Recalcule entièrement les compteurs à partir des contacts et résultats"""
+        self.counters.reset()
+        stats = self.counters.load()
+        logger.info(f"📊 Compteurs de campagne recalculés: {stats}")
+        return stats
+    
+    def verify_statistics(self) -> bool:
+        """Vérifie que les compteurs incrémentaux correspondent à un recalcul complet"""
+        stored = self.get_statistics()
+        expected = compute_statistics(self.contacts.all(), self.load_results())
+        mismatches = {k: (stored[k], expected[k]) for k in expected if stored[k] != expected[k]}
+        if mismatches:
+            logger.warning(f"⚠️ Compteurs incohérents (incrémental, attendu): {mismatches}")
+        return not mismatches
+    
+    def _max_contact_id(self) -> int:
+        """Plus grand ID numérique existant (initialisation de la séquence)"""
+        return max([int(c['id']) for c in self.contacts.all() if str(c.get('id', '')).isdigit()], default=0)
     
     def reset_campaign(self):
         """Réinitialise complètement la campagne (supprime tous les contacts et résultats)"""
         logger.warning("Réinitialisation de la campagne - suppression de tous les contacts et résultats")
-        self.save_contacts([])
-        self.save_results([])
+        self.contacts.replace_all([])
+        self.results_log.rewrite([])
+        self.call_journal.clear()
+        self.dispatch_ledger.clear()
+        self.blobs.clear()
+        self.counters.reset()
         logger.info("Campagne réinitialisée avec succès")
     
     def get_campaign_start_date(self) -> Optional[str]:
         """Retourne la date de début de la campagne (date du premier contact ajouté)"""
-        contacts = self.load_contacts()
+        contacts = self.contacts.all()
         if not contacts:
             return None
         
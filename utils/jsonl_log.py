@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+from typing import List, Dict, Tuple, Callable, Optional
+import logging
+from utils.file_lock import FileLock, atomic_write
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+
+class JsonlLog:
+    """Journal append-only au format JSON Lines (un objet JSON par ligne)
+
+    Chaque ajout est une seule écriture en fin de fichier suivie d'un fsync :
+    le coût d'une sauvegarde ne dépend plus du nombre de résultats déjà
+    enregistrés. La compaction réécrit le fichier de façon atomique.
+
+    Les enregistrements lus sont gardés en cache : tant que le fichier n'a
+    pas changé (même inode, même taille), `load()` ne reparse rien. Si le
+    fichier a seulement grandi, seule la fin est lue. Les ajouts faits par
+    cette instance mettent le cache à jour directement.
+
+    Concurrence entre processus : les ajouts prennent un verrou partagé
+    (écritures O_APPEND en parallèle), les réécritures un verrou exclusif.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if not os.path.exists(self.path):
+            open(self.path, 'a').close()
+
+        self.lock = FileLock(self.path + '.lock')
+        self._lock = threading.RLock()
+        self._cached_records = None
+        self._cached_inode = None
+        self._cached_offset = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _stat(self) -> Tuple[int, int]:
+        stat = os.stat(self.path)
+        return stat.st_ino, stat.st_size
+
+    def append(self, record: Dict):
+        """Ajoute un enregistrement en fin de journal (écriture + fsync)"""
+        self.extend([record])
+
+    def extend(self, records: List[Dict]) -> Tuple[int, int]:
+        """Ajoute plusieurs enregistrements en une seule écriture + fsync
+
+        Returns:
+            Positions (début, fin) de l'écriture dans le fichier
+        """
+        chunk = ''.join(json.dumps(record) + '\n' for record in records).encode('utf-8')
+
+        with self.lock.shared():
+            with open(self.path, 'ab+') as f:
+                # Ne jamais coller un enregistrement à une ligne tronquée par un crash
+                f.seek(0, os.SEEK_END)
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        chunk = b'\n' + chunk
+                f.write(chunk)
+                f.flush()
+                os.fsync(f.fileno())
+                end = f.tell()
+                inode = os.fstat(f.fileno()).st_ino
+
+        with self._lock:
+            # Le cache n'est prolongé que si aucun autre écrivain ne s'est intercalé
+            if (self._cached_records is not None and inode == self._cached_inode
+                    and self._cached_offset == end - len(chunk)):
+                self._cached_records.extend(dict(record) for record in records)
+                self._cached_offset = end
+        return end - len(chunk), end
+
+    def size(self) -> int:
+        """Taille actuelle du journal en octets"""
+        return os.path.getsize(self.path)
+
+    def load(self) -> List[Dict]:
+        """Charge tous les enregistrements du journal
+
+        Les lignes illisibles (ex: dernière ligne tronquée après un crash)
+        sont ignorées avec un avertissement.
+        """
+        with self._lock:
+            inode, size = self._stat()
+            if self._cached_records is None or inode != self._cached_inode or size < self._cached_offset:
+                self.misses += 1
+                self._cached_records = []
+                self._cached_inode = inode
+                self._cached_offset = 0
+                self._read_tail()
+            elif size > self._cached_offset:
+                self.misses += 1
+                self._read_tail()
+            else:
+                self.hits += 1
+            return [dict(record) for record in self._cached_records]
+
+    def _read_tail(self):
+        records, self._cached_offset = self.read_from(self._cached_offset)
+        self._cached_records.extend(records)
+
+    def cache_stats(self) -> Dict:
+        """Compteurs de succès/échecs du cache de lecture"""
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def read_from(self, offset: int) -> Tuple[List[Dict], int]:
+        """Lit les enregistrements ajoutés après la position `offset`
+
+        Une ligne finale incomplète (écriture en cours) n'est pas consommée.
+
+        Returns:
+            (enregistrements lus, nouvelle position de lecture)
+        """
+        with open(self.path, 'rb') as f:
+            f.seek(offset)
+            data = f.read()
+        return self._parse(data, offset)
+
+    def follow(self, inode: Optional[int], offset: int) -> Tuple[List[Dict], int, int, bool]:
+        """Lecture incrémentale pour un lecteur qui suit le journal
+
+        Si le fichier a été remplacé (réécriture, compaction) ou tronqué
+        depuis la dernière lecture, la lecture repart du début.
+
+        Returns:
+            (enregistrements lus, inode lu, nouvelle position, lecture reprise du début)
+        """
+        with open(self.path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            restarted = stat.st_ino != inode or stat.st_size < offset
+            if restarted:
+                offset = 0
+            f.seek(offset)
+            data = f.read()
+        records, end = self._parse(data, offset)
+        return records, stat.st_ino, end, restarted
+
+    def _parse(self, data: bytes, offset: int) -> Tuple[List[Dict], int]:
+        """Décode les lignes complètes d'un bloc lu à partir de `offset`"""
+        end = data.rfind(b'\n') + 1
+        records = []
+        for line in data[:end].splitlines():
+            if not line.strip():
+                continue
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                logger.warning(f"⚠️ Ligne illisible ignorée dans {self.path}")
+        return records, offset + end
+
+    def rewrite(self, records: List[Dict]):
+        """Remplace tout le contenu du journal de façon atomique"""
+        with self.lock.exclusive():
+            self._rewrite_locked(records)
+
+    def _rewrite_locked(self, records: List[Dict]):
+        with self._lock:
+            atomic_write(self.path, ''.join(json.dumps(record) + '\n' for record in records))
+            self._cached_records = [dict(record) for record in records]
+            self._cached_inode, self._cached_offset = self._stat()
+
+    def compact(self, transform: Optional[Callable[[Dict], Dict]] = None) -> int:
+        """Réécrit le journal en supprimant les lignes vides ou corrompues
+
+        Args:
+            transform: Fonction optionnelle appliquée à chaque enregistrement conservé
+
+        Returns:
+            Le nombre d'enregistrements conservés
+        """
+        with self.lock.exclusive():
+            records = self.load()
+            if transform is not None:
+                records = [transform(record) for record in records]
+            self._rewrite_locked(records)
+        logger.info(f"🗜️ Journal compacté: {self.path} ({len(records)} enregistrements)")
+        return len(records)
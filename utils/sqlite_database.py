@@ -0,0 +1,576 @@
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import List, Dict, Optional
+import logging
+from utils.campaign_counters import COUNTER_NAMES
+from utils.blob_store import BlobStore, externalize_transcript, attach_transcript
+from utils.call_journal import DISPATCHED
+from utils.dispatch_ledger import CLAIMED, can_take_over
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    status TEXT,
+    telephone TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_contacts_status ON contacts(status);
+CREATE INDEX IF NOT EXISTS idx_contacts_telephone ON contacts(telephone);
+
+CREATE TABLE IF NOT EXISTS results (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    contact_id TEXT,
+    telephone TEXT,
+    timestamp TEXT,
+    consent INTEGER,
+    identity_confirmed INTEGER,
+    no_response INTEGER,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_contact_id ON results(contact_id);
+CREATE INDEX IF NOT EXISTS idx_results_telephone ON results(telephone);
+CREATE INDEX IF NOT EXISTS idx_results_timestamp ON results(timestamp);
+
+CREATE TABLE IF NOT EXISTS calls (
+    call_id TEXT PRIMARY KEY,
+    contact_id TEXT,
+    state TEXT,
+    dispatched_at TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_calls_state ON calls(state);
+
+CREATE TABLE IF NOT EXISTS dispatches (
+    key TEXT PRIMARY KEY,
+    contact_id TEXT,
+    state TEXT,
+    updated_at TEXT,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS sequences (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_contacts_insert AFTER INSERT ON contacts BEGIN
+    UPDATE counters SET value = value + 1
+    WHERE name = 'total_contacts' OR (name = NEW.status AND name IN ('pending', 'completed'));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_contacts_delete AFTER DELETE ON contacts BEGIN
+    UPDATE counters SET value = value - 1
+    WHERE name = 'total_contacts' OR (name = OLD.status AND name IN ('pending', 'completed'));
+END;
+CREATE TRIGGER IF NOT EXISTS trg_contacts_status AFTER UPDATE OF status ON contacts
+WHEN OLD.status IS NOT NEW.status BEGIN
+    UPDATE counters SET value = value - 1 WHERE name = OLD.status AND name IN ('pending', 'completed');
+    UPDATE counters SET value = value + 1 WHERE name = NEW.status AND name IN ('pending', 'completed');
+END;
+CREATE TRIGGER IF NOT EXISTS trg_results_insert AFTER INSERT ON results BEGIN
+    UPDATE counters SET value = value + 1
+    WHERE name = 'total_calls'
+       OR (name = 'consent_given' AND NEW.consent = 1)
+       OR (name = 'consent_refused' AND NEW.consent = 0)
+       OR (name = 'identity_confirmed' AND NEW.identity_confirmed = 1)
+       OR (name = 'identity_rejected' AND NEW.identity_confirmed = 0)
+       OR (name = 'no_response' AND NEW.no_response = 1);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_results_delete AFTER DELETE ON results BEGIN
+    UPDATE counters SET value = value - 1
+    WHERE name = 'total_calls'
+       OR (name = 'consent_given' AND OLD.consent = 1)
+       OR (name = 'consent_refused' AND OLD.consent = 0)
+       OR (name = 'identity_confirmed' AND OLD.identity_confirmed = 1)
+       OR (name = 'identity_rejected' AND OLD.identity_confirmed = 0)
+       OR (name = 'no_response' AND OLD.no_response = 1);
+END;
+"""
+
+
+def _as_flag(value) -> Optional[int]:
+    """Convertit un booléen (ou None) en valeur SQLite"""
+    if value is None:
+        return None
+    return 1 if value else 0
+
+
+class SqliteDatabase:
+    """Moteur de stockage SQLite exposant la même API que JsonDatabase
+
+    Base en mode WAL, indexée sur le statut des contacts, le contact_id, le
+    téléphone et l'horodatage des résultats. Chaque enregistrement complet
+    est conservé en JSON dans la colonne `data`, les colonnes indexées en
+    sont une copie. Les statistiques sont tenues à jour par des triggers
+    dans la table `counters`.
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        self.data_dir = data_dir
+        self.db_file = os.path.join(data_dir, "voicecheck.db")
+        os.makedirs(self.data_dir, exist_ok=True)
+        self.blobs = BlobStore(os.path.join(data_dir, "blobs"))
+        self._local = threading.local()
+
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            if conn.execute("SELECT COUNT(*) FROM counters").fetchone()[0] != len(COUNTER_NAMES):
+                self._rebuild_counters(conn)
+            conn.execute(
+                "INSERT OR IGNORE INTO sequences (name, value) VALUES ('contact_id', ?)",
+                (self._max_contact_id(conn) + 1,)
+            )
+        logger.info(f"SqliteDatabase initialisée - base: {self.db_file}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connexion propre au thread courant (Streamlit exécute chaque session dans un thread)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_file, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Ferme la connexion du thread courant"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ------------------------------------------------------------------
+    # Contacts
+    # ------------------------------------------------------------------
+
+    def _insert_contacts(self, conn: sqlite3.Connection, contacts: List[Dict]):
+        conn.executemany(
+            "INSERT INTO contacts (id, status, telephone, created_at, data) VALUES (?, ?, ?, ?, ?)",
+            [(c['id'], c.get('status'), c.get('telephone'), c.get('created_at'), json.dumps(c)) for c in contacts]
+        )
+
+    def load_contacts(self) -> List[Dict]:
+        """Charge tous les contacts"""
+        rows = self._connect().execute("SELECT data FROM contacts ORDER BY seq").fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def save_contacts(self, contacts: List[Dict]):
+        """Sauvegarde tous les contacts"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM contacts")
+            self._insert_contacts(conn, contacts)
+
+    def add_contacts(self, new_contacts: List[Dict]) -> Dict:
+        """Ajoute de nouveaux contacts (import en masse, une seule transaction)
+
+        Returns:
+            Rapport d'import: nombre de lignes, durée et débit (lignes/s)
+        """
+        start = time.perf_counter()
+        created_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            first_id = self._allocate_ids(conn, len(new_contacts))
+            for offset, contact in enumerate(new_contacts):
+                contact['id'] = str(first_id + offset)
+                contact['created_at'] = created_at
+                contact['status'] = 'pending'
+            self._insert_contacts(conn, new_contacts)
+
+        duration = time.perf_counter() - start
+        rows_per_second = round(len(new_contacts) / duration) if duration > 0 else 0
+        logger.info(f"📥 {len(new_contacts)} contacts importés en {duration:.2f}s ({rows_per_second} lignes/s)")
+        return {'count': len(new_contacts), 'duration': duration, 'rows_per_second': rows_per_second}
+
+    def update_contact_status(self, contact_id: str, status: str):
+        """Met à jour le statut d'un contact"""
+        logger.info(f"📝 Mise à jour du statut du contact {contact_id} -> {status}")
+
+        updated_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            row = conn.execute(
+                "UPDATE contacts SET status = ?, data = json_set(data, '$.status', ?, '$.updated_at', ?) "
+                "WHERE id = ? RETURNING json_extract(data, '$.prenom'), json_extract(data, '$.nom')",
+                (status, status, updated_at, contact_id)
+            ).fetchone()
+
+        if row is None:
+            logger.warning(f"⚠️ Contact {contact_id} non trouvé lors de la mise à jour du statut")
+            return
+
+        logger.info(f"✅ Contact {contact_id} mis à jour: {row[0]} {row[1]} -> {status}")
+
+    def bulk_update_status(self, contact_ids: List[str], status: str) -> int:
+        """Met à jour le statut de plusieurs contacts en une seule transaction
+
+        Returns:
+            Le nombre de contacts effectivement mis à jour
+        """
+        updated_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            cursor = conn.executemany(
+                "UPDATE contacts SET status = ?, data = json_set(data, '$.status', ?, '$.updated_at', ?) WHERE id = ?",
+                [(status, status, updated_at, contact_id) for contact_id in contact_ids]
+            )
+            updated = cursor.rowcount
+
+        if updated < len(contact_ids):
+            logger.warning(f"⚠️ {len(contact_ids) - updated} contact(s) non trouvé(s) lors de la mise à jour du statut")
+        logger.info(f"📝 {updated} contact(s) passé(s) au statut {status}")
+        return updated
+
+    def _get_contacts_by_status(self, status: str) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT data FROM contacts WHERE status = ? ORDER BY seq", (status,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def get_pending_contacts(self) -> List[Dict]:
+        """Récupère les contacts en attente"""
+        return self._get_contacts_by_status('pending')
+
+    def get_completed_contacts(self) -> List[Dict]:
+        """Récupère les contacts terminés"""
+        return self._get_contacts_by_status('completed')
+
+    # ------------------------------------------------------------------
+    # Résultats
+    # ------------------------------------------------------------------
+
+    def _insert_results(self, conn: sqlite3.Connection, results: List[Dict]):
+        results = [externalize_transcript(r, self.blobs) for r in results]
+        conn.executemany(
+            "INSERT INTO results (contact_id, telephone, timestamp, consent, identity_confirmed, no_response, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [(r.get('contact_id'), r.get('telephone'), r.get('timestamp'),
+              _as_flag(r.get('consent')), _as_flag(r.get('identity_confirmed')),
+              _as_flag(r.get('no_response')), json.dumps(r)) for r in results]
+        )
+
+    def load_results(self, include_transcripts: bool = False) -> List[Dict]:
+        """Charge tous les résultats (transcriptions rechargées seulement si demandé)"""
+        rows = self._connect().execute("SELECT data FROM results ORDER BY seq").fetchall()
+        results = [json.loads(row[0]) for row in rows]
+        if include_transcripts:
+            return [attach_transcript(result, self.blobs) for result in results]
+        return results
+
+    def load_transcript(self, ref: str) -> Optional[str]:
+        """Charge une transcription à la demande à partir de sa référence"""
+        return self.blobs.get(ref)
+
+    def save_results(self, results: List[Dict]):
+        """Sauvegarde tous les résultats"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM results")
+            self._insert_results(conn, results)
+
+    def compact_results(self) -> int:
+        """Compacte la base (checkpoint du WAL + VACUUM)
+
+        Les transcriptions encore stockées en ligne sont d'abord déplacées
+        dans le BlobStore.
+        """
+        conn = self._connect()
+        with conn:
+            rows = conn.execute(
+                "SELECT seq, data FROM results WHERE json_extract(data, '$.transcription') != ''"
+            ).fetchall()
+            conn.executemany(
+                "UPDATE results SET data = ? WHERE seq = ?",
+                [(json.dumps(externalize_transcript(json.loads(data), self.blobs)), seq) for seq, data in rows]
+            )
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+        return conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def update_results(self, updates: Dict[str, Dict]) -> int:
+        """Corrige sur place des résultats déjà sauvegardés (ex: réanalyse d'un transcript)
+
+        Args:
+            updates: Champs à modifier, par call_sid
+
+        Returns:
+            Le nombre de résultats modifiés
+        """
+        if not updates:
+            return 0
+        updated = 0
+        with self._connect() as conn:
+            for call_sid, fields in updates.items():
+                rows = conn.execute(
+                    "SELECT seq, data FROM results WHERE json_extract(data, '$.call_sid') = ?", (call_sid,)
+                ).fetchall()
+                for seq, data in rows:
+                    result = {**json.loads(data), **fields}
+                    conn.execute(
+                        "UPDATE results SET consent = ?, identity_confirmed = ?, no_response = ?, data = ? WHERE seq = ?",
+                        (_as_flag(result.get('consent')), _as_flag(result.get('identity_confirmed')),
+                         _as_flag(result.get('no_response')), json.dumps(result), seq)
+                    )
+                    updated += 1
+            self._rebuild_counters(conn)
+        return updated
+
+    def save_result(self, result: Dict):
+        """Sauvegarde un résultat d'appel"""
+        logger.info(f"💾 Début de la sauvegarde du résultat pour contact_id: {result.get('contact_id')}")
+        logger.debug(f"Résultat à sauvegarder: {result}")
+
+        result['timestamp'] = datetime.now().isoformat()
+        with self._connect() as conn:
+            self._insert_results(conn, [result])
+
+        logger.info(f"✅ Résultat sauvegardé dans {self.db_file}")
+
+    # ------------------------------------------------------------------
+    # Journal des appels
+    # ------------------------------------------------------------------
+
+    def journal_call(self, contact_id: str, call_id: str, **fields) -> Dict:
+        """Journalise un appel dès que le fournisseur a renvoyé son call_id"""
+        now = datetime.now().isoformat()
+        entry = {**fields, 'call_id': call_id, 'contact_id': contact_id, 'state': DISPATCHED,
+                 'dispatched_at': now, 'updated_at': now}
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO calls (call_id, contact_id, state, dispatched_at, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (call_id, contact_id, DISPATCHED, now, now, json.dumps(entry))
+            )
+        return entry
+
+    def update_call_state(self, call_id: str, state: str, **fields):
+        """Change l'état d'un appel journalisé (ex: 'finished' une fois le résultat sauvegardé)"""
+        updated_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM calls WHERE call_id = ?", (call_id,)).fetchone()
+            if row is None:
+                logger.warning(f"⚠️ Appel {call_id} absent du journal")
+                return
+            entry = {**json.loads(row[0]), **fields, 'state': state, 'updated_at': updated_at}
+            conn.execute(
+                "UPDATE calls SET state = ?, updated_at = ?, data = ? WHERE call_id = ?",
+                (state, updated_at, json.dumps(entry), call_id)
+            )
+
+    def get_inflight_calls(self) -> List[Dict]:
+        """Appels lancés dont le résultat n'a pas encore été sauvegardé (à reprendre après un arrêt)"""
+        rows = self._connect().execute(
+            "SELECT data FROM calls WHERE state = ? ORDER BY dispatched_at", (DISPATCHED,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def claim_dispatch(self, key: str, contact_id: str, takeover: Optional[Dict] = None) -> Optional[Dict]:
+        """Réserve une clé d'idempotence avant de lancer un appel
+
+        Args:
+            takeover: Réservation périmée vérifiée auprès du fournisseur, à reprendre
+
+        Returns:
+            None si l'appel peut être lancé, sinon l'entrée existante du registre
+        """
+        now = datetime.now().isoformat()
+        entry = {'key': key, 'contact_id': contact_id, 'state': CLAIMED, 'updated_at': now}
+        with self._connect() as conn:
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO dispatches (key, contact_id, state, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (key, contact_id, CLAIMED, now, json.dumps(entry))
+            ).rowcount
+            if inserted:
+                return None
+            row = conn.execute("SELECT data FROM dispatches WHERE key = ?", (key,)).fetchone()
+            existing = json.loads(row[0])
+            if not can_take_over(existing, takeover):
+                return existing
+            # Clé libérée ou réservation périmée vérifiée, sauf si un autre processus l'a reprise entre-temps
+            taken = conn.execute(
+                "UPDATE dispatches SET state = ?, updated_at = ?, data = ? WHERE key = ? AND updated_at = ?",
+                (CLAIMED, now, json.dumps({**existing, **entry}), key, existing['updated_at'])
+            ).rowcount
+        return None if taken else self._get_dispatch(key)
+
+    def _get_dispatch(self, key: str) -> Optional[Dict]:
+        row = self._connect().execute("SELECT data FROM dispatches WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_dispatch(self, key: str, state: str, **fields):
+        """Inscrit l'issue d'un lancement (call_id renvoyé, ou refus du fournisseur)"""
+        updated_at = datetime.now().isoformat()
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM dispatches WHERE key = ?", (key,)).fetchone()
+            entry = {**(json.loads(row[0]) if row else {'key': key}), **fields, 'state': state, 'updated_at': updated_at}
+            conn.execute(
+                "INSERT OR REPLACE INTO dispatches (key, contact_id, state, updated_at, data) VALUES (?, ?, ?, ?, ?)",
+                (key, entry.get('contact_id'), state, updated_at, json.dumps(entry))
+            )
+
+    def count_results_by_contact(self) -> Dict[str, int]:
+        """Nombre de résultats d'appel déjà sauvegardés, par contact"""
+        rows = self._connect().execute("SELECT contact_id, COUNT(*) FROM results GROUP BY contact_id").fetchall()
+        return dict(rows)
+
+    def cache_stats(self) -> Dict:
+        """Pas de cache applicatif : les lectures passent par les index SQLite"""
+        return {}
+
+    def _compute_statistics(self, conn: sqlite3.Connection) -> Dict:
+        """Recalcul complet des statistiques par requêtes indexées"""
+        total_contacts = conn.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+        pending = conn.execute("SELECT COUNT(*) FROM contacts WHERE status = 'pending'").fetchone()[0]
+        completed = conn.execute("SELECT COUNT(*) FROM contacts WHERE status = 'completed'").fetchone()[0]
+
+        row = conn.execute(
+            "SELECT COUNT(*), "
+            "COALESCE(SUM(consent = 1), 0), COALESCE(SUM(consent = 0), 0), "
+            "COALESCE(SUM(identity_confirmed = 1), 0), COALESCE(SUM(identity_confirmed = 0), 0), "
+            "COALESCE(SUM(no_response = 1), 0) "
+            "FROM results"
+        ).fetchone()
+
+        return {
+            'total_contacts': total_contacts,
+            'total_calls': row[0],
+            'pending': pending,
+            'completed': completed,
+            'consent_given': row[1],
+            'consent_refused': row[2],
+            'identity_confirmed': row[3],
+            'identity_rejected': row[4],
+            'no_response': row[5]
+        }
+
+    def _rebuild_counters(self, conn: sqlite3.Connection) -> Dict:
+        stats = self._compute_statistics(conn)
+        conn.executemany(
+            "INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", list(stats.items())
+        )
+        return stats
+
+    def get_statistics(self) -> Dict:
+        """Retourne les statistiques (compteurs maintenus par triggers)"""
+        rows = self._connect().execute("SELECT name, value FROM counters").fetchall()
+        stats = dict(rows)
+        return {name: stats.get(name, 0) for name in COUNTER_NAMES}
+
+    def rebuild_statistics(self) -> Dict:
+        """Recalcule entièrement les compteurs à partir des tables"""
+        with self._connect() as conn:
+            stats = self._rebuild_counters(conn)
+        logger.info(f"📊 Compteurs de campagne recalculés: {stats}")
+        return stats
+
+    def verify_statistics(self) -> bool:
+        """Vérifie que les compteurs correspondent à un recalcul complet"""
+        stored = self.get_statistics()
+        expected = self._compute_statistics(self._connect())
+        mismatches = {k: (stored[k], expected[k]) for k in expected if stored[k] != expected[k]}
+        if mismatches:
+            logger.warning(f"⚠️ Compteurs incohérents (persisté, attendu): {mismatches}")
+        return not mismatches
+
+    def _max_contact_id(self, conn: sqlite3.Connection) -> int:
+        """Plus grand ID numérique existant (initialisation de la séquence)"""
+        max_id = conn.execute(
+            "SELECT MAX(CAST(id AS INTEGER)) FROM contacts WHERE id GLOB '[0-9]*'"
+        ).fetchone()[0]
+        return max_id or 0
+
+    def _allocate_ids(self, conn: sqlite3.Connection, count: int) -> int:
+        """Réserve `count` identifiants consécutifs dans la séquence persistée
+
+        Returns:
+            Le premier identifiant du bloc
+        """
+        return conn.execute(
+            "UPDATE sequences SET value = value + ? WHERE name = 'contact_id' RETURNING value - ?",
+            (count, count)
+        ).fetchone()[0]
+
+    def reset_campaign(self):
+        """Réinitialise complètement la campagne (supprime tous les contacts et résultats)"""
+        logger.warning("Réinitialisation de la campagne - suppression de tous les contacts et résultats")
+        with self._connect() as conn:
+            conn.execute("DELETE FROM contacts")
+            conn.execute("DELETE FROM results")
+            conn.execute("DELETE FROM calls")
+            conn.execute("DELETE FROM dispatches")
+        self.blobs.clear()
+        logger.info("Campagne réinitialisée avec succès")
+
+    def get_campaign_start_date(self) -> Optional[str]:
+        """Retourne la date de début de la campagne (date du premier contact ajouté)"""
+        earliest = self._connect().execute(
+            "SELECT MIN(created_at) FROM contacts WHERE created_at IS NOT NULL AND created_at != ''"
+        ).fetchone()[0]
+        if not earliest:
+            return None
+
+        try:
+            dt = datetime.fromisoformat(earliest)
+            return dt.strftime("%Y-%m-%d")
+        except:
+            return None
+
+    # ------------------------------------------------------------------
+    # Migration
+    # ------------------------------------------------------------------
+
+    def import_from_json(self, json_db) -> Dict:
+        """Importe contacts, résultats et appels en cours d'une JsonDatabase (ids et horodatages conservés)"""
+        contacts = json_db.load_contacts()
+        results = json_db.load_results()
+        calls = json_db.get_inflight_calls()
+
+        with self._connect() as conn:
+            self._insert_contacts(conn, contacts)
+            self._insert_results(conn, results)
+            conn.executemany(
+                "INSERT OR REPLACE INTO calls (call_id, contact_id, state, dispatched_at, updated_at, data) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(c['call_id'], c.get('contact_id'), c['state'], c.get('dispatched_at'), c.get('updated_at'),
+                  json.dumps(c)) for c in calls]
+            )
+            # La séquence a été initialisée avant l'import (base vide): elle doit dépasser les ids importés
+            # et ceux déjà distribués par la séquence JSON (contacts supprimés depuis)
+            next_id = max(self._max_contact_id(conn) + 1, json_db.id_sequence.peek())
+            conn.execute("UPDATE sequences SET value = MAX(value, ?) WHERE name = 'contact_id'", (next_id,))
+
+        logger.info(f"🔁 Migration JSON -> SQLite: {len(contacts)} contacts, {len(results)} résultats")
+        return {'contacts': len(contacts), 'results': len(results)}
+
+
+def migrate_from_json(data_dir: str = "data") -> Dict:
+    """Migration unique des fichiers JSON de `data_dir` vers voicecheck.db
+
+    Refuse de s'exécuter si la base SQLite contient déjà des données.
+    """
+    from utils.json_database import JsonDatabase
+
+    sqlite_db = SqliteDatabase(data_dir)
+    conn = sqlite_db._connect()
+    if conn.execute("SELECT EXISTS (SELECT 1 FROM contacts) OR EXISTS (SELECT 1 FROM results)").fetchone()[0]:
+        raise ValueError(f"La base {sqlite_db.db_file} contient déjà des données, migration annulée")
+
+    return sqlite_db.import_from_json(JsonDatabase(data_dir))
+
+
+if __name__ == "__main__":
+    # Usage: python -m utils.sqlite_database [data_dir]
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    counts = migrate_from_json(sys.argv[1] if len(sys.argv) > 1 else "data")
+    print(f"✅ Migration terminée: {counts['contacts']} contacts, {counts['results']} résultats")
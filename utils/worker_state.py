@@ -0,0 +1,152 @@
+import json
+import os
+import socket
+from datetime import datetime
+from typing import Dict, Optional
+import logging
+from utils.file_lock import FileLock, atomic_write
+
+# Configuration du logger
+logger = logging.getLogger(__name__)
+
+IDLE = 'idle'
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+CANCELLED = 'cancelled'
+SUSPENDED = 'suspended'
+FAILED = 'failed'
+
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+# Un worker sans battement de cœur depuis ce délai (secondes) est considéré arrêté
+HEARTBEAT_TIMEOUT = 30
+
+
+def _now() -> str:
+    return datetime.now().isoformat()
+
+
+class WorkerState:
+    """État partagé entre l'application et le worker de campagne (data/worker.json)
+
+    L'application y dépose une demande de lancement ou d'annulation ; le
+    worker (python worker.py) la prend en charge, y publie la progression
+    de la campagne et un battement de cœur. Chaque modification est une
+    lecture-modification-écriture sous verrou exclusif.
+    """
+
+    def __init__(self, data_dir: str = "data"):
+        self.path = os.path.join(data_dir, "worker.json")
+        self.lock = FileLock(self.path + '.lock')
+        os.makedirs(data_dir, exist_ok=True)
+
+    def load(self) -> Dict:
+        """État courant (campagne en cours ou dernière campagne exécutée)"""
+        if not os.path.exists(self.path):
+            return {'status': IDLE}
+        with self.lock.shared():
+            with open(self.path, 'r') as f:
+                return json.load(f)
+
+    def update(self, **fields) -> Dict:
+        """Met à jour des champs de l'état et retourne l'état complet"""
+        with self.lock.exclusive():
+            state = self._read()
+            state.update(fields)
+            atomic_write(self.path, json.dumps(state, indent=2, ensure_ascii=False))
+        return state
+
+    def transition(self, expected: str, **fields) -> bool:
+        """Compare-and-set: applique les champs seulement si le statut est encore `expected`
+
+        Évite qu'une transition du worker écrase une décision prise entre-temps
+        par l'application (ex: annulation d'une campagne encore en file).
+
+        Returns:
+            False si le statut a changé depuis
+        """
+        with self.lock.exclusive():
+            state = self._read()
+            if state.get('status') != expected:
+                return False
+            state.update(fields)
+            atomic_write(self.path, json.dumps(state, indent=2, ensure_ascii=False))
+        return True
+
+    def _read(self) -> Dict:
+        if not os.path.exists(self.path):
+            return {'status': IDLE}
+        with open(self.path, 'r') as f:
+            return json.load(f)
+
+    # ------------------------------------------------------------------
+    # Côté application
+    # ------------------------------------------------------------------
+
+    def request_start(self, campaign_id: str) -> bool:
+        """Met la campagne en file pour le worker
+
+        Returns:
+            False si une campagne est déjà en file ou en cours
+        """
+        with self.lock.exclusive():
+            state = self._read()
+            if state.get('status') in ACTIVE_STATUSES:
+                return False
+            state.update({
+                'status': QUEUED,
+                'campaign_id': campaign_id,
+                'requested_at': _now(),
+                'started_at': None,
+                'finished_at': None,
+                'cancel_requested': False,
+                'total': 0,
+                'completed': 0,
+                'errors': 0,
+                'last_event': None
+            })
+            atomic_write(self.path, json.dumps(state, indent=2, ensure_ascii=False))
+        logger.info(f"📥 Campagne {campaign_id} mise en file pour le worker")
+        return True
+
+    def request_cancel(self) -> bool:
+        """Demande l'annulation de la campagne en file ou en cours
+
+        Une campagne encore en file est annulée immédiatement ; une campagne
+        en cours s'arrête après les appels déjà lancés.
+        """
+        with self.lock.exclusive():
+            state = self._read()
+            if state.get('status') not in ACTIVE_STATUSES:
+                return False
+            if state['status'] == QUEUED:
+                state.update({'status': CANCELLED, 'finished_at': _now()})
+            else:
+                state['cancel_requested'] = True
+            atomic_write(self.path, json.dumps(state, indent=2, ensure_ascii=False))
+        logger.info("⏹️ Annulation de la campagne demandée")
+        return True
+
+    def worker_alive(self) -> bool:
+        """Un worker a-t-il donné signe de vie récemment ?"""
+        heartbeat = (self.load().get('worker') or {}).get('heartbeat_at')
+        if not heartbeat:
+            return False
+        return (datetime.now() - datetime.fromisoformat(heartbeat)).total_seconds() < HEARTBEAT_TIMEOUT
+
+    # ------------------------------------------------------------------
+    # Côté worker
+    # ------------------------------------------------------------------
+
+    def heartbeat(self, diagnostics: Optional[Dict] = None) -> Dict:
+        """Signale que le worker tourne et retourne l'état courant (demandes de l'application comprises)
+
+        Args:
+            diagnostics: Métriques du processus worker (connexions, limites de débit...)
+                affichées par l'application
+        """
+        fields = {'worker': {'pid': os.getpid(), 'host': socket.gethostname(), 'heartbeat_at': _now()}}
+        if diagnostics is not None:
+            fields['diagnostics'] = diagnostics
+        return self.update(**fields)
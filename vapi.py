@@ -7,27 +7,40 @@ import requests
 import json
 from typing import Optional, Dict, Any
 import time
+from services.http_client import get_session
+from services.resilience import resilient_call, is_transient_http, was_never_sent
 
 class VapiCaller:
     """Gestionnaire d'appels avec Vapi.ai"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, session: Optional[requests.Session] = None):
         self.api_key = api_key
         self.base_url = "https://api.vapi.ai"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
+        # Session partagée: connexions keep-alive réutilisées entre les appels
+        self.session = session or get_session('vapi')
     
-    def create_assistant(self, assistant_config: Dict[str, Any]) -> str:
-        """Crée un assistant avec la configuration donnée"""
-        response = requests.post(
-            f"{self.base_url}/assistant",
-            headers=self.headers,
-            json=assistant_config
+    def _request(self, method: str, path: str, **kwargs) -> Dict[str, Any]:
+        """Requête à l'API Vapi, retentée sur erreur passagère (réseau, 5xx) derrière le disjoncteur 'vapi'
+
+        Un POST (création d'appel ou d'assistant) n'est renvoyé que s'il n'a pas
+        pu atteindre Vapi : après un délai de lecture dépassé ou une erreur 5xx, l'appel a pu être passé.
+        """
+        response = resilient_call(
+            'vapi',
+            lambda: self.session.request(method, f"{self.base_url}{path}", headers=self.headers, **kwargs),
+            is_transient=is_transient_http,
+            is_retryable=None if method == 'GET' else was_never_sent
         )
         response.raise_for_status()
-        return response.json()["id"]
+        return response.json()
+    
+    def create_assistant(self, assistant_config: Dict[str, Any]) -> str:
+        """Crée un assistant avec la configuration donnée"""
+        return self._request("POST", "/assistant", json=assistant_config)["id"]
     
     def make_call(
         self,
@@ -61,22 +74,11 @@ class VapiCaller:
         else:
             raise ValueError("Fournir soit assistant_id soit assistant_config")
         
-        response = requests.post(
-            f"{self.base_url}/call/phone",
-            headers=self.headers,
-            json=payload
-        )
-        response.raise_for_status()
-        return response.json()
+        return self._request("POST", "/call/phone", json=payload)
     
     def get_call_status(self, call_id: str) -> Dict[str, Any]:
         """Récupère le statut d'un appel"""
-        response = requests.get(
-            f"{self.base_url}/call/{call_id}",
-            headers=self.headers
-        )
-        response.raise_for_status()
-        return response.json()
+        return self._request("GET", f"/call/{call_id}")
 
 
 def get_assistant_prompt() -> str:
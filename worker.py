@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Worker de campagne VoiceCheck AI (sans navigateur)
+Exécute les campagnes mises en file depuis l'application Streamlit
+Usage: python worker.py [--once] [--start] [--interval SECONDES]
+"""
+
+import argparse
+import logging
+import signal
+from utils.config import Config
+from utils.campaign_catalog import CampaignCatalog
+from utils.worker_state import WorkerState
+from services.campaign_worker import CampaignWorker
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker de campagne VoiceCheck AI")
+    parser.add_argument('--once', action='store_true',
+                        help="exécute la campagne en file (s'il y en a une) puis s'arrête")
+    parser.add_argument('--start', action='store_true',
+                        help="met la campagne active en file avant de démarrer (sans passer par l'application)")
+    parser.add_argument('--interval', type=float, default=5,
+                        help="secondes entre deux vérifications de la file (défaut: 5)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    data_dir = Config().DATA_DIR
+    if args.start:
+        campaign_id = CampaignCatalog(data_dir).active()['id']
+        if not WorkerState(data_dir).request_start(campaign_id):
+            print("⚠️ Une campagne est déjà en file ou en cours")
+
+    worker = CampaignWorker(data_dir, interval=args.interval)
+    # Arrêt propre: les appels en cours sont menés à terme et sauvegardés
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run_forever(once=args.once)
+
+
+if __name__ == "__main__":
+    main()